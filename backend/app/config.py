@@ -23,6 +23,29 @@ class Settings(BaseSettings):
     litellm_api_key: str = "YOUR_LITELLM_API_KEY"
     preferred_model: str = "claude-sonnet-4-5"
 
+    # Ingestion
+    pg_load_method: str = "copy"  # "copy" (binary COPY) or "insert" (executemany)
+    pg_copy_writers: int = 1  # connections a full COPY load is split across; each holds a pooled connection
+    pg_partition_min_rows: int = 5_000_000  # loads this large are range-partitioned on a datetime column; 0 = never
+    mongo_insert_concurrency: int = 4  # unordered insert_many batches in flight
+    sniff_sample_rows: int = 10_000  # rows a fast sniff reads to infer the schema
+    upload_store_dir: str = ""  # defaults to <tmp>/datalens_uploads
+    upload_token_ttl_minutes: int = 30
+    upload_store_max_mb: int = 4096
+    ingest_workers: int = 2  # background ingestion jobs run concurrently per process
+    ingest_memory_budget_mb: int = 1024  # estimated memory a process's running jobs may hold; 0 = no limit
+    ingest_queue_max_mb: int = 8192  # confirm is refused (429) while queued jobs are estimated above this; 0 = no limit
+    ingest_queue_max_wait_seconds: int = 600  # a job queued this long is claimed before any behind it; 0 = never
+    ingest_job_stale_seconds: int = 60  # a running job with no heartbeat for this long is re-queued
+    ingest_job_max_attempts: int = 3
+    ingest_job_timeout_minutes: int = 120  # a job running longer than this is failed
+
+    # CPU-bound parse/clean/sniff work
+    cpu_pool_kind: str = "process"  # "process" (memory-capped worker per job) or "thread"
+    cpu_pool_workers: int = 0  # concurrent jobs; 0 = one per CPU core
+    cpu_job_timeout_seconds: int = 600
+    cpu_job_memory_mb: int = 4096  # per job, on top of the worker's baseline; 0 = no cap
+
     # Backend
     backend_host: str = "0.0.0.0"
     backend_port: int = 8000
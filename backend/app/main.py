@@ -4,12 +4,14 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.config import settings
 from app.db.postgres import init_postgres, close_postgres
 from app.db.mongodb import init_mongodb, close_mongodb
 from app.middleware.error_handler import ErrorHandlerMiddleware
 from app.routes import auth, upload, collections, chat, models
+from app.services import admission, job_service
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
 
@@ -19,7 +21,9 @@ async def lifespan(app: FastAPI):
     await init_postgres()
     await init_mongodb()
     logging.getLogger(__name__).info("Database connections established")
+    await job_service.start()
     yield
+    await job_service.stop()
     await close_postgres()
     await close_mongodb()
     logging.getLogger(__name__).info("Database connections closed")
@@ -48,3 +52,9 @@ app.include_router(models.router, prefix="/api")
 @app.get("/api/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Ingestion memory budget usage of this process, for Prometheus to scrape."""
+    return admission.metrics()
@@ -13,6 +13,7 @@ class AppError(Exception):
         self.message = message
         self.status_code = status_code
         self.detail = detail
+        self.headers: dict[str, str] = {}
         super().__init__(self.message)
 
 
@@ -31,6 +32,12 @@ class ValidationError(AppError):
         super().__init__(message=message, status_code=422, detail=detail)
 
 
+class TooManyRequestsError(AppError):
+    def __init__(self, message: str = "Too many requests", retry_after: int = 30, detail: str | None = None):
+        super().__init__(message=message, status_code=429, detail=detail)
+        self.headers["Retry-After"] = str(retry_after)
+
+
 class LLMError(AppError):
     def __init__(self, message: str = "LLM service error", detail: str | None = None):
         super().__init__(message=message, status_code=502, detail=detail)
@@ -45,6 +52,7 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
             return JSONResponse(
                 status_code=e.status_code,
                 content={"error": e.message, "detail": e.detail},
+                headers=e.headers or None,
             )
         except Exception as e:
             logger.error("Unhandled error: %s\n%s", str(e), traceback.format_exc())
@@ -0,0 +1,43 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+WRITE_MODES = ("create", "overwrite", "append", "upsert", "delta")
+INCREMENTAL_MODES = ("append", "upsert", "delta")  # write into an existing collection without reloading it
+
+
+class IngestJob(BaseModel):
+    """Stored in MongoDB 'ingest_jobs' collection."""
+    job_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    owner_id: str
+    owner_username: str = ""
+    upload_token: str  # the stored upload to ingest (see upload_store)
+    filename: str = ""
+    content_hash: str = ""  # SHA-256 of the uploaded file; a load of data already stored is copied instead
+    sheet: str | None = None  # Excel: the sheet to ingest; None is the first
+    batch_id: str | None = None  # set on the jobs of one archive upload
+    collection_name: str
+    db_type: str  # "postgres" or "mongodb"
+    columns: list[str] | None = None  # ingest only these sniffed columns
+    mode: str = "create"  # one of WRITE_MODES
+    key_columns: list[str] = Field(default_factory=list)  # upsert: the columns identifying a row
+    is_public: bool = False
+    status: str = "queued"  # one of JOB_STATUSES
+    cancel_requested: bool = False
+    attempts: int = 0  # claims so far; a job whose worker died is re-queued until max attempts
+    worker_id: str = ""
+    total_rows: int = 0  # sniffed row count (an estimate when the sniff was sampled)
+    total_bytes: int = 0  # size of the stored upload
+    memory_mb: int = 0  # estimated peak memory of the load (see admission.estimate_mb)
+    rows_written: int = 0
+    bytes_processed: int = 0  # estimated from rows_written / total_rows
+    error: str = ""
+    result: dict[str, Any] | None = None  # UploadResponse once succeeded
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    heartbeat_at: datetime | None = None
@@ -4,11 +4,30 @@ from typing import Any
 from pydantic import BaseModel, Field
 
 
+class ColumnProfile(BaseModel):
+    """Statistics of one column, computed over every row while it was ingested."""
+    rows: int  # rows profiled; an append/upsert leaves the profile of existing columns as it was
+    null_fraction: float
+    distinct_estimate: int | None = None  # HyperLogLog estimate, within ~2%; None for nested values
+    min: Any = None  # numeric/datetime columns only
+    max: Any = None
+    quantiles: dict[str, Any] = Field(default_factory=dict)  # e.g. {"p50": ...} from a uniform sample
+    top_values: list[dict[str, Any]] = Field(default_factory=list)  # [{"value": ..., "count": ...}], approximate
+
+
 class ColumnSchema(BaseModel):
     name: str
     dtype: str  # e.g. "integer", "float", "string", "boolean", "datetime", "object"
     nullable: bool = True
     sample_values: list[Any] = Field(default_factory=list)
+    distinct_count: int | None = None  # distinct values the sniff saw; None when unknown or above its cap
+    monotonic: bool = False  # numeric/datetime values never decrease in file order
+    time_range: list[datetime] | None = None  # earliest and latest value of a datetime column
+    datetime_format: str | None = None  # strptime format (or "ISO8601") of a datetime column parsed from text
+    sql_type: str | None = None  # narrowed Postgres type (SMALLINT, INTEGER, REAL, DATE or ENUM); None: dtype default
+    enum_values: list[str] | None = None  # labels of an ENUM column
+    json_paths: list[str] | None = None  # leaf paths seen in an object (JSONB) column's values: "a.b", "tags[]"
+    profile: ColumnProfile | None = None  # set at ingestion
 
 
 class CollectionMetadata(BaseModel):
@@ -23,4 +42,7 @@ class CollectionMetadata(BaseModel):
     description: str = ""  # auto-generated brief description
     sample_rows: list[dict[str, Any]] = Field(default_factory=list)  # first 3-5 rows
     is_public: bool = False
+    content_hash: str | None = None  # identity of the loaded data (file, sheet, columns); cleared by appends
+    nested: bool = False  # MongoDB documents stored as uploaded; columns are the dotted paths of their leaves
+    partition: dict[str, str] | None = None  # Postgres range partitioning: {"column": ..., "interval": "month"|"week"}
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
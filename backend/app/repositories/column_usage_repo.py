@@ -0,0 +1,34 @@
+from pymongo import ReturnDocument
+
+from app.db.mongodb import get_mongodb
+
+COLLECTION = "column_usage"
+
+
+def _key(owner_id: str, db_type: str, collection_name: str) -> dict:
+    """Usage belongs to one user's collection, as its metadata does."""
+    return {"owner_id": owner_id, "db_type": db_type, "collection_name": collection_name}
+
+
+async def record_filters(owner_id: str, db_type: str, collection_name: str, columns: list[str]) -> dict[str, int]:
+    """Count one more filter on each column of a stored table/collection; returns the updated counts."""
+    db = get_mongodb()
+    doc = await db[COLLECTION].find_one_and_update(
+        _key(owner_id, db_type, collection_name),
+        {"$inc": {f"filters.{col}": 1 for col in columns}},
+        projection={"_id": 0, "filters": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc.get("filters", {})
+
+
+async def get_filter_counts(owner_id: str, db_type: str, collection_name: str) -> dict[str, int]:
+    db = get_mongodb()
+    doc = await db[COLLECTION].find_one(_key(owner_id, db_type, collection_name), {"_id": 0, "filters": 1})
+    return doc.get("filters", {}) if doc else {}
+
+
+async def delete_usage(owner_id: str, db_type: str, collection_name: str) -> None:
+    db = get_mongodb()
+    await db[COLLECTION].delete_one(_key(owner_id, db_type, collection_name))
@@ -0,0 +1,182 @@
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+from app.db.mongodb import get_mongodb
+from app.models.ingest_job import IngestJob
+
+COLLECTION = "ingest_jobs"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _as_datetime(value: str | datetime) -> datetime:
+    value = datetime.fromisoformat(value) if isinstance(value, str) else value
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def create_job(job: IngestJob) -> dict:
+    db = get_mongodb()
+    doc = job.model_dump(mode="json")
+    await db[COLLECTION].insert_one(doc)
+    doc.pop("_id", None)
+    return doc
+
+
+async def get_job(owner_id: str, job_id: str) -> dict | None:
+    db = get_mongodb()
+    return await db[COLLECTION].find_one({"job_id": job_id, "owner_id": owner_id}, {"_id": 0})
+
+
+async def get_batch(owner_id: str, batch_id: str) -> list[dict]:
+    """The jobs of one archive upload, in the order they were queued."""
+    db = get_mongodb()
+    cursor = db[COLLECTION].find({"owner_id": owner_id, "batch_id": batch_id}, {"_id": 0}).sort("created_at", 1)
+    return await cursor.to_list(length=None)
+
+
+async def get_active_for_collection(owner_id: str, collection_name: str) -> dict | None:
+    """A queued or running job of this user targeting collection_name, if any."""
+    db = get_mongodb()
+    return await db[COLLECTION].find_one(
+        {"owner_id": owner_id, "collection_name": collection_name, "status": {"$in": ["queued", "running"]}},
+        {"_id": 0},
+    )
+
+
+async def has_other_active_for_token(upload_token: str, job_id: str) -> bool:
+    """Whether another queued or running job still needs this stored upload."""
+    db = get_mongodb()
+    doc = await db[COLLECTION].find_one(
+        {"upload_token": upload_token, "job_id": {"$ne": job_id}, "status": {"$in": ["queued", "running"]}},
+        {"_id": 1},
+    )
+    return doc is not None
+
+
+async def active_upload_tokens() -> list[str]:
+    """The stored uploads that queued or running jobs still need."""
+    db = get_mongodb()
+    tokens = await db[COLLECTION].distinct("upload_token", {"status": {"$in": ["queued", "running"]}})
+    return [token for token in tokens if token]
+
+
+async def claim_next(worker_id: str, max_memory_mb: int | None = None, max_wait_seconds: int = 0) -> dict | None:
+    """Atomically move the oldest queued job (estimated at most max_memory_mb) to running and return it.
+
+    Smaller jobs may overtake one that does not fit, but once the oldest has
+    been queued for more than max_wait_seconds nothing else is claimed until
+    it is, so running jobs drain and a large job is not starved.
+    """
+    db = get_mongodb()
+    now = _now()
+    query: dict = {"status": "queued"}
+    if max_memory_mb is not None:
+        query["memory_mb"] = {"$not": {"$gt": max_memory_mb}}  # jobs queued without an estimate fit anywhere
+        if max_wait_seconds:
+            head = await db[COLLECTION].find_one(
+                {"status": "queued"}, {"_id": 0, "job_id": 1, "created_at": 1}, sort=[("created_at", 1)]
+            )
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_wait_seconds)
+            if head and _as_datetime(head["created_at"]) < cutoff:
+                query["job_id"] = head["job_id"]
+    return await db[COLLECTION].find_one_and_update(
+        query,
+        {
+            "$set": {"status": "running", "worker_id": worker_id, "started_at": now, "heartbeat_at": now},
+            "$inc": {"attempts": 1},
+        },
+        projection={"_id": 0},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def queued_memory_mb() -> int:
+    """Sum of the memory estimates of all queued jobs."""
+    db = get_mongodb()
+    cursor = db[COLLECTION].aggregate([
+        {"$match": {"status": "queued"}},
+        {"$group": {"_id": None, "total": {"$sum": "$memory_mb"}}},
+    ])
+    result = await cursor.to_list(length=1)
+    return result[0]["total"] if result else 0
+
+
+async def list_running() -> list[dict]:
+    db = get_mongodb()
+    return await db[COLLECTION].find({"status": "running"}, {"_id": 0}).to_list(length=None)
+
+
+def _lease(job_id: str, worker_id: str, attempt: int) -> dict:
+    """Matches the job only while it is still running under this claim (see requeue_stale)."""
+    return {"job_id": job_id, "worker_id": worker_id, "attempts": attempt, "status": "running"}
+
+
+async def heartbeat(job_id: str, worker_id: str, attempt: int, **progress) -> bool:
+    """Record liveness (and any progress fields); return whether the worker should stop.
+
+    It should when a cancel was requested, or when the job is no longer its
+    claim: re-queued as stale and possibly running elsewhere already.
+    """
+    db = get_mongodb()
+    doc = await db[COLLECTION].find_one_and_update(
+        _lease(job_id, worker_id, attempt),
+        {"$set": {"heartbeat_at": _now(), **progress}},
+        projection={"_id": 0, "cancel_requested": 1},
+    )
+    return doc is None or bool(doc.get("cancel_requested"))
+
+
+async def finish_job(job_id: str, worker_id: str, attempt: int, status: str, error: str = "", **fields) -> None:
+    """Record how a claimed job ended; a worker that lost its claim changes nothing."""
+    db = get_mongodb()
+    await db[COLLECTION].update_one(
+        _lease(job_id, worker_id, attempt),
+        {"$set": {"status": status, "error": error, "finished_at": _now(), **fields}},
+    )
+
+
+async def requeue_job(job_id: str, worker_id: str, attempt: int) -> None:
+    """Hand a running job back to the queue (its worker is shutting down)."""
+    db = get_mongodb()
+    await db[COLLECTION].update_one(
+        _lease(job_id, worker_id, attempt),
+        {"$set": {"status": "queued", "worker_id": ""}},
+    )
+
+
+async def request_cancel(owner_id: str, job_id: str) -> dict | None:
+    """Cancel a queued job outright, or flag a running one for its worker to stop."""
+    db = get_mongodb()
+    await db[COLLECTION].update_one(
+        {"job_id": job_id, "owner_id": owner_id, "status": "queued"},
+        {"$set": {"status": "cancelled", "cancel_requested": True, "finished_at": _now()}},
+    )
+    await db[COLLECTION].update_one(
+        {"job_id": job_id, "owner_id": owner_id, "status": "running"},
+        {"$set": {"cancel_requested": True}},
+    )
+    return await get_job(owner_id, job_id)
+
+
+async def requeue_stale(stale_seconds: int, max_attempts: int) -> int:
+    """Re-queue running jobs whose worker stopped sending heartbeats; fail those out of attempts."""
+    db = get_mongodb()
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=stale_seconds)).isoformat()
+    stale = {"status": "running", "heartbeat_at": {"$lt": cutoff}}
+    await db[COLLECTION].update_many(
+        {**stale, "attempts": {"$gte": max_attempts}},
+        {"$set": {"status": "failed", "error": "Ingestion worker stopped responding", "finished_at": _now()}},
+    )
+    result = await db[COLLECTION].update_many(
+        {**stale, "cancel_requested": False},
+        {"$set": {"status": "queued", "worker_id": ""}},
+    )
+    await db[COLLECTION].update_many(
+        {**stale, "cancel_requested": True},
+        {"$set": {"status": "cancelled", "finished_at": _now()}},
+    )
+    return result.modified_count
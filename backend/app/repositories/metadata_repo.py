@@ -51,6 +51,17 @@ async def get_owned_by_name(owner_id: str, name: str) -> dict | None:
     )
 
 
+async def find_by_content_hash(owner_id: str, content_hash: str, db_type: str) -> dict | None:
+    """Find a collection holding exactly this data that the user can see, preferring their own."""
+    db = get_mongodb()
+    cursor = db[COLLECTION].find(
+        {"content_hash": content_hash, "db_type": db_type, "$or": [{"owner_id": owner_id}, {"is_public": True}]},
+        {"_id": 0},
+    )
+    matches = await cursor.to_list(length=100)
+    return min(matches, key=lambda m: m["owner_id"] != owner_id, default=None)
+
+
 async def get_by_name_and_owner_username(name: str, owner_username: str) -> dict | None:
     """Find a public collection by name and owner username (for qualified @owner:name refs)."""
     db = get_mongodb()
@@ -72,3 +83,26 @@ async def delete_metadata(owner_id: str, name: str) -> bool:
     db = get_mongodb()
     result = await db[COLLECTION].delete_one({"name": name, "owner_id": owner_id})
     return result.deleted_count > 0
+
+
+async def add_rows(owner_id: str, name: str, added_rows: int, columns: list[dict]) -> None:
+    """Record an append/upsert: bump row_count, store the merged columns and refresh the description.
+
+    A single pipeline update, so it costs the same whatever the collection's size.
+    The collection no longer holds the data of one upload, so its content_hash goes.
+    """
+    db = get_mongodb()
+    await db[COLLECTION].update_one(
+        {"name": name, "owner_id": owner_id},
+        [
+            {"$set": {
+                "row_count": {"$add": ["$row_count", added_rows]},
+                "columns": {"$literal": columns},
+                "content_hash": None,
+            }},
+            {"$set": {"description": {"$concat": [
+                "Uploaded from ", "$original_filename", ". ",
+                {"$toString": "$row_count"}, f" rows, {len(columns)} columns.",
+            ]}}},
+        ],
+    )
@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.mongodb import get_mongodb
 from app.middleware.error_handler import AppError
+from app.services.row_delta import ROW_HASH_COLUMN
 
 MAX_ROWS = 500
 
@@ -87,7 +88,8 @@ async def execute_sql(session: AsyncSession, query: str) -> list[dict[str, Any]]
     result = await session.execute(text(cleaned))
     columns = list(result.keys())
     rows = result.fetchmany(MAX_ROWS)
-    return [dict(zip(columns, row)) for row in rows]
+    # The row hash is bookkeeping for delta loads, not data (SELECT * would return it)
+    return [{c: v for c, v in zip(columns, row) if c != ROW_HASH_COLUMN} for row in rows]
 
 
 # --- MongoDB hardening ---
@@ -138,5 +140,6 @@ async def execute_mongodb(collection_name: str, pipeline: list[dict]) -> list[di
     for doc in results:
         if "_id" in doc:
             doc["_id"] = str(doc["_id"])
+        doc.pop(ROW_HASH_COLUMN, None)
 
     return results
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, File, Form, UploadFile
+from fastapi import APIRouter, Depends, File, Form, Query, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.postgres import get_pg_session
 from app.dependencies import get_current_user_id
-from app.middleware.error_handler import ValidationError, AppError
-from app.repositories import metadata_repo, user_repo
-from app.schemas.upload import SniffResult, UploadResponse
-from app.services import upload_service
+from app.middleware.error_handler import NotFoundError, ValidationError, AppError
+from app.models.ingest_job import INCREMENTAL_MODES, WRITE_MODES, IngestJob
+from app.repositories import job_repo, metadata_repo, user_repo
+from app.schemas.upload import BatchResponse, ConfirmResponse, IngestJobResponse, SniffResult
+from app.services import admission, archive_service, cpu_pool, job_service, upload_service
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
@@ -14,30 +15,53 @@ router = APIRouter(prefix="/upload", tags=["upload"])
 @router.post("/sniff", response_model=SniffResult)
 async def sniff_file(
     file: UploadFile = File(...),
+    mode: str = Query("fast"),
     user_id: str = Depends(get_current_user_id),
 ):
-    """Parse file and return schema preview + DB recommendation without ingesting."""
-    df = await upload_service.parse_file(file)
-    raw_json = None
-    if file.filename and file.filename.endswith(".json"):
-        await file.seek(0)
-        raw_json = await file.read()
+    """Parse file and return schema preview + DB recommendation without ingesting.
 
-    result = upload_service.sniff_data(df, raw_json)
-    return result
+    mode=fast infers the schema from a bounded sample and estimates the row count;
+    mode=full reads the whole file. Either way the upload is kept under the
+    returned upload_token for /upload/confirm.
+    """
+    if mode not in ("fast", "full"):
+        raise ValidationError("mode must be 'fast' or 'full'")
 
+    async with upload_service.spooled_upload(file) as spool:
+        return await cpu_pool.run(upload_service.sniff_and_store, spool, user_id, mode == "fast")
 
-@router.post("/confirm", response_model=UploadResponse)
+
+@router.post("/confirm", response_model=ConfirmResponse, status_code=202)
 async def confirm_upload(
-    file: UploadFile = File(...),
+    file: UploadFile | None = File(None),
+    upload_token: str | None = Form(None),
     collection_name: str = Form(...),
     db_type: str = Form(...),
     overwrite: str = Form("false"),
+    mode: str | None = Form(None),
+    key_columns: str | None = Form(None),
     is_public: str = Form("false"),
+    columns: str | None = Form(None),
+    sheets: list[str] | None = Form(None),
     user_id: str = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_pg_session),
 ):
-    """Confirm upload and ingest data into the chosen database."""
+    """Confirm upload settings and queue background ingestion jobs.
+
+    Prefer the upload_token from /upload/sniff; sending the file again is still
+    accepted and is stored first. `columns` (comma-separated sniffed names)
+    ingests only that subset. `sheets` (repeated field) picks Excel sheets:
+    one sheet loads into collection_name, several load in parallel into
+    <collection_name>_<sheet> each. `mode` is "create" (the default),
+    "overwrite" (same as overwrite=true), "append", "upsert" or "delta"; the
+    last three write to an existing collection of the same db_type. Upsert
+    replaces rows matching `key_columns` (comma-separated); delta makes the
+    collection hold exactly the upload's rows, inserting and deleting only
+    those that changed. Poll /upload/jobs/{job_id} for
+    progress. While the ingestion queue is full the request is refused with
+    429 and Retry-After; the stored upload stays valid, so a retry can pass
+    its upload_token.
+    """
     from app.middleware.input_guard import validate_collection_name
 
     collection_name = validate_collection_name(collection_name)
@@ -45,57 +69,147 @@ async def confirm_upload(
     if db_type not in ("postgres", "mongodb"):
         raise ValidationError("db_type must be 'postgres' or 'mongodb'")
 
-    # Re-parse the file (no longer relies on in-memory cache)
-    df = await upload_service.parse_file(file)
-    raw_json = None
-    if file.filename and file.filename.endswith(".json"):
-        await file.seek(0)
-        raw_json = await file.read()
-    sniff_result = upload_service.sniff_data(df, raw_json)
-
-    # Check for existing collection (owned by this user only)
-    existing = await metadata_repo.get_owned_by_name(user_id, collection_name)
-    if existing and overwrite.lower() != "true":
-        raise AppError(
-            f"Collection '{collection_name}' already exists. Set overwrite to replace it.",
-            status_code=409,
-        )
-
-    # Drop existing data if overwriting
-    if existing and overwrite.lower() == "true":
-        if existing["db_type"] == "postgres":
-            await upload_service.drop_existing_postgres(session, collection_name)
-        else:
-            await upload_service.drop_existing_mongodb(collection_name)
-
-    if db_type == "postgres":
-        row_count = await upload_service.ingest_postgres(
-            session, df, collection_name, sniff_result["columns"]
-        )
+    mode = mode or ("overwrite" if overwrite.lower() == "true" else "create")
+    if mode not in WRITE_MODES:
+        raise ValidationError(f"mode must be one of: {', '.join(WRITE_MODES)}")
+    keys = list(dict.fromkeys(k.strip() for k in key_columns.split(",") if k.strip())) if key_columns else []
+    if mode == "upsert" and not keys:
+        raise ValidationError("key_columns are required for upsert")
+    if keys and mode != "upsert":
+        raise ValidationError("key_columns only apply to upsert")
+
+    if sheets and len(sheets) > 1:
+        targets = [
+            (sheet, validate_collection_name(upload_service.sheet_collection_name(collection_name, sheet)))
+            for sheet in sheets
+        ]
+        if len({name for _, name in targets}) < len(targets):
+            raise ValidationError("Selected sheets map to the same collection name")
     else:
-        row_count = await upload_service.ingest_mongodb(df, collection_name)
+        targets = [(sheets[0] if sheets else None, collection_name)]
+
+    # Check for existing collections (owned by this user only)
+    existing = {}
+    for _, name in targets:
+        existing[name] = await metadata_repo.get_owned_by_name(user_id, name)
+        if mode in INCREMENTAL_MODES:
+            if not existing[name]:
+                raise NotFoundError(f"Collection '{name}' not found. Upload it before appending to it.")
+            if existing[name]["db_type"] != db_type:
+                raise ValidationError(f"Collection '{name}' is stored in {existing[name]['db_type']}")
+        elif existing[name] and mode != "overwrite":
+            raise AppError(
+                f"Collection '{name}' already exists. Set overwrite to replace it.",
+                status_code=409,
+            )
+        else:
+            await job_service.check_target_free(db_type, name, existing[name])
+        if await job_repo.get_active_for_collection(user_id, name):
+            raise AppError(f"An upload into '{name}' is already in progress.", status_code=409)
+
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+    stored = await upload_service.stage_upload(user_id, file, upload_token, selected, sheets)
+    first_sheet = (stored.sniff_result.get("sheets") or [None])[0]
+    if mode in INCREMENTAL_MODES:
+        for sheet, name in targets:
+            if sheet in (None, first_sheet):
+                upload_service.check_incremental_target(stored, selected, existing[name], keys)
+    memory_mb = admission.estimate_mb(stored.filename, stored.size)
+    await job_service.admit(memory_mb * len(targets))
 
     # Fetch username for metadata
     import uuid
     user = await user_repo.get_user_by_id(session, uuid.UUID(user_id))
-    owner_username = user.username if user else ""
-
-    await upload_service.save_metadata(
-        collection_name=collection_name,
-        db_type=db_type,
-        original_filename=file.filename or "",
-        owner_id=user_id,
-        owner_username=owner_username,
-        row_count=row_count,
-        sniff_result=sniff_result,
-        is_public=is_public.lower() == "true",
-    )
-
-    action = "replaced" if existing else "uploaded"
-    return UploadResponse(
-        collection_name=collection_name,
-        db_type=db_type,
-        row_count=row_count,
-        column_count=len(sniff_result["columns"]),
-        message=f"Successfully {action} {row_count} rows into {db_type}:{collection_name}",
-    )
+
+    jobs = []
+    for sheet, name in targets:
+        jobs.append(await job_service.enqueue(IngestJob(
+            owner_id=user_id,
+            owner_username=user.username if user else "",
+            upload_token=stored.token,
+            filename=stored.filename,
+            content_hash=stored.content_hash,
+            sheet=sheet,
+            collection_name=name,
+            db_type=db_type,
+            columns=selected,
+            mode=mode,
+            key_columns=keys,
+            is_public=is_public.lower() == "true",
+            # Only the first sheet was sniffed; the others learn their size when their job starts
+            total_rows=stored.sniff_result.get("row_count", 0) if sheet in (None, first_sheet) else 0,
+            total_bytes=stored.size,
+            memory_mb=memory_mb,
+        )))
+    return ConfirmResponse(jobs=[_job_response(job) for job in jobs])
+
+
+@router.post("/archive", response_model=BatchResponse, status_code=202)
+async def upload_archive(
+    file: UploadFile = File(...),
+    db_type: str | None = Form(None),
+    collection_prefix: str | None = Form(None),
+    overwrite: str = Form("false"),
+    is_public: str = Form("false"),
+    user_id: str = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_pg_session),
+):
+    """Upload a zip or tar.gz of data files and queue one ingestion job per file.
+
+    Each file loads into <collection_prefix>_<file name> (or <file name>), in
+    `db_type` or, when omitted, the database its sniff recommends. Files are
+    sniffed concurrently and loaded in parallel; files that cannot be loaded
+    are reported as failed jobs. Poll /upload/batches/{batch_id} for the
+    aggregated progress. Refused with 429 and Retry-After while the
+    ingestion queue is full.
+    """
+    from app.middleware.input_guard import validate_collection_name
+
+    if db_type not in (None, "postgres", "mongodb"):
+        raise ValidationError("db_type must be 'postgres' or 'mongodb'")
+    prefix = validate_collection_name(collection_prefix) if collection_prefix else None
+    await job_service.admit(0)  # refuse a full queue before spooling; stage_archive admits the members' total
+
+    import uuid
+    user = await user_repo.get_user_by_id(session, uuid.UUID(user_id))
+
+    async with upload_service.spooled_upload(file, archive=True) as spool:
+        batch_id = await archive_service.stage_archive(
+            spool,
+            user_id,
+            user.username if user else "",
+            db_type,
+            prefix,
+            overwrite.lower() == "true",
+            is_public.lower() == "true",
+        )
+    return await get_batch(batch_id, user_id)
+
+
+@router.get("/batches/{batch_id}", response_model=BatchResponse)
+async def get_batch(batch_id: str, user_id: str = Depends(get_current_user_id)):
+    """Aggregated progress of an archive upload: totals over its files and each file's job."""
+    jobs = await job_repo.get_batch(user_id, batch_id)
+    if not jobs:
+        raise NotFoundError("Upload batch not found")
+    report = archive_service.batch_report(batch_id, jobs)
+    return BatchResponse(**{**report, "jobs": [_job_response(job) for job in jobs]})
+
+
+@router.get("/jobs/{job_id}", response_model=IngestJobResponse)
+async def get_job(job_id: str, user_id: str = Depends(get_current_user_id)):
+    """Progress of an ingestion job: rows written, bytes processed, throughput and ETA."""
+    return _job_response(await job_service.get_job(user_id, job_id))
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=IngestJobResponse)
+async def cancel_job(job_id: str, user_id: str = Depends(get_current_user_id)):
+    """Cancel a queued or running ingestion job.
+
+    Data it already wrote is dropped, except rows a MongoDB append or upsert wrote.
+    """
+    return _job_response(await job_service.cancel_job(user_id, job_id))
+
+
+def _job_response(job: dict) -> IngestJobResponse:
+    return IngestJobResponse(**job, **job_service.job_progress(job))
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Any
 
 from pydantic import BaseModel, Field
@@ -9,6 +10,9 @@ class SniffResult(BaseModel):
     row_count: int
     recommended_db: str  # "postgres" or "mongodb"
     recommendation_reason: str
+    confidence: str = "exact"  # "exact" (whole file read) or "sampled" (schema/row_count estimated)
+    upload_token: str | None = None  # pass to /upload/confirm instead of re-sending the file
+    sheets: list[str] = Field(default_factory=list)  # Excel: all sheets; the schema describes the first
 
 
 class UploadRequest(BaseModel):
@@ -23,3 +27,48 @@ class UploadResponse(BaseModel):
     row_count: int
     column_count: int
     message: str
+    rows_updated: int = 0  # upsert: rows that replaced an existing key
+    rows_deleted: int = 0  # delta: stored rows the upload no longer has
+    rows_unchanged: int = 0  # delta: upload rows already stored, not rewritten
+    load_method: str = ""
+    rows_per_sec: float = 0.0
+    peak_memory_mb: float = 0.0
+    storage_saved_mb: float = 0.0  # Postgres: estimated saving of the compact column types
+
+
+class IngestJobResponse(BaseModel):
+    job_id: str
+    status: str  # "queued", "running", "succeeded", "failed" or "cancelled"
+    collection_name: str
+    db_type: str
+    filename: str = ""
+    sheet: str | None = None
+    batch_id: str | None = None  # archive uploads: the batch the job belongs to
+    mode: str = "create"  # "create", "overwrite", "append", "upsert" or "delta"
+    rows_written: int = 0
+    total_rows: int = 0  # estimated until the job finishes when the sniff was sampled
+    bytes_processed: int = 0
+    total_bytes: int = 0
+    rows_per_sec: float = 0.0
+    eta_seconds: float | None = None
+    attempts: int = 0
+    error: str = ""
+    result: UploadResponse | None = None  # set once the job succeeded
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+class ConfirmResponse(BaseModel):
+    jobs: list[IngestJobResponse]  # one per target collection (one per selected Excel sheet)
+
+
+class BatchResponse(BaseModel):
+    """Aggregated progress of an archive upload, one job per file."""
+    batch_id: str
+    status: str  # "running" until every job has finished, then "succeeded", "partial" or "failed"
+    files: int
+    succeeded: int
+    rows_written: int
+    total_rows: int
+    jobs: list[IngestJobResponse]  # files that could not be queued are failed jobs with the reason
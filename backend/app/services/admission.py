@@ -0,0 +1,87 @@
+"""Admission of ingestion jobs against a per-process memory budget.
+
+Each job's peak memory is estimated when it is queued, from the size and
+format of its upload. A worker only claims a queued job whose estimate fits
+in what the jobs already running in its process leave of
+`ingest_memory_budget_mb`, so jobs that do not fit wait in the queue until a
+running one finishes; a job larger than the whole budget runs once its
+process is otherwise idle. Smaller jobs may overtake one that does not fit
+until it has been queued for `ingest_queue_max_wait_seconds` (see
+job_repo.claim_next). Confirm refuses new jobs with 429 and Retry-After
+while the jobs already queued are estimated at more than
+`ingest_queue_max_mb` (see job_service.admit).
+
+The estimates are deliberately rough: the loads stream chunks, but the
+profile sample, parser buffers and, for some formats, whole decoded row
+groups or sheets still grow with the file.
+"""
+
+import math
+
+from app.config import settings
+
+MB = 1024 * 1024
+BASE_MB = 64  # a job's working set before its file: one chunk in flight, driver buffers
+MEMORY_FACTORS = {  # peak memory per MB of upload
+    "csv": 2.0,
+    "tsv": 2.0,
+    "jsonl": 3.0,
+    "ndjson": 3.0,
+    "json": 4.0,
+    "parquet": 5.0,  # compressed columnar: a decoded row group is several times its size on disk
+    "arrow": 1.5,
+    "feather": 1.5,
+    "ipc": 1.5,
+    "xlsx": 10.0,  # zipped XML, read a whole sheet at a time
+    "xls": 10.0,
+}
+DEFAULT_FACTOR = 4.0
+
+_reserved: dict[str, int] = {}  # job id -> estimate, for the jobs running in this process
+_rejected = 0
+
+
+def estimate_mb(filename: str, size_bytes: int) -> int:
+    """Estimated peak memory (MB) of ingesting an upload of this name and size."""
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return BASE_MB + math.ceil(size_bytes / MB * MEMORY_FACTORS.get(ext, DEFAULT_FACTOR))
+
+
+def reserved_mb() -> int:
+    return sum(_reserved.values())
+
+
+def headroom_mb() -> int | None:
+    """The largest estimate a job may have to start now; None when any job may start."""
+    if not settings.ingest_memory_budget_mb or not _reserved:
+        return None
+    return max(settings.ingest_memory_budget_mb - reserved_mb(), 0)
+
+
+def reserve(job_id: str, memory_mb: int) -> None:
+    _reserved[job_id] = memory_mb
+
+
+def release(job_id: str) -> None:
+    _reserved.pop(job_id, None)
+
+
+def record_rejection() -> None:
+    global _rejected
+    _rejected += 1
+
+
+def metrics() -> str:
+    """Budget usage of this process in the Prometheus text format."""
+    series = [
+        ("ingest_memory_budget_mb", "gauge", "Estimated memory ingestion jobs may hold at once (0 = no limit)",
+         settings.ingest_memory_budget_mb),
+        ("ingest_memory_reserved_mb", "gauge", "Estimated memory of the running ingestion jobs", reserved_mb()),
+        ("ingest_jobs_running", "gauge", "Ingestion jobs running in this process", len(_reserved)),
+        ("ingest_jobs_rejected_total", "counter", "Confirms refused because the ingestion queue was full",
+         _rejected),
+    ]
+    lines = []
+    for name, kind, help_text, value in series:
+        lines += [f"# HELP datalens_{name} {help_text}", f"# TYPE datalens_{name} {kind}", f"datalens_{name} {value}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,112 @@
+"""Members of a zip or tar.gz upload, extracted one at a time.
+
+Each member is copied out in blocks and hashed on the way, like a spooled
+upload, so neither the archive nor any member is ever held in memory. The
+byte count is checked against the cap while copying rather than trusted from
+the archive's headers, which a zip bomb can understate.
+"""
+
+import hashlib
+import os
+import tarfile
+import zipfile
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import IO
+
+from app.middleware.error_handler import ValidationError
+
+ARCHIVE_FORMATS = {".zip": "zip", ".tar.gz": "tar.gz", ".tgz": "tar.gz"}
+MAX_MEMBERS = 200
+COPY_BYTES = 1024 * 1024
+
+
+@dataclass
+class ExtractedMember:
+    name: str  # path inside the archive
+    path: str  # where it was extracted to
+    size: int
+    content_hash: str  # SHA-256 of its bytes
+
+
+@dataclass
+class Extraction:
+    members: list[ExtractedMember] = field(default_factory=list)
+    skipped: list[tuple[str, str]] = field(default_factory=list)  # (member name, why)
+
+
+def archive_format(filename: str) -> str | None:
+    """The archive format ("zip" or "tar.gz") the filename names, or None."""
+    lower = filename.lower()
+    return next((fmt for suffix, fmt in ARCHIVE_FORMATS.items() if lower.endswith(suffix)), None)
+
+
+def _member_extension(name: str) -> str:
+    base = os.path.basename(name)
+    return base.rsplit(".", 1)[-1].lower() if "." in base else ""
+
+
+def _is_hidden(name: str) -> bool:
+    """Directories and OS metadata (__MACOSX/, .DS_Store, ._resource forks) that are not data."""
+    parts = name.replace("\\", "/").split("/")
+    return parts[0] == "__MACOSX" or any(p.startswith(".") for p in parts if p)
+
+
+def _iter_files(path: str, fmt: str) -> Iterator[tuple[str, IO[bytes]]]:
+    if fmt == "zip":
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    with archive.open(info) as f:
+                        yield info.filename, f
+        return
+    # Stream mode reads the gzip stream front to back, without seeking
+    with tarfile.open(path, "r|gz") as archive:
+        for member in archive:
+            if member.isfile():
+                yield member.name, archive.extractfile(member)
+
+
+def extract(
+    path: str, fmt: str, out_dir: str, extensions: tuple[str, ...], max_member_bytes: int, max_total_bytes: int
+) -> Extraction:
+    """Extract the members with one of `extensions` into out_dir; list the others as skipped.
+
+    A member over max_member_bytes is skipped; the archive is rejected once
+    the extracted total passes max_total_bytes or it has more than
+    MAX_MEMBERS data files.
+    """
+    result = Extraction()
+    total = 0
+    try:
+        for name, source in _iter_files(path, fmt):
+            if _is_hidden(name):
+                continue
+            ext = _member_extension(name)
+            if ext not in extensions:
+                result.skipped.append((name, f"Unsupported file type: .{ext}"))
+                continue
+            if len(result.members) >= MAX_MEMBERS:
+                raise ValidationError(f"Archive has more than {MAX_MEMBERS} data files")
+
+            target = os.path.join(out_dir, f"{len(result.members):04d}.{ext}")
+            size, digest = 0, hashlib.sha256()
+            with open(target, "wb") as out:
+                while block := source.read(COPY_BYTES):
+                    size += len(block)
+                    total += len(block)
+                    if total > max_total_bytes:
+                        raise ValidationError(f"Archive expands to more than {max_total_bytes // (1024 * 1024)}MB")
+                    if size > max_member_bytes:
+                        break
+                    out.write(block)
+                    digest.update(block)
+            if size > max_member_bytes:
+                os.unlink(target)
+                result.skipped.append((name, f"File exceeds {max_member_bytes // (1024 * 1024)}MB limit"))
+                continue
+            result.members.append(ExtractedMember(name, target, size, digest.hexdigest()))
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError, RuntimeError, NotImplementedError) as exc:
+        # RuntimeError/NotImplementedError: encrypted members, unsupported zip compression
+        raise ValidationError(f"Could not read the {fmt} archive: {exc}") from exc
+    return result
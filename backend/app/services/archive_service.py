@@ -0,0 +1,148 @@
+"""Bulk upload of a zip or tar.gz archive of data files.
+
+The archive is spooled like any upload and its members are extracted one at
+a time in a worker process (see archive_reader). Each member is then sniffed
+and stored concurrently on the CPU pool, at most `cpu_pool_workers` at once,
+and queued as an ingestion job of its own under one batch id, so the job
+workers (`ingest_workers`) load the files in parallel and a batch takes
+about as long as its largest file. A member that cannot be loaded
+(unsupported, too large, unreadable, or aimed at a collection that exists or
+is busy) is recorded as a failed job of the batch, so the batch report is
+read from its jobs alone. The members' summed memory estimates are admitted
+against the ingestion queue before any of them is queued.
+"""
+
+import asyncio
+import logging
+import tempfile
+import uuid
+from datetime import datetime, timezone
+
+from app.config import settings
+from app.middleware.error_handler import AppError
+from app.middleware.input_guard import validate_collection_name
+from app.models.ingest_job import FINISHED_STATUSES, IngestJob
+from app.repositories import job_repo, metadata_repo
+from app.services import admission, archive_reader, cpu_pool, job_service, upload_service
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+async def stage_archive(
+    spool: upload_service.SpooledUpload,
+    owner_id: str,
+    owner_username: str,
+    db_type: str | None,
+    prefix: str | None,
+    overwrite: bool,
+    is_public: bool,
+) -> str:
+    """Queue one ingestion job per data file of a spooled archive; return the batch id.
+
+    Files load into <prefix>_<file name> (or <file name>), in `db_type` or,
+    when that is None, the database the sniff recommends for each file.
+    """
+    batch = IngestJob(
+        owner_id=owner_id,
+        owner_username=owner_username,
+        upload_token="",
+        collection_name="",
+        db_type=db_type or "",
+        mode="overwrite" if overwrite else "create",
+        is_public=is_public,
+        batch_id=uuid.uuid4().hex,
+    )
+    with tempfile.TemporaryDirectory(prefix="archive_") as out_dir:
+        extraction = await cpu_pool.run(
+            archive_reader.extract,
+            spool.path,
+            spool.ext,
+            out_dir,
+            upload_service.SUPPORTED_EXTENSIONS,
+            upload_service.MAX_FILE_SIZE_MB * MB,
+            settings.upload_store_max_mb * MB,  # every member is kept in the upload store until it loads
+        )
+        await job_service.admit(sum(admission.estimate_mb(m.name, m.size) for m in extraction.members))
+        for member, error in extraction.skipped:
+            await _record_failed(batch, member, "", error)
+
+        staged, names = [], set()
+        for member in extraction.members:
+            name = upload_service.member_collection_name(prefix, member.name)
+            if name in names:
+                error = "Another file of the archive loads into the same collection"
+                await _record_failed(batch, member.name, name, error)
+            else:
+                names.add(name)
+                staged.append(_stage_member(batch, member, name))
+        await asyncio.gather(*staged)
+    return batch.batch_id
+
+
+async def _stage_member(batch: IngestJob, member: archive_reader.ExtractedMember, name: str) -> None:
+    try:
+        name = validate_collection_name(name)
+        existing = await metadata_repo.get_owned_by_name(batch.owner_id, name)
+        if existing and batch.mode != "overwrite":
+            raise AppError(f"Collection '{name}' already exists. Set overwrite to replace it.", status_code=409)
+        if await job_repo.get_active_for_collection(batch.owner_id, name):
+            raise AppError(f"An upload into '{name}' is already in progress.", status_code=409)
+
+        spool = upload_service.spooled_member(member)
+        sniff_result = await cpu_pool.run(upload_service.sniff_and_store, spool, batch.owner_id)
+        db_type = batch.db_type or sniff_result["recommended_db"]
+        await job_service.check_target_free(db_type, name, existing)
+        await job_service.enqueue(batch.model_copy(update={
+            "job_id": uuid.uuid4().hex,
+            "created_at": datetime.now(timezone.utc),
+            "upload_token": sniff_result["upload_token"],
+            "filename": member.name,
+            "content_hash": member.content_hash,
+            "collection_name": name,
+            "db_type": db_type,
+            "total_rows": sniff_result["row_count"],
+            "total_bytes": member.size,
+            "memory_mb": admission.estimate_mb(member.name, member.size),
+        }))
+    except AppError as exc:
+        await _record_failed(batch, member.name, name, exc.message)
+    except Exception:
+        # One bad member must not fail the batch, or leave its siblings staged without a report
+        logger.exception("Staging archive member %s failed", member.name)
+        await _record_failed(batch, member.name, name, "Could not stage this file")
+
+
+async def _record_failed(batch: IngestJob, member: str, name: str, error: str) -> None:
+    await job_repo.create_job(batch.model_copy(update={
+        "job_id": uuid.uuid4().hex,
+        "created_at": datetime.now(timezone.utc),
+        "filename": member,
+        "collection_name": name,
+        "status": "failed",
+        "error": error,
+        "finished_at": datetime.now(timezone.utc),
+    }))
+
+
+def batch_report(batch_id: str, jobs: list[dict]) -> dict:
+    """Totals of a batch's jobs: "running" until every job has finished, then how they ended."""
+    statuses = {job["status"] for job in jobs}
+    if statuses - set(FINISHED_STATUSES):
+        status = "running"
+    elif statuses == {"succeeded"}:
+        status = "succeeded"
+    elif "succeeded" in statuses:
+        status = "partial"
+    else:
+        status = "failed"
+    return {
+        "batch_id": batch_id,
+        "status": status,
+        "files": len(jobs),
+        "succeeded": sum(job["status"] == "succeeded" for job in jobs),
+        "rows_written": sum(job.get("rows_written", 0) for job in jobs),
+        "total_rows": sum(job.get("total_rows", 0) for job in jobs),
+        "jobs": jobs,
+    }
@@ -0,0 +1,164 @@
+"""Readers for Arrow-native upload formats: Parquet, Arrow IPC (Feather v2) and JSON Lines.
+
+Parquet and Arrow IPC files are memory-mapped and sliced into record batches
+without copying, and columns are projected before decoding wherever the
+format allows it. JSON Lines files are decoded a block of lines at a time,
+so memory follows one chunk rather than the whole file. Struct
+columns are flattened to dotted names, matching what json_normalize produces
+for JSON uploads, except the top-level fields a caller keeps whole (values
+bound for JSONB columns), which arrive as Python dicts and lists.
+"""
+
+import io
+import itertools
+from collections.abc import Callable, Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pj
+import pyarrow.parquet as pq
+
+from app.middleware.error_handler import ValidationError
+
+ColumnFilter = Callable[[str], bool] | None
+
+
+def _pandas_type(arrow_type: pa.DataType):
+    """Keep integers and booleans nullable instead of widening them to float/object."""
+    if pa.types.is_integer(arrow_type):
+        return pd.Int64Dtype()
+    if pa.types.is_boolean(arrow_type):
+        return pd.BooleanDtype()
+    return None
+
+
+def _flatten(table: pa.Table) -> pa.Table:
+    while any(pa.types.is_struct(field.type) for field in table.schema):
+        table = table.flatten()
+    return table
+
+
+def _leaf_names(field: pa.Field, prefix: str = "") -> list[str]:
+    name = f"{prefix}{field.name}"
+    if pa.types.is_struct(field.type):
+        return [leaf for child in field.type for leaf in _leaf_names(child, f"{name}.")]
+    return [name]
+
+
+def _projected_fields(schema: pa.Schema, keep: ColumnFilter) -> list[str] | None:
+    """Top-level fields that hold at least one wanted (flattened) column."""
+    if keep is None:
+        return None
+    return [f.name for f in schema if keep(f.name) or any(keep(leaf) for leaf in _leaf_names(f))]
+
+
+def to_frame(data: pa.Table | pa.RecordBatch, keep: ColumnFilter = None, whole: ColumnFilter = None) -> pd.DataFrame:
+    """Decode to pandas; top-level fields `whole` accepts are not flattened and come last."""
+    table = data if isinstance(data, pa.Table) else pa.Table.from_batches([data])
+    held = {}
+    if whole is not None:
+        held = {
+            name: table.column(name).to_pylist()
+            for name in table.column_names
+            if whole(name) and (keep is None or keep(name))
+        }
+        table = table.drop_columns([name for name in table.column_names if whole(name)])
+    table = _flatten(table)
+    if keep is not None:
+        table = table.select([name for name in table.column_names if keep(name)])
+    df = table.to_pandas(types_mapper=_pandas_type, date_as_object=False)
+    for name, values in held.items():
+        df[name] = pd.Series(values, index=df.index, dtype=object)
+    return df
+
+
+def _open_ipc(path: str) -> pa.Table:
+    """Map an Arrow IPC file (or stream) into a zero-copy Table."""
+    source = pa.memory_map(path)
+    try:
+        return pa.ipc.open_file(source).read_all()
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return pa.ipc.open_stream(source).read_all()
+
+
+def _read_table(path: str, ext: str) -> pa.Table:
+    try:
+        return _open_ipc(path)
+    except pa.ArrowInvalid as e:
+        raise ValidationError(f"Could not read .{ext} file", detail=str(e)[:300])
+
+
+def _decode_jsonl(content: bytes, first_line: int = 1) -> pa.Table:
+    try:
+        return pj.read_json(io.BytesIO(content))
+    except pa.ArrowInvalid as e:
+        detail = str(e) if first_line == 1 else f"In the block from line {first_line}: {e}"
+        raise ValidationError("Could not read .jsonl file", detail=detail[:300])
+
+
+def _open_parquet(path: str) -> pq.ParquetFile:
+    try:
+        return pq.ParquetFile(path, memory_map=True)
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ValidationError("Could not read .parquet file", detail=str(e)[:300])
+
+
+def iter_parquet(path: str, chunk_rows: int, keep: ColumnFilter = None) -> Iterator[pd.DataFrame]:
+    parquet = _open_parquet(path)
+    columns = _projected_fields(parquet.schema_arrow, keep)
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+        yield to_frame(batch, keep)
+
+
+def iter_jsonl(
+    path: str, chunk_rows: int, keep: ColumnFilter = None, whole: ColumnFilter = None
+) -> Iterator[pd.DataFrame]:
+    """Chunks of a JSON Lines file, each decoded from the next `chunk_rows` lines.
+
+    Each block infers its own types; the sniff widens them across chunks as
+    it does for CSV.
+    """
+    with open(path, "rb") as f:
+        first_line = 1
+        while lines := list(itertools.islice(f, chunk_rows)):
+            table = _decode_jsonl(b"".join(lines), first_line)
+            first_line += len(lines)
+            if not table.num_rows:
+                continue  # blank lines only
+            columns = _projected_fields(table.schema, keep)
+            if columns is not None:
+                table = table.select(columns)
+            yield to_frame(table, keep, whole)
+
+
+def iter_table(
+    path: str, ext: str, chunk_rows: int, keep: ColumnFilter = None, whole: ColumnFilter = None
+) -> Iterator[pd.DataFrame]:
+    """Chunks of an Arrow IPC file, sliced from its memory-mapped Table."""
+    table = _read_table(path, ext)
+    columns = _projected_fields(table.schema, keep)
+    if columns is not None:
+        table = table.select(columns)
+    for batch in table.to_batches(max_chunksize=chunk_rows):
+        yield to_frame(batch, keep, whole)
+
+
+def sample_parquet(path: str, rows: int) -> tuple[pd.DataFrame, int]:
+    """The first `rows` rows plus the exact row count from the file footer."""
+    parquet = _open_parquet(path)
+    try:
+        batch = next(parquet.iter_batches(batch_size=rows), None)
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ValidationError("Could not read .parquet file", detail=str(e)[:300])
+    data = batch if batch is not None else parquet.schema_arrow.empty_table()
+    return to_frame(data), parquet.metadata.num_rows
+
+
+def sample_ipc(path: str, rows: int) -> tuple[pd.DataFrame, int]:
+    table = _read_table(path, "arrow")
+    return to_frame(table.slice(0, rows)), table.num_rows
+
+
+def read_jsonl_bytes(content: bytes, whole: ColumnFilter = None) -> pd.DataFrame:
+    return to_frame(_decode_jsonl(content), whole=whole)
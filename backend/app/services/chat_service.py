@@ -8,7 +8,7 @@ from app.middleware.error_handler import AppError, ValidationError
 from app.middleware.input_guard import validate_chat_message, validate_collection_name
 from app.models.chat import ChatMessage, VisualizationData
 from app.repositories import chat_repo, metadata_repo, query_repo
-from app.services import llm_service
+from app.services import index_advisor, llm_service
 
 
 def extract_collection_refs(message: str) -> list[tuple[str, str | None]]:
@@ -96,8 +96,9 @@ async def handle_message(
     query_type = query_response.get("query_type", "sql")
     collection_name = query_response.get("collection_name", "")
 
-    # 6. Execute the query
+    # 6. Execute the query, then count its filter columns for the index advisor
     results = await _execute_query(session, query, query_type, collection_name)
+    await index_advisor.learn_from_query(query, query_type, collection_name, schemas)
 
     # 7. Ask LLM to generate natural language answer from results
     answer_response = await llm_service.generate_answer(
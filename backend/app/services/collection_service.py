@@ -1,7 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.middleware.input_guard import validate_collection_name
-from app.repositories import metadata_repo
+from app.repositories import column_usage_repo, metadata_repo
 from app.services.upload_service import drop_existing_postgres, drop_existing_mongodb
 
 
@@ -71,4 +71,5 @@ async def delete_collection(session: AsyncSession, owner_id: str, name: str) ->
         await drop_existing_mongodb(name)
 
     await metadata_repo.delete_metadata(owner_id, name)
+    await column_usage_repo.delete_usage(owner_id, db_type, name)
     return True
@@ -0,0 +1,170 @@
+"""Executors that keep CPU-bound parse/clean/sniff work off the event loop.
+
+Two paths, matching the two shapes that work takes:
+
+- `run(fn, *args)` - a self-contained job such as sniffing a spooled file -
+  runs in its own worker process, forked from a forkserver that has pandas
+  and the upload pipeline preloaded (a few ms per job). The child gets an
+  address-space budget of `cpu_job_memory_mb` on top of what it starts with
+  and is killed after `cpu_job_timeout_seconds`; at most `cpu_pool_workers`
+  run at once. With `cpu_pool_kind="thread"` jobs use the thread pool
+  instead: no memory cap, and the time limit only stops the wait.
+- `iterate(chunks)` - the chunks of a load are a generator, which cannot
+  cross a process boundary, so each item is pulled on the thread pool.
+  pandas' C parser and pyarrow release the GIL while they work, and the
+  pure-Python stretches are preempted every few ms, so the event loop keeps
+  serving other requests either way.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import resource
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from app.config import settings
+from app.middleware.error_handler import AppError, ValidationError
+
+T = TypeVar("T")
+
+PRELOAD_MODULES = ["app.services.upload_service"]
+
+_DONE = object()
+_threads: ThreadPoolExecutor | None = None
+_slots: asyncio.Semaphore | None = None
+_mp_context = None
+
+
+def pool_size() -> int:
+    return settings.cpu_pool_workers or os.cpu_count() or 1
+
+
+def _thread_pool() -> ThreadPoolExecutor:
+    global _threads
+    if _threads is None:
+        _threads = ThreadPoolExecutor(max_workers=pool_size(), thread_name_prefix="cpu")
+    return _threads
+
+
+def _semaphore() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(pool_size())
+    return _slots
+
+
+def _context():
+    global _mp_context
+    if _mp_context is None:
+        _mp_context = multiprocessing.get_context("forkserver")
+        _mp_context.set_forkserver_preload(PRELOAD_MODULES)
+    return _mp_context
+
+
+def _limit_memory(budget_mb: int) -> None:
+    """Cap the address space at what the process maps now plus budget_mb."""
+    with open("/proc/self/statm") as f:
+        current = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    limit = current + budget_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _child(conn, fn: Callable, args: tuple, budget_mb: int) -> None:
+    try:
+        if budget_mb:
+            _limit_memory(budget_mb)
+        outcome = ("ok", fn(*args))
+    except MemoryError:
+        outcome = ("memory", None)
+    except AppError as exc:
+        outcome = ("app_error", (exc.message, exc.status_code, exc.detail))
+    except Exception as exc:
+        outcome = ("error", f"{type(exc).__name__}: {exc}")
+    try:
+        conn.send(outcome)
+    except Exception as exc:
+        conn.send(("error", f"Result could not be returned: {exc}"))
+    finally:
+        conn.close()
+
+
+def _timeout_error() -> ValidationError:
+    return ValidationError(
+        f"Processing the file took longer than {settings.cpu_job_timeout_seconds}s"
+    )
+
+
+async def _run_forked(fn: Callable, args: tuple) -> Any:
+    loop = asyncio.get_running_loop()
+    ctx = _context()
+    receiver, sender = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_child, args=(sender, fn, args, settings.cpu_job_memory_mb), daemon=True)
+    try:
+        await loop.run_in_executor(_thread_pool(), proc.start)
+        sender.close()
+
+        ready = loop.create_future()
+        loop.add_reader(receiver.fileno(), lambda: ready.done() or ready.set_result(None))
+        try:
+            await asyncio.wait_for(ready, settings.cpu_job_timeout_seconds)
+        except TimeoutError:
+            raise _timeout_error() from None
+        finally:
+            loop.remove_reader(receiver.fileno())
+
+        try:
+            status, payload = await loop.run_in_executor(_thread_pool(), receiver.recv)
+        except EOFError:
+            status, payload = "died", None
+    finally:
+        receiver.close()
+        if proc.is_alive():
+            proc.kill()
+        if proc.pid is not None:
+            await loop.run_in_executor(_thread_pool(), proc.join)
+
+    if status == "ok":
+        return payload
+    if status == "app_error":
+        message, status_code, detail = payload
+        raise AppError(message, status_code=status_code, detail=detail)
+    if status == "memory":
+        raise ValidationError(f"Processing the file needs more than {settings.cpu_job_memory_mb}MB of memory")
+    if status == "died":
+        raise AppError(f"File processing worker exited unexpectedly (code {proc.exitcode})", status_code=500)
+    raise AppError(f"File processing failed: {payload}", status_code=500)
+
+
+async def run(fn: Callable[..., T], *args) -> T:
+    """Run fn(*args) off the event loop under the per-job memory and time limits.
+
+    fn and args must be picklable (a module-level function and plain data).
+    """
+    async with _semaphore():
+        if settings.cpu_pool_kind == "thread":
+            loop = asyncio.get_running_loop()
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(_thread_pool(), fn, *args), settings.cpu_job_timeout_seconds
+                )
+            except TimeoutError:
+                raise _timeout_error() from None
+        return await _run_forked(fn, args)
+
+
+async def iterate(items: Iterable[T] | AsyncIterable[T]) -> AsyncIterator[T]:
+    """Iterate `items`, computing each next item on the thread pool."""
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+        return
+
+    loop = asyncio.get_running_loop()
+    it = iter(items)
+    while True:
+        item = await loop.run_in_executor(_thread_pool(), next, it, _DONE)
+        if item is _DONE:
+            return
+        yield item
@@ -0,0 +1,113 @@
+"""Nested JSON records loaded into MongoDB as they were written, without pandas.
+
+A JSON or JSONL upload bound for MongoDB would otherwise be flattened by
+`pd.json_normalize` into dotted columns, cleaned and typed as a DataFrame
+and rebuilt into documents. Here the decoded records (wrapper objects
+unwrapped, GeoJSON features with their properties lifted next to a native
+`geometry` object) go to insert_many in batches as they stream past. Only
+leaf values are touched: strings are stripped and empty ones become null,
+NaN becomes null, and a text leaf whose dotted path the sample sniff typed
+as a number, boolean or datetime is converted when it parses as one. Keys
+MongoDB cannot store as written (a leading "$", a ".") get "_" instead, and
+a top-level "_row_hash" becomes "_row_hash_", as a column would.
+"""
+
+import itertools
+import json
+import math
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Any, BinaryIO
+
+from app.middleware.error_handler import ValidationError
+from app.services import json_stream
+from app.services.row_delta import ROW_HASH_COLUMN
+
+DOCUMENT_EXTENSIONS = ("json", "jsonl")
+BATCH_DOCUMENTS = 10_000  # documents built per pull from the thread pool
+_TYPED_DTYPES = ("integer", "float", "boolean", "datetime")
+
+LeafTypes = dict[str, tuple[str, str | None]]  # dotted path -> (dtype, datetime format)
+
+
+def iter_jsonl(f: BinaryIO) -> Iterator[Any]:
+    """The records of a JSON Lines file, one per non-blank line."""
+    for number, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+            raise ValidationError(f"Invalid JSON on line {number}: {exc}") from exc
+
+
+def iter_records(f: BinaryIO, ext: str) -> Iterator[Any]:
+    if ext == "jsonl":
+        return iter_jsonl(f)
+    return iter(json_stream.JsonRecordStream(f, documents=True))
+
+
+def leaf_types(columns: list[dict]) -> LeafTypes:
+    """The sniffed type of each dotted path that text leaves may be converted to."""
+    return {c["name"]: (c["dtype"], c.get("datetime_format")) for c in columns if c["dtype"] in _TYPED_DTYPES}
+
+
+def _clean_key(key: str) -> str:
+    key = key.replace(".", "_")
+    return "_" + key[1:] if key.startswith("$") else key
+
+
+def _from_text(text: str, dtype: str, fmt: str | None) -> Any:
+    try:
+        if dtype == "integer":
+            try:
+                return int(text)
+            except ValueError:
+                number = float(text)
+                return int(number) if number.is_integer() else number
+        if dtype == "float":
+            return float(text)
+        if dtype == "boolean":
+            return {"true": True, "false": False}.get(text.lower(), text)
+        if fmt in (None, "ISO8601"):
+            return datetime.fromisoformat(text)
+        return datetime.strptime(text, fmt)
+    except ValueError:
+        return text
+
+
+def _coerce(value: Any, types: LeafTypes, path: str) -> Any:
+    if isinstance(value, dict):
+        doc = {}
+        for k, v in value.items():
+            key = _clean_key(str(k))
+            doc[key] = _coerce(v, types, f"{path}.{key}" if path else key)
+        return doc
+    if isinstance(value, list):
+        return [_coerce(v, types, path) for v in value]
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+        typed = types.get(path)
+        return _from_text(value, *typed) if typed else value
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def to_document(record: Any, types: LeafTypes) -> dict:
+    """One record as a document to insert; a record that is not an object is stored under "value"."""
+    if not isinstance(record, dict):
+        record = {"value": record}
+    doc = _coerce(record, types, "")
+    if ROW_HASH_COLUMN in doc:
+        doc[f"{ROW_HASH_COLUMN}_"] = doc.pop(ROW_HASH_COLUMN)  # taken by the hidden row hash
+    return doc
+
+
+def iter_documents(f: BinaryIO, ext: str, types: LeafTypes) -> Iterator[list[dict]]:
+    """Batches of BATCH_DOCUMENTS documents built from the records of a JSON or JSONL file."""
+    records = iter_records(f, ext)
+    while batch := list(itertools.islice(records, BATCH_DOCUMENTS)):
+        yield [to_document(record, types) for record in batch]
@@ -0,0 +1,266 @@
+"""Index advisor for ingested collections.
+
+After a load, columns are indexed from the sniff's statistics: a B-tree on
+selective categorical columns (enough distinct values for an equality filter
+or group to pick out a small share of rows, few enough to be a category
+rather than free text) and a BRIN on integer/datetime columns that only grow
+in file order, where a block-range index a few pages long serves range
+filters. JSONB columns get a GIN index (jsonb_path_ops), which serves
+containment (@>) and jsonpath (@?, @@) filters on any path inside them.
+MongoDB gets a single-field index for the B-tree and BRIN cases. Small
+collections get none, as a sequential scan is cheap there.
+
+Executed queries teach it too: every column in a WHERE clause or a leading
+$match stage is counted, and one filtered on LEARN_THRESHOLD times gets an
+index even when its statistics did not call for one.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from pymongo import ASCENDING
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.mongodb import get_mongodb
+from app.db.postgres import engine
+from app.repositories import column_usage_repo
+
+logger = logging.getLogger(__name__)
+
+MIN_ROWS = 10_000  # below this a sequential scan is cheap enough
+MIN_DISTINCT = 10  # fewer values than this and one value is too large a share of the rows to seek to
+MAX_INDEXES = 8  # advised indexes per collection, learned columns first
+LEARN_THRESHOLD = 3  # filters on a column before it gets an index of its own
+_BTREE_DTYPES = ("string", "integer", "datetime")
+_BRIN_DTYPES = ("integer", "datetime")
+
+_SQL_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_SQL_IDENTIFIER_RE = re.compile(r'"([^"]+)"|\b([a-z_][a-z0-9_]*)\b', re.IGNORECASE)
+_SQL_CLAUSE_AFTER_WHERE = r"group\s+by|order\s+by|having|limit|offset|union|intersect|except|window|fetch"
+_SQL_WHERE_RE = re.compile(rf"\bwhere\b(.*?)(?=\b(?:{_SQL_CLAUSE_AFTER_WHERE})\b|$)", re.IGNORECASE | re.DOTALL)
+
+_background: set[asyncio.Task] = set()
+
+
+@dataclass(frozen=True)
+class IndexPlan:
+    column: str
+    kind: str  # "btree", "brin" (MongoDB builds a single-field index for both) or "gin" (Postgres JSONB only)
+
+
+def _kind(col: dict) -> str | None:
+    if col.get("sql_type") == "JSONB":
+        return "gin"
+    distinct = col.get("distinct_count")
+    if col.get("monotonic") and col["dtype"] in _BRIN_DTYPES and distinct is None:
+        return "brin"
+    if col["dtype"] in _BTREE_DTYPES and distinct is not None and distinct >= MIN_DISTINCT:
+        return "btree"
+    return None
+
+
+def advise(columns: list[dict], row_count: int, filtered: Iterable[str] = ()) -> list[IndexPlan]:
+    """Indexes worth building for a collection, from its column statistics and learned filter columns."""
+    if row_count < MIN_ROWS:
+        return []
+    by_name = {c["name"]: c for c in columns}
+    plans: dict[str, IndexPlan] = {}
+    for name in filtered:
+        col = by_name.get(name)
+        if col is not None and col["dtype"] != "object":
+            plans[name] = IndexPlan(name, "brin" if _kind(col) == "brin" else "btree")
+    for col in columns:
+        kind = _kind(col)
+        if kind and col["name"] not in plans:
+            plans[col["name"]] = IndexPlan(col["name"], kind)
+    return list(plans.values())[:MAX_INDEXES]
+
+
+def index_name(table: str, plan: IndexPlan) -> str:
+    digest = hashlib.md5(f"{table}.{plan.column}.{plan.kind}".encode()).hexdigest()[:8]
+    return f"{plan.column[:40]}_{plan.kind}_{digest}"
+
+
+def _create_index_sql(table: str, plan: IndexPlan, concurrently: bool = False) -> str:
+    how = "CONCURRENTLY " if concurrently else ""
+    opclass = " jsonb_path_ops" if plan.kind == "gin" else ""
+    return (
+        f'CREATE INDEX {how}IF NOT EXISTS "{index_name(table, plan)}" '
+        f'ON "{table}" USING {plan.kind} ("{plan.column}"{opclass})'
+    )
+
+
+_INDEXED_COLUMNS_SQL = text(
+    "SELECT a.attname FROM pg_index i "
+    "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0] "
+    "WHERE i.indrelid = to_regclass(:table)"
+)
+
+
+async def _indexed_columns(conn: Any, table: str) -> set[str]:
+    """Columns that already lead an index of the table."""
+    result = await conn.execute(_INDEXED_COLUMNS_SQL, {"table": f'"{table}"'})
+    return {row[0] for row in result}
+
+
+async def learned_columns(owner_id: str, db_type: str, collection_name: str) -> list[str]:
+    counts = await column_usage_repo.get_filter_counts(owner_id, db_type, collection_name)
+    return [col for col, count in counts.items() if count >= LEARN_THRESHOLD]
+
+
+async def index_postgres(
+    session: AsyncSession, table: str, owner_id: str, collection_name: str, columns: list[dict], row_count: int
+) -> list[str]:
+    """Build the advised indexes on `table` (the staging table of owner_id's collection_name, or the table itself).
+
+    Runs in the caller's transaction; returns the indexes built.
+    """
+    if row_count < MIN_ROWS:
+        return []
+    plans = advise(columns, row_count, await learned_columns(owner_id, "postgres", collection_name))
+    indexed = await _indexed_columns(session, table)
+    created = []
+    for plan in plans:
+        if plan.column not in indexed:
+            await session.execute(text(_create_index_sql(table, plan)))
+            created.append(index_name(table, plan))
+    return created
+
+
+async def index_mongodb(
+    collection: str, owner_id: str, collection_name: str, columns: list[dict], row_count: int
+) -> list[str]:
+    """Build the advised single-field indexes on `collection` (owner_id's collection_name, or its staging copy)."""
+    if row_count < MIN_ROWS:
+        return []
+    plans = advise(columns, row_count, await learned_columns(owner_id, "mongodb", collection_name))
+    plans = [plan for plan in plans if plan.kind != "gin"]
+    db = get_mongodb()
+    return [await db[collection].create_index([(plan.column, ASCENDING)]) for plan in plans]
+
+
+def sql_filter_columns(query: str, schemas: list[dict]) -> dict[str, list[str]]:
+    """Columns of each referenced Postgres collection that appear in the query's WHERE clauses."""
+    query = _SQL_STRING_RE.sub("''", query)
+
+    def identifiers(sql: str) -> set[str]:
+        return {(quoted or bare).lower() for quoted, bare in _SQL_IDENTIFIER_RE.findall(sql)}
+
+    referenced = identifiers(query)
+    in_where: set[str] = set()
+    for clause in _SQL_WHERE_RE.findall(query):
+        in_where |= identifiers(clause)
+
+    filtered = {}
+    for schema in schemas:
+        if schema.get("db_type") != "postgres" or schema["name"] not in referenced:
+            continue
+        cols = [c["name"] for c in schema.get("columns", []) if c["name"] in in_where]
+        if cols:
+            filtered[schema["name"]] = cols
+    return filtered
+
+
+def _match_fields(expr: Any, fields: set[str]) -> None:
+    if not isinstance(expr, dict):
+        return
+    for key, value in expr.items():
+        if key in ("$and", "$or", "$nor") and isinstance(value, list):
+            for item in value:
+                _match_fields(item, fields)
+        elif not key.startswith("$"):
+            fields.add(key)
+
+
+def match_filter_columns(pipeline: list, columns: list[dict]) -> list[str]:
+    """Columns filtered by the pipeline's leading $match stages, the only ones an index can serve."""
+    fields: set[str] = set()
+    for stage in pipeline:
+        if not isinstance(stage, dict) or "$match" not in stage:
+            break
+        _match_fields(stage["$match"], fields)
+    return [c["name"] for c in columns if c["name"] in fields]
+
+
+async def learn_from_query(query: Any, query_type: str, collection_name: str, schemas: list[dict]) -> None:
+    """Count the filter columns of an executed query and index those that just reached LEARN_THRESHOLD.
+
+    Never raises: learning is best effort and must not fail the chat turn.
+    Indexes are built in the background, concurrently with reads.
+    """
+    try:
+        if query_type == "sql":
+            db_type, filtered = "postgres", sql_filter_columns(query, schemas)
+        elif query_type == "mongodb":
+            db_type = "mongodb"
+            pipeline = json.loads(query) if isinstance(query, str) else query
+            pipeline = pipeline if isinstance(pipeline, list) else [pipeline]
+            schema = next((s for s in schemas if s["name"] == collection_name and s["db_type"] == db_type), None)
+            cols = match_filter_columns(pipeline, schema.get("columns", [])) if schema else []
+            filtered = {collection_name: cols} if cols else {}
+        else:
+            return
+
+        for name, cols in filtered.items():
+            schema = next(s for s in schemas if s["name"] == name and s["db_type"] == db_type)
+            counts = await column_usage_repo.record_filters(schema["owner_id"], db_type, name, cols)
+            learned = [col for col in cols if counts.get(col) == LEARN_THRESHOLD]
+            if learned:
+                _spawn(_index_learned(db_type, schema, learned))
+    except Exception:
+        logger.exception("Learning filter columns from a query failed")
+
+
+def _spawn(coro) -> None:
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _index_postgres_concurrently(table: str, plans: list[IndexPlan]) -> None:
+    async with engine.connect() as conn:
+        # CREATE INDEX CONCURRENTLY keeps the table writable; it cannot run in a transaction
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        indexed = await _indexed_columns(conn, table)
+        for plan in plans:
+            if plan.column in indexed:
+                continue
+            try:
+                await conn.execute(text(_create_index_sql(table, plan, concurrently=True)))
+            except Exception:
+                # A failed concurrent build leaves an invalid index that IF NOT EXISTS would keep
+                await conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name(table, plan)}"'))
+                raise
+
+
+async def _index_postgres_partitioned(table: str, plans: list[IndexPlan]) -> None:
+    # A partitioned table's index cannot be built concurrently; this build blocks writes while it runs
+    async with engine.begin() as conn:
+        indexed = await _indexed_columns(conn, table)
+        for plan in plans:
+            if plan.column not in indexed:
+                await conn.execute(text(_create_index_sql(table, plan)))
+
+
+async def _index_learned(db_type: str, schema: dict, learned: list[str]) -> None:
+    name = schema["name"]
+    plans = [p for p in advise(schema.get("columns", []), schema.get("row_count", 0), learned) if p.column in learned]
+    try:
+        if db_type == "mongodb":
+            collection = get_mongodb()[name]
+            for plan in plans:
+                await collection.create_index([(plan.column, ASCENDING)])
+        elif schema.get("partition"):
+            await _index_postgres_partitioned(name, plans)
+        else:
+            await _index_postgres_concurrently(name, plans)
+        logger.info("Indexed %s:%s on learned filter columns %s", db_type, name, [p.column for p in plans])
+    except Exception:
+        logger.exception("Building learned indexes on %s:%s failed", db_type, name)
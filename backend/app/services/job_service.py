@@ -0,0 +1,585 @@
+"""Background ingestion jobs.
+
+/upload/confirm records a job in MongoDB and returns at once; a bounded pool
+of in-process workers claims queued jobs atomically and runs the parse ->
+DDL -> load pipeline outside the request. Running jobs send a heartbeat with
+their progress; a job whose worker died (no heartbeat for
+`ingest_job_stale_seconds`) is re-queued and restarted from its stored
+upload, so job state survives worker restarts; the upload stays pinned in
+the store (exempt from its TTL and eviction) while any job needs it. A cancel flags the job in
+MongoDB, which the owning worker picks up on its next heartbeat. Jobs create,
+overwrite, append to or upsert into their target (see IngestJob.mode). A
+worker only claims a job that fits the process's memory budget, and confirm
+is refused while the queue is full (see admission).
+"""
+
+import asyncio
+import contextlib
+import logging
+import math
+import uuid
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from app.config import settings
+from app.db.postgres import async_session
+from app.middleware.error_handler import AppError, NotFoundError, TooManyRequestsError
+from app.models.ingest_job import INCREMENTAL_MODES, IngestJob
+from app.repositories import job_repo, metadata_repo
+from app.schemas.upload import UploadResponse
+from app.services import admission, column_profile, index_advisor, partitioning, upload_service, upload_store
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 5.0  # idle workers re-check the queue at least this often
+HEARTBEAT_SECONDS = 2.0
+RETRY_AFTER_SECONDS = (5, 300)  # bounds of the Retry-After given when the queue is full
+
+_worker_id = uuid.uuid4().hex[:12]  # identifies this process's workers in job documents
+_wake: asyncio.Event | None = None
+_tasks: list[asyncio.Task] = []
+_running: dict[str, asyncio.Task] = {}
+_claiming = asyncio.Lock()  # one claim at a time, so two workers never both take the same headroom
+
+
+class _Progress:
+    """Counts rows as the loader pulls chunks; a chunk counts once the next one is requested."""
+
+    def __init__(self, job: dict):
+        self.total_rows = job.get("total_rows", 0)
+        self.total_bytes = job.get("total_bytes", 0)
+        self.rows_written = 0
+
+    def track(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        for df in chunks:
+            yield df
+            self.rows_written += len(df)
+
+    @property
+    def bytes_processed(self) -> int:
+        if not self.total_rows:
+            return 0
+        return min(self.total_bytes, round(self.total_bytes * self.rows_written / self.total_rows))
+
+    def fields(self) -> dict:
+        return {
+            "rows_written": self.rows_written,
+            "bytes_processed": self.bytes_processed,
+            "total_rows": self.total_rows,
+        }
+
+
+async def admit(memory_mb: int) -> None:
+    """Refuse a new job (429) while the jobs already queued are estimated above `ingest_queue_max_mb`.
+
+    An empty queue always takes the job. Retry-After is when the running job
+    closest to finishing expects to be done.
+    """
+    limit = settings.ingest_queue_max_mb
+    if not limit:
+        return
+    queued = await job_repo.queued_memory_mb()
+    if not queued or queued + memory_mb <= limit:
+        return
+    admission.record_rejection()
+    etas = [job_progress(job)["eta_seconds"] for job in await job_repo.list_running()]
+    etas = [eta for eta in etas if eta is not None]
+    low, high = RETRY_AFTER_SECONDS
+    retry_after = min(max(math.ceil(min(etas)), low), high) if etas else high
+    raise TooManyRequestsError(
+        f"The ingestion queue is full ({queued}MB of estimated memory waiting). Try again later.",
+        retry_after=retry_after,
+    )
+
+
+def _pin_uploads(tokens: Iterable[str]) -> None:
+    # Two sweeps' worth, so a pin never lapses between renewals
+    upload_store.pin(tokens, max(settings.ingest_job_stale_seconds, 2))
+
+
+async def check_target_free(db_type: str, name: str, existing: dict | None) -> None:
+    """Refuse (409) to create `name` in db_type while someone else's table or collection has that name.
+
+    Table and collection names are global while metadata, and so ownership,
+    is per owner: `existing` is the caller's metadata for the name, if any.
+    """
+    if existing and existing["db_type"] == db_type:
+        return
+    if db_type == "postgres":
+        async with async_session() as session:
+            taken = await upload_service.postgres_table_exists(session, name)
+    else:
+        taken = await upload_service.mongodb_collection_exists(name)
+    if taken:
+        raise AppError(f"'{name}' is already used by another collection. Choose another name.", status_code=409)
+
+
+async def enqueue(job: IngestJob) -> dict:
+    _pin_uploads([job.upload_token])
+    doc = await job_repo.create_job(job)
+    if _wake is not None:
+        _wake.set()
+    return doc
+
+
+async def get_job(owner_id: str, job_id: str) -> dict:
+    job = await job_repo.get_job(owner_id, job_id)
+    if job is None:
+        raise NotFoundError("Ingestion job not found")
+    return job
+
+
+async def cancel_job(owner_id: str, job_id: str) -> dict:
+    job = await job_repo.request_cancel(owner_id, job_id)
+    if job is None:
+        raise NotFoundError("Ingestion job not found")
+    task = _running.get(job_id)
+    if task is not None:
+        task.cancel()
+    return job
+
+
+def _parse_time(value) -> datetime | None:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def job_progress(job: dict) -> dict:
+    """Throughput (rows/s) and ETA (seconds) for a job document."""
+    started = _parse_time(job.get("started_at"))
+    if started is None:
+        return {"rows_per_sec": 0.0, "eta_seconds": None}
+    end = _parse_time(job.get("finished_at")) or datetime.now(timezone.utc)
+    elapsed = (end - started).total_seconds()
+    rows = job.get("rows_written", 0)
+    rate = rows / elapsed if elapsed > 0 else 0.0
+
+    eta = None
+    if job["status"] == "running" and rate > 0:
+        eta = max(job.get("total_rows", 0) - rows, 0) / rate
+    elif job["status"] == "succeeded":
+        eta = 0.0
+    return {"rows_per_sec": round(rate, 1), "eta_seconds": None if eta is None else round(eta, 1)}
+
+
+async def start() -> None:
+    """Start the worker pool and the stale-job sweeper (app startup)."""
+    global _wake
+    _wake = asyncio.Event()
+    _tasks.extend(asyncio.create_task(_worker()) for _ in range(settings.ingest_workers))
+    _tasks.append(asyncio.create_task(_sweeper()))
+
+
+async def stop() -> None:
+    """Stop the workers; jobs they were running go back to the queue (app shutdown)."""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+
+async def _claim() -> dict | None:
+    async with _claiming:
+        job = await job_repo.claim_next(
+            _worker_id, admission.headroom_mb(), settings.ingest_queue_max_wait_seconds
+        )
+        if job is not None:
+            admission.reserve(job["job_id"], job.get("memory_mb", 0))
+        return job
+
+
+async def _worker() -> None:
+    while True:
+        try:
+            job = await _claim()
+        except Exception:
+            logger.exception("Failed to claim an ingestion job")
+            job = None
+        if job is None:
+            _wake.clear()
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(_wake.wait(), POLL_SECONDS)
+            continue
+        await _run(job)
+
+
+async def _sweeper() -> None:
+    interval = max(settings.ingest_job_stale_seconds / 2, 1)
+    while True:
+        try:
+            _pin_uploads(await job_repo.active_upload_tokens())
+        except Exception:
+            logger.exception("Failed to pin the uploads of ingestion jobs")
+        try:
+            requeued = await job_repo.requeue_stale(
+                settings.ingest_job_stale_seconds, settings.ingest_job_max_attempts
+            )
+            if requeued:
+                logger.info("Re-queued %d stale ingestion jobs", requeued)
+                _wake.set()
+        except Exception:
+            logger.exception("Stale ingestion job sweep failed")
+        await asyncio.sleep(interval)
+
+
+async def _heartbeat(job_id: str, attempt: int, progress: _Progress, ingest: asyncio.Task) -> None:
+    while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        with contextlib.suppress(Exception):
+            if await job_repo.heartbeat(job_id, _worker_id, attempt, **progress.fields()):
+                # Cancelled, or re-queued as stale: either way this worker must stop writing
+                ingest.cancel()
+
+
+async def _run(job: dict) -> None:
+    job_id, attempt = job["job_id"], job.get("attempts", 0)
+    progress = _Progress(job)
+    ingest = asyncio.create_task(_ingest_within_limit(job, progress))
+    _running[job_id] = ingest
+    beat = asyncio.create_task(_heartbeat(job_id, attempt, progress, ingest))
+    try:
+        result = await ingest
+    except asyncio.CancelledError:
+        if asyncio.current_task().cancelling():
+            # Shutting down: leave the job for the next worker to restart
+            await job_repo.requeue_job(job_id, _worker_id, attempt)
+            raise
+        await job_repo.finish_job(job_id, _worker_id, attempt, "cancelled", "Cancelled", **progress.fields())
+    except AppError as exc:
+        await job_repo.finish_job(job_id, _worker_id, attempt, "failed", exc.message, **progress.fields())
+    except Exception:
+        logger.exception("Ingestion job %s failed", job_id)
+        await job_repo.finish_job(
+            job_id, _worker_id, attempt, "failed", "Ingestion failed unexpectedly", **progress.fields()
+        )
+    else:
+        await job_repo.finish_job(
+            job_id,
+            _worker_id,
+            attempt,
+            "succeeded",
+            result=result,
+            rows_written=progress.rows_written,
+            total_rows=progress.rows_written,
+            bytes_processed=progress.total_bytes,
+        )
+    finally:
+        beat.cancel()
+        _running.pop(job_id, None)
+        admission.release(job_id)
+        if _wake is not None:
+            _wake.set()  # the freed budget may fit a job the other workers had to leave queued
+
+
+async def _drop_target(db_type: str, collection_name: str) -> None:
+    if db_type == "postgres":
+        async with async_session() as session:
+            await upload_service.drop_existing_postgres(session, collection_name)
+    else:
+        await upload_service.drop_existing_mongodb(collection_name)
+
+
+async def _drop_stagings(job: dict) -> None:
+    """Drop the staging targets of this attempt and every earlier one."""
+    for attempt in range(job.get("attempts", 0) + 1):
+        await _drop_target(job["db_type"], upload_service.staging_name(job["collection_name"], job["job_id"], attempt))
+
+
+async def _ingest_within_limit(job: dict, progress: _Progress) -> dict:
+    minutes = settings.ingest_job_timeout_minutes
+    try:
+        async with asyncio.timeout(minutes * 60):
+            return await _ingest(job, progress)
+    except TimeoutError:
+        raise AppError(f"Ingestion took longer than {minutes} minutes") from None
+
+
+async def _ingest(job: dict, progress: _Progress) -> dict:
+    """Run one job: resolve its stored upload, then create, replace or add to the target."""
+    owner_id, name, mode = job["owner_id"], job["collection_name"], job["mode"]
+
+    existing = await metadata_repo.get_owned_by_name(owner_id, name)
+    if mode in INCREMENTAL_MODES:
+        if not existing:
+            raise NotFoundError(f"Collection '{name}' not found. Upload it before appending to it.")
+        return await _ingest_incremental(job, existing, progress)
+    if existing and mode != "overwrite":
+        raise AppError(f"Collection '{name}' already exists. Set overwrite to replace it.", status_code=409)
+    return await _ingest_full(job, existing, progress)
+
+
+def _loads_as_documents(job: dict, existing: dict | None) -> bool:
+    """Whether the job loads its JSON into MongoDB as nested documents (see upload_service.document_source).
+
+    A full load does whenever it can; an incremental load only into a
+    collection that was loaded that way, so a collection keeps one shape.
+    """
+    if job["mode"] in INCREMENTAL_MODES:
+        eligible = bool(existing and existing.get("nested"))
+    else:
+        eligible = job["db_type"] == "mongodb"
+    return eligible and upload_service.loads_as_documents(job["owner_id"], job["upload_token"], job["columns"])
+
+
+def _source(job: dict, as_documents: bool = False):
+    if as_documents:
+        return upload_service.document_source(job["owner_id"], job["upload_token"])
+    return upload_service.upload_source(
+        job["owner_id"],
+        upload_token=job["upload_token"],
+        columns=job["columns"],
+        sheet=job.get("sheet"),
+        discard=False,
+    )
+
+
+async def _discard_upload(job: dict) -> None:
+    # Sheets of one workbook share the stored upload; the last job to finish drops it
+    if not await job_repo.has_other_active_for_token(job["upload_token"], job["job_id"]):
+        upload_store.discard(job["upload_token"])
+
+
+async def _ingest_full(job: dict, existing: dict | None, progress: _Progress) -> dict:
+    """Load the whole upload into a staging table/collection, index it, then swap it in for the target.
+
+    The live target is untouched until the swap, so readers never see it
+    missing or half-loaded and a failed load leaves the old data in place.
+    Data some collection the owner can see already holds is copied from it
+    instead (see _copy_full).
+    """
+    owner_id, name, db_type = job["owner_id"], job["collection_name"], job["db_type"]
+    await check_target_free(db_type, name, existing)
+    content_hash = None
+    if job.get("content_hash"):
+        content_hash = upload_service.dataset_hash(job["content_hash"], job.get("sheet"), job["columns"])
+        duplicate = await metadata_repo.find_by_content_hash(owner_id, content_hash, db_type)
+        if duplicate is not None:
+            return await _copy_full(job, existing, duplicate, content_hash, progress)
+    staging = upload_service.staging_name(name, job["job_id"], job.get("attempts", 0))
+
+    as_documents = _loads_as_documents(job, existing)
+    async with _source(job, as_documents) as source:
+        sniff_result = source.sniff_result
+        progress.total_rows = sniff_result["row_count"]
+        # Nested documents are not profiled: their leaves are not typed columns
+        profiler = column_profile.TableProfiler([] if as_documents else sniff_result["columns"])
+        chunks = profiler.track(progress.track(source.chunks))
+        partition = None
+        if db_type == "postgres":
+            partition = partitioning.plan(sniff_result["columns"], sniff_result["row_count"])
+
+        # An earlier attempt at this job may have died leaving a partial staging table
+        await _drop_stagings(job)
+        try:
+            if db_type == "postgres":
+                async with async_session() as session:
+                    stats = await upload_service.ingest_postgres(
+                        session, chunks, staging, sniff_result["columns"], partition
+                    )
+                    await index_advisor.index_postgres(
+                        session, staging, owner_id, name, sniff_result["columns"], stats.row_count
+                    )
+                    await upload_service.swap_in_postgres(session, staging, name)
+            else:
+                stats = await upload_service.ingest_mongodb(chunks, staging)
+                await index_advisor.index_mongodb(staging, owner_id, name, sniff_result["columns"], stats.row_count)
+                await upload_service.swap_in_mongodb(staging, name)
+        except BaseException:
+            await _drop_target(db_type, staging)
+            raise
+
+    await _discard_upload(job)
+    await upload_service.save_metadata(
+        collection_name=name,
+        db_type=db_type,
+        original_filename=source.filename,
+        owner_id=owner_id,
+        owner_username=job["owner_username"],
+        row_count=stats.row_count,
+        sniff_result=sniff_result,
+        is_public=job["is_public"],
+        profiles=profiler.profiles(),
+        partition=partition,
+        content_hash=content_hash,
+    )
+    await _drop_moved(existing, db_type)
+
+    action = "replaced" if existing else "uploaded"
+    message = f"Successfully {action} {stats.row_count} rows into {db_type}:{name}"
+    return _response(job, stats, len(sniff_result["columns"]), message)
+
+
+async def _drop_moved(existing: dict | None, db_type: str) -> None:
+    if existing and existing["db_type"] != db_type:
+        # Moved to the other database: the old copy goes once the metadata points at the new one
+        await _drop_target(existing["db_type"], existing["name"])
+
+
+async def _copy_full(
+    job: dict, existing: dict | None, duplicate: dict, content_hash: str, progress: _Progress
+) -> dict:
+    """Create the target as a server-side copy of `duplicate`, which holds exactly the upload's data.
+
+    Nothing is parsed: the rows are copied table to table (or with $out) into
+    staging and swapped in, and the metadata, profiles included, comes from
+    the duplicate. Uploading the data again into the collection holding it
+    changes nothing.
+    """
+    owner_id, name, db_type = job["owner_id"], job["collection_name"], job["db_type"]
+    if duplicate["owner_id"] == owner_id and duplicate["name"] == name:
+        await _discard_upload(job)
+        stats = upload_service.IngestStats(row_count=duplicate["row_count"], elapsed_s=0.0, method="unchanged")
+        return _response(job, stats, len(duplicate["columns"]), f"{db_type}:{name} already holds this data")
+
+    staging = upload_service.staging_name(name, job["job_id"], job.get("attempts", 0))
+    partition = partitioning.PartitionPlan(**duplicate["partition"]) if duplicate.get("partition") else None
+    await _drop_stagings(job)
+    try:
+        if db_type == "postgres":
+            async with async_session() as session:
+                stats = await upload_service.copy_postgres(
+                    session, duplicate["name"], staging, duplicate["columns"], partition
+                )
+                await index_advisor.index_postgres(
+                    session, staging, owner_id, name, duplicate["columns"], stats.row_count
+                )
+                await upload_service.swap_in_postgres(session, staging, name)
+        else:
+            stats = await upload_service.copy_mongodb(duplicate["name"], staging)
+            await index_advisor.index_mongodb(staging, owner_id, name, duplicate["columns"], stats.row_count)
+            await upload_service.swap_in_mongodb(staging, name)
+    except BaseException:
+        await _drop_target(db_type, staging)
+        raise
+    progress.rows_written = stats.row_count
+
+    await _discard_upload(job)
+    await upload_service.save_metadata(
+        collection_name=name,
+        db_type=db_type,
+        original_filename=job["filename"],
+        owner_id=owner_id,
+        owner_username=job["owner_username"],
+        row_count=stats.row_count,
+        sniff_result=duplicate,
+        is_public=job["is_public"],
+        partition=partition,
+        content_hash=content_hash,
+    )
+    await _drop_moved(existing, db_type)
+
+    message = (
+        f"Copied {stats.row_count} rows into {db_type}:{name} "
+        f"from '{duplicate['name']}', which holds the same data"
+    )
+    return _response(job, stats, len(duplicate["columns"]), message)
+
+
+async def _ingest_incremental(job: dict, existing: dict, progress: _Progress) -> dict:
+    """Append, upsert or delta-load the upload into an existing target; only the new rows are written.
+
+    Postgres loads in one transaction. MongoDB keeps what a failed load wrote,
+    so its row count is re-read from the collection and a MongoDB append that
+    was interrupted is not retried (it would duplicate rows); an upsert or a
+    delta converges when rerun.
+    """
+    owner_id, name, db_type, mode = job["owner_id"], job["collection_name"], existing["db_type"], job["mode"]
+    key_columns = job["key_columns"] if mode == "upsert" else None
+    if db_type == "mongodb" and mode == "append" and job["attempts"] > 1:
+        await _sync_mongodb_row_count(existing, existing["columns"])
+        raise AppError(
+            f"An earlier attempt to append to '{name}' was interrupted; some of its rows may be there already"
+        )
+
+    as_documents = _loads_as_documents(job, existing)
+    async with _source(job, as_documents) as source:
+        sniff_result = source.sniff_result
+        progress.total_rows = sniff_result["row_count"]
+        partition_column = upload_service.partition_column(existing)
+        write_columns, merged = upload_service.merge_schema(
+            name, existing["columns"], sniff_result["columns"], db_type, key_columns, partition_column
+        )
+        chunks = progress.track(source.chunks)
+        if not as_documents:
+            chunks = upload_service.conform_to(chunks, sniff_result["columns"], write_columns)
+        # Profiles cannot be merged once stored, so only the columns this load adds get one
+        new_columns = merged[len(existing["columns"]):]
+        profiler = column_profile.TableProfiler([] if as_documents else new_columns)
+        chunks = profiler.track(chunks)
+
+        try:
+            if db_type == "postgres":
+                async with async_session() as session:
+                    retyped = [
+                        col for col, old in zip(merged, existing["columns"]) if col.get("sql_type") != old.get("sql_type")
+                    ]
+                    partition = partitioning.PartitionPlan(**existing["partition"]) if partition_column else None
+                    if mode == "delta":
+                        stats = await upload_service.delta_postgres(
+                            session, chunks, name, write_columns, new_columns, retyped, partition
+                        )
+                    else:
+                        stats = await upload_service.append_postgres(
+                            session, chunks, name, write_columns, new_columns, key_columns, retyped, partition
+                        )
+                    row_count = existing["row_count"] + stats.rows_inserted - stats.rows_deleted
+                    await index_advisor.index_postgres(session, name, owner_id, name, merged, row_count)
+                    await upload_service.analyze_postgres(session, name)
+            else:
+                if mode == "delta":
+                    stats = await upload_service.delta_mongodb(chunks, name)
+                else:
+                    stats = await upload_service.append_mongodb(chunks, name, key_columns)
+                row_count = existing["row_count"] + stats.rows_inserted - stats.rows_deleted
+                await index_advisor.index_mongodb(name, owner_id, name, merged, row_count)
+        except BaseException:
+            if db_type == "mongodb":
+                await _sync_mongodb_row_count(existing, merged)
+            raise
+
+    await _discard_upload(job)
+    profiles = profiler.profiles()
+    merged = [{**c, "profile": profiles[c["name"]]} if c["name"] in profiles else c for c in merged]
+    await upload_service.record_incremental_load(owner_id, name, stats.rows_inserted - stats.rows_deleted, merged)
+
+    if mode == "delta":
+        message = (
+            f"Delta load into {db_type}:{name}: {stats.rows_inserted} rows inserted, "
+            f"{stats.rows_deleted} deleted, {stats.rows_unchanged} unchanged"
+        )
+    elif key_columns:
+        message = (
+            f"Successfully upserted {stats.row_count} rows into {db_type}:{name} "
+            f"({stats.rows_inserted} new, {stats.rows_updated} updated)"
+        )
+    else:
+        message = f"Successfully appended {stats.row_count} rows to {db_type}:{name}"
+    return _response(job, stats, len(merged), message)
+
+
+async def _sync_mongodb_row_count(existing: dict, columns: list[dict]) -> None:
+    with contextlib.suppress(Exception):
+        count = await upload_service.mongodb_row_count(existing["name"])
+        await upload_service.record_incremental_load(
+            existing["owner_id"], existing["name"], count - existing["row_count"], columns
+        )
+
+
+def _response(job: dict, stats: upload_service.IngestStats, column_count: int, message: str) -> dict:
+    return UploadResponse(
+        collection_name=job["collection_name"],
+        db_type=job["db_type"],
+        row_count=stats.row_count,
+        column_count=column_count,
+        message=message,
+        rows_updated=stats.rows_updated,
+        rows_deleted=stats.rows_deleted,
+        rows_unchanged=stats.rows_unchanged,
+        load_method=stats.method,
+        rows_per_sec=round(stats.rows_per_sec, 1),
+        peak_memory_mb=round(stats.peak_rss_mb, 1),
+        storage_saved_mb=round(stats.storage_saved_bytes / (1024 * 1024), 1),
+    ).model_dump()
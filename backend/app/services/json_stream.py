@@ -0,0 +1,284 @@
+"""Incremental reader for JSON uploads (arrays, wrapper objects and GeoJSON).
+
+A JSON upload is one document, so `json.loads` needs the whole file - and a
+Python object for every value in it - before the first record can be handed
+on. This module walks the document instead: the top-level array (or the
+records array inside a wrapper object) is read one element at a time with
+`JSONDecoder.raw_decode` over a sliding text buffer, so memory is bounded by
+the read block plus the largest single record.
+
+Wrapper objects are resolved with the same rules as before: the first
+well-known key holding a non-empty array, else the only field holding an
+array of objects, else the whole object as a single record. Deciding that
+needs every top-level key, so wrappers get one pre-scan that decodes array
+elements one at a time and drops them (C-speed, unlike a Python tokenizer)
+and steps over object values by matching only strings and brackets.
+"""
+
+import codecs
+import json
+import re
+from collections.abc import Iterator
+from typing import Any, BinaryIO
+
+from app.middleware.error_handler import ValidationError
+
+READ_BLOCK_BYTES = 1024 * 1024
+HEAD_RECORDS = 5  # raw records kept for nesting detection
+WELL_KNOWN_KEYS = ("data", "results", "records", "items", "rows", "features")
+
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+# A complete string, a lone quote (a string cut off by the buffer end) or a bracket
+_SKIP_TOKEN_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|"|[\[\]{}]', re.DOTALL)
+_DELIMITERS = tuple(" \t\n\r,]}")
+_decoder = json.JSONDecoder()
+_MISSING = object()
+
+
+def records_key(fields: dict[str, tuple[bool, bool]]) -> str | None:
+    """Pick the field of a wrapper object that holds its records.
+
+    `fields` maps each top-level key to (is a non-empty array, first element
+    is an object). Returns None when the object itself is the only record.
+    """
+    for key in WELL_KNOWN_KEYS:
+        if fields.get(key, (False, False))[0]:
+            return key
+    array_fields = [k for k, (non_empty, of_objects) in fields.items() if non_empty and of_objects]
+    if len(array_fields) == 1:
+        return array_fields[0]
+    return None
+
+
+def is_geojson_feature(item: Any) -> bool:
+    return (
+        isinstance(item, dict)
+        and item.get("type") == "Feature"
+        and isinstance(item.get("properties"), dict)
+    )
+
+
+def flatten_feature(item: dict) -> dict:
+    """Flatten one GeoJSON feature: properties to top level, geometry to two columns."""
+    row = {**(item.get("properties") or {})}
+
+    geometry = item.get("geometry")
+    if isinstance(geometry, dict):
+        row["geometry_type"] = geometry.get("type", "")
+        coords = geometry.get("coordinates")
+        if coords is not None:
+            row["geometry_coordinates"] = json.dumps(coords)
+
+    # Preserve any other top-level fields besides type/properties/geometry
+    for k, v in item.items():
+        if k not in ("type", "properties", "geometry"):
+            row[k] = v
+    return row
+
+
+def feature_document(item: dict) -> dict:
+    """One GeoJSON feature as a document: properties to top level, the geometry kept as GeoJSON."""
+    doc = {**(item.get("properties") or {})}
+    for k, v in item.items():
+        if k not in ("type", "properties"):
+            doc[k] = v
+    return doc
+
+
+class _Cursor:
+    """Sliding text window over a binary file, positioned between JSON tokens."""
+
+    def __init__(self, f: BinaryIO, block_size: int = READ_BLOCK_BYTES):
+        self._f = f
+        self._block_size = block_size
+        self._utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    def _fill(self, min_chars: int = 1) -> None:
+        """Drop the consumed prefix and read until `min_chars` more are buffered or EOF."""
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        target = len(self.buf) + min_chars
+        while len(self.buf) < target and not self.eof:
+            block = self._f.read(self._block_size)
+            self.bytes_read += len(block)
+            self.eof = not block
+            try:
+                self.buf += self._utf8.decode(block, final=self.eof)
+            except UnicodeDecodeError as exc:
+                raise ValidationError("Invalid JSON: file is not UTF-8 text") from exc
+
+    @property
+    def bytes_consumed(self) -> int:
+        """Approximate bytes of the file behind the cursor (exact for ASCII)."""
+        return self.bytes_read - (len(self.buf) - self.pos)
+
+    def peek(self) -> str | None:
+        """Next non-whitespace character without consuming it; None at end of input."""
+        while True:
+            self.pos = _WHITESPACE_RE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                return None
+            self._fill()
+
+    def expect(self, chars: str) -> str:
+        ch = self.peek()
+        if ch is None or ch not in chars:
+            found = "end of file" if ch is None else repr(ch)
+            raise ValidationError(f"Invalid JSON: expected one of {chars!r}, found {found}")
+        self.pos += 1
+        return ch
+
+    def value(self) -> Any:
+        """Decode the next complete value, reading more input while it is cut off."""
+        self.peek()
+        want = self._block_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as exc:
+                if self.eof:
+                    raise ValidationError(f"Invalid JSON: {exc.msg} (char {exc.pos})") from exc
+            else:
+                # A number cut by the buffer end ("12", "2.", "1e") may continue in the next block
+                if self.eof or not isinstance(value, (int, float)) or self.buf[end:end + 1] in _DELIMITERS:
+                    self.pos = end
+                    return value
+            # Grow geometrically so a record larger than a block is not re-decoded per block
+            self._fill(want)
+            want *= 2
+
+    def skip(self) -> None:
+        """Step over the next value, holding at most one array element of it in memory."""
+        ch = self.peek()
+        if ch == "[":
+            for _ in self.array_items():
+                pass
+        elif ch == "{":
+            self._skip_container(depth=0)
+        else:
+            self.value()
+
+    def _skip_container(self, depth: int) -> None:
+        while True:
+            match = _SKIP_TOKEN_RE.search(self.buf, self.pos)
+            if match is None or match.group() == '"':
+                if self.eof:
+                    raise ValidationError("Invalid JSON: unexpected end of file")
+                self.pos = len(self.buf) if match is None else match.start()
+                self._fill(self._block_size)
+                continue
+            self.pos = match.end()
+            token = match.group()
+            if token in ("[", "{"):
+                depth += 1
+            elif token in ("]", "}"):
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def array_items(self) -> Iterator[Any]:
+        """Yield the elements of the array starting at the cursor."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+    def object_keys(self) -> Iterator[str]:
+        """Yield the keys of the object at the cursor; the caller consumes each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise ValidationError("Invalid JSON: expected an object key")
+            key = self.value()
+            self.expect(":")
+            yield key  # the caller consumes the value before the separator is read
+            if self.expect(",}") == "}":
+                return
+
+    def describe_array(self) -> tuple[bool, bool]:
+        """Skip the value at the cursor, reporting (non-empty array, first element is an object)."""
+        if self.peek() != "[":
+            self.skip()
+            return False, False
+        items = self.array_items()
+        first = next(items, _MISSING)
+        for _ in items:
+            pass
+        return first is not _MISSING, isinstance(first, dict)
+
+
+class JsonRecordStream:
+    """Iterate the records of a JSON document from a binary file, one at a time.
+
+    GeoJSON features are flattened as they stream past (decided from the
+    first record), or with `documents` turned into documents that keep their
+    geometry object. The first HEAD_RECORDS records are also kept unflattened
+    in `head` so nesting can be judged without reading the file again.
+    """
+
+    def __init__(self, f: BinaryIO, block_size: int = READ_BLOCK_BYTES, documents: bool = False):
+        self._f = f
+        self._block_size = block_size
+        self._feature = feature_document if documents else flatten_feature
+        self._cursor: _Cursor | None = None
+        self.head: list = []
+
+    @property
+    def bytes_consumed(self) -> int:
+        return self._cursor.bytes_consumed if self._cursor else 0
+
+    def _open(self) -> _Cursor:
+        self._cursor = _Cursor(self._f, self._block_size)
+        return self._cursor
+
+    def _raw_records(self) -> Iterator[Any]:
+        start = self._f.tell()
+        cursor = self._open()
+        first = cursor.peek()
+        if first == "[":
+            yield from cursor.array_items()
+            return
+        if first != "{":
+            raise ValidationError("JSON must be an object or array of objects")
+
+        fields = {}
+        for key in cursor.object_keys():
+            fields[key] = cursor.describe_array()
+        key = records_key(fields)
+
+        self._f.seek(start)
+        cursor = self._open()
+        if key is None:
+            yield cursor.value()
+            return
+        for name in cursor.object_keys():
+            if name == key:
+                yield from cursor.array_items()
+                return
+            cursor.skip()
+
+    def __iter__(self) -> Iterator[Any]:
+        geojson = None
+        count = 0
+        for item in self._raw_records():
+            if count < HEAD_RECORDS:
+                self.head.append(item)
+            if geojson is None:
+                geojson = is_geojson_feature(item)
+            count += 1
+            yield self._feature(item) if geojson else item
+        if not count:
+            raise ValidationError("JSON contains no records")
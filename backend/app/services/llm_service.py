@@ -10,6 +10,10 @@ from app.middleware.input_guard import sanitize_text_for_prompt
 
 logger = logging.getLogger(__name__)
 
+PROMPT_VALUE_CHARS = 60  # uploaded values (samples, top values, JSON paths) are cut to this in the prompt
+PROMPT_TOP_VALUES = 5
+PROMPT_JSON_PATHS = 20
+
 SYSTEM_PROMPT = """You are Data Lens, a data analysis assistant. You help users query and understand their data.
 
 When the user asks a question about their data, you must:
@@ -146,17 +150,74 @@ async def generate_answer(
     return await _call_llm(messages, model=model)
 
 
+def _prompt_value(value, as_repr: bool = True) -> str:
+    """An uploaded value as prompt text: escaped like other user text and cut to PROMPT_VALUE_CHARS."""
+    return sanitize_text_for_prompt(repr(value) if as_repr else str(value), max_length=PROMPT_VALUE_CHARS)
+
+
+def _format_column(col: dict, postgres: bool = False) -> str:
+    dtype = col["dtype"]
+    if postgres and col.get("sql_type") == "ENUM":
+        # Comparing an enum to a text value outside its labels is an error, and text functions need a cast
+        labels = ", ".join(_prompt_value(v) for v in col["enum_values"])
+        dtype += f", enum of [{labels}]; cast to ::text for string functions"
+    elif postgres and col.get("sql_type") == "JSONB":
+        # Only containment and jsonpath operators can use the GIN index; ->> comparisons scan
+        dtype += (
+            ", JSONB with a GIN index: filter with @> (e.g. col @> '{\"k\": \"v\"}') or @? jsonpath, "
+            "read values with ->> or #>> and cast them for comparisons"
+        )
+    elif postgres and col.get("sql_type"):
+        dtype += f", stored as {col['sql_type']}"
+    samples = ", ".join(_prompt_value(v) for v in col.get("sample_values", [])[:3])
+    line = f"  - {col['name']} ({dtype}): samples=[{samples}]"
+    if col.get("json_paths"):
+        paths = col["json_paths"]
+        line += f"; JSON paths: {', '.join(_prompt_value(p, as_repr=False) for p in paths[:PROMPT_JSON_PATHS])}"
+        if len(paths) > PROMPT_JSON_PATHS:
+            line += f" (+{len(paths) - PROMPT_JSON_PATHS} more)"
+    profile = col.get("profile")
+    if not profile:
+        return line
+    stats = [f"nulls={profile['null_fraction']:.1%}"]
+    if profile.get("distinct_estimate") is not None:
+        stats.append(f"distinct~{profile['distinct_estimate']}")
+    if profile.get("min") is not None:
+        low, high = (_prompt_value(profile[k], as_repr=False) for k in ("min", "max"))
+        stats.append(f"min={low}, max={high}")
+    if profile.get("quantiles"):
+        stats.append("quantiles=" + ", ".join(f"{q}={v}" for q, v in profile["quantiles"].items()))
+    if profile.get("top_values"):
+        top = profile["top_values"][:PROMPT_TOP_VALUES]
+        stats.append("top=" + ", ".join(f"{_prompt_value(t['value'])} ({t['count']})" for t in top))
+    return f"{line}; {'; '.join(stats)}"
+
+
 def _format_schemas(schemas: list[dict]) -> str:
     parts = []
     for s in schemas:
         cols = s.get("columns", [])
-        col_lines = [f"  - {c['name']} ({c['dtype']}): samples={c.get('sample_values', [])[:3]}" for c in cols]
+        col_lines = [_format_column(c, s["db_type"] == "postgres") for c in cols]
         db_label = "PostgreSQL table" if s["db_type"] == "postgres" else "MongoDB collection"
         desc = sanitize_text_for_prompt(s.get("description", "N/A"), max_length=200)
+        partition = ""
+        if s.get("partition"):
+            partition = (
+                f"  Partitioned by {s['partition']['interval']} on \"{s['partition']['column']}\": "
+                "filter on it to scan only the partitions in range\n"
+            )
+        nested = ""
+        if s.get("nested"):
+            nested = (
+                "  Documents are stored nested, as uploaded: the columns are dotted field paths "
+                "(query them as \"a.b\"), arrays stay arrays\n"
+            )
         parts.append(
             f"[{db_label}] {s['name']}\n"
             f"  Description: {desc}\n"
             f"  Rows: {s.get('row_count', '?')}\n"
+            f"{partition}"
+            f"{nested}"
             f"  Columns:\n" + "\n".join(col_lines)
         )
     return "\n\n".join(parts)
@@ -0,0 +1,171 @@
+"""Bulk writers that load conformed DataFrame chunks (or batches of ready documents) into a MongoDB collection."""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Any
+
+import pandas as pd
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+
+from app.services import cpu_pool
+
+INSERT_BATCH_SIZE = 1000
+
+
+def chunk_documents(df: pd.DataFrame) -> list[dict[str, Any]]:
+    """Build documents column-wise from a chunk, with no JSON round trip.
+
+    Nulls become None, datetimes stay datetimes (stored as BSON dates) and
+    nested lists/dicts pass through as sub-documents.
+    """
+    names = list(df.columns)
+    values = [df[col].astype(object).where(df[col].notna(), None).tolist() for col in names]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def _documents(chunk: pd.DataFrame | list[dict]) -> list[dict[str, Any]]:
+    return chunk_documents(chunk) if isinstance(chunk, pd.DataFrame) else chunk
+
+
+def _field(doc: dict, path: str) -> Any:
+    """The value at a dotted path of a document (a key column of nested documents)."""
+    if path in doc:
+        return doc[path]
+    for part in path.split("."):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+
+async def _insert_batch(collection: AsyncIOMotorCollection, docs: list[dict]) -> tuple[int, int]:
+    result = await collection.insert_many(docs, ordered=False)
+    return len(result.inserted_ids), 0
+
+
+def _key(doc: dict, key_columns: list[str]) -> str:
+    # repr, as key values may be unhashable (a list or sub-document)
+    return repr(tuple(_field(doc, k) for k in key_columns))
+
+
+async def _upsert_batch(
+    collection: AsyncIOMotorCollection, docs: list[dict], key_columns: list[str]
+) -> tuple[int, int]:
+    latest = {_key(doc, key_columns): doc for doc in docs}  # unordered ops on one key may run in any order
+    ops = [
+        UpdateOne({k: _field(doc, k) for k in key_columns}, {"$set": doc}, upsert=True) for doc in latest.values()
+    ]
+    result = await collection.bulk_write(ops, ordered=False)
+    return result.upserted_count + result.matched_count, result.matched_count
+
+
+async def _write_chunks(
+    chunks: Iterable[pd.DataFrame | list[dict]],
+    concurrency: int,
+    write_batch: Callable[[list[dict]], Awaitable[tuple[int, int]]],
+) -> tuple[int, int]:
+    """Write chunks in batches with at most `concurrency` writes in flight; returns (written, updated).
+
+    Chunks are parsed and turned into documents (unless they are documents
+    already) on the CPU thread pool.
+    Waiting for a free slot before building the next batch keeps memory bounded
+    to the current chunk plus the batches in flight.
+    """
+    pending: set[asyncio.Task] = set()
+    written = updated = 0
+
+    def collect(done: set[asyncio.Task]) -> None:
+        nonlocal written, updated
+        for task in done:
+            batch_written, batch_updated = task.result()
+            written += batch_written
+            updated += batch_updated
+
+    try:
+        async for docs in cpu_pool.iterate(_documents(chunk) for chunk in chunks):
+            for i in range(0, len(docs), INSERT_BATCH_SIZE):
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    collect(done)
+                pending.add(asyncio.create_task(write_batch(docs[i : i + INSERT_BATCH_SIZE])))
+        if pending:
+            done, pending = await asyncio.wait(pending)
+            collect(done)
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return written, updated
+
+
+async def _write_lanes(
+    chunks: Iterable[pd.DataFrame | list[dict]],
+    concurrency: int,
+    lane_of: Callable[[dict], str],
+    write_batch: Callable[[list[dict]], Awaitable[tuple[int, int]]],
+) -> tuple[int, int]:
+    """Like _write_chunks, but each document goes to one of `concurrency` lanes by `lane_of`.
+
+    A lane has one write in flight at a time, so documents that share a lane
+    are written in upload order while the lanes run concurrently.
+    """
+    lanes: list[list[dict]] = [[] for _ in range(concurrency)]
+    in_flight: list[asyncio.Task | None] = [None] * concurrency
+    written = updated = 0
+
+    async def flush(lane: int) -> None:
+        nonlocal written, updated
+        if in_flight[lane] is not None:
+            batch_written, batch_updated = await in_flight[lane]
+            written += batch_written
+            updated += batch_updated
+        in_flight[lane] = asyncio.create_task(write_batch(lanes[lane])) if lanes[lane] else None
+        lanes[lane] = []
+
+    try:
+        async for docs in cpu_pool.iterate(_documents(chunk) for chunk in chunks):
+            for doc in docs:
+                lane = hash(lane_of(doc)) % concurrency
+                lanes[lane].append(doc)
+                if len(lanes[lane]) >= INSERT_BATCH_SIZE:
+                    await flush(lane)
+        for lane in range(concurrency):
+            await flush(lane)  # start each lane's last partial batch
+        for lane in range(concurrency):
+            await flush(lane)  # and wait for them
+    finally:
+        pending = [task for task in in_flight if task is not None and not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return written, updated
+
+
+async def insert_chunks(
+    collection: AsyncIOMotorCollection,
+    chunks: Iterable[pd.DataFrame | list[dict]],
+    concurrency: int,
+) -> int:
+    """Insert chunks with unordered insert_many calls, at most `concurrency` in flight."""
+    written, _ = await _write_chunks(chunks, concurrency, lambda docs: _insert_batch(collection, docs))
+    return written
+
+
+async def upsert_chunks(
+    collection: AsyncIOMotorCollection,
+    chunks: Iterable[pd.DataFrame | list[dict]],
+    key_columns: list[str],
+    concurrency: int,
+) -> tuple[int, int]:
+    """Upsert chunks by key with unordered bulk_write calls; returns (rows written, rows updated).
+
+    Each document replaces the fields of the one matching its key values (or
+    is inserted). Documents are routed to concurrent batches by key, so a key
+    that repeats within one upload is written in order and its last row wins,
+    as in PostgreSQL. The collection needs an index on the keys.
+    """
+    return await _write_lanes(
+        chunks,
+        concurrency,
+        lambda doc: _key(doc, key_columns),
+        lambda docs: _upsert_batch(collection, docs, key_columns),
+    )
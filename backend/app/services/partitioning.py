@@ -0,0 +1,125 @@
+"""Time-range partitioning of large Postgres tables.
+
+A load of at least `pg_partition_min_rows` rows with a datetime column is
+created as a declaratively partitioned table, RANGE-partitioned on that
+column by month, or by week when its values span less than WEEKLY_MAX_SPAN.
+The partitions covering the sniffed time range are created with the table,
+with a DEFAULT partition for rows without a time, so a COPY into the parent
+routes each row to its partition. An append first creates the partitions its
+own time range needs. Queries bounded on the partition column then scan only
+the partitions of their window (partition pruning).
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+WEEKLY_MAX_SPAN = pd.Timedelta(days=183)  # shorter spans are partitioned by week, longer ones by month
+MIN_PARTITIONS = 2  # a span inside one interval gains nothing from partitioning
+MAX_PARTITIONS = 240  # planning time grows with the partition count
+_NAME_PREFIX = 53  # table name characters kept in partition names, leaving room for "_p20240101"
+
+_PARTITIONS_SQL = text(
+    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+    "WHERE i.inhparent = to_regclass(:table)"
+)
+
+
+@dataclass(frozen=True)
+class PartitionPlan:
+    column: str
+    interval: str  # "month" or "week"
+
+
+def _span(col: dict) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+    time_range = col.get("time_range")
+    if not time_range:
+        return None
+    return pd.Timestamp(time_range[0]), pd.Timestamp(time_range[1])
+
+
+def _starts(interval: str, low: pd.Timestamp, high: pd.Timestamp) -> pd.DatetimeIndex:
+    """Start of every partition from the one holding `low` to the one holding `high`."""
+    if interval == "month":
+        return pd.date_range(low.to_period("M").start_time, high, freq="MS")
+    monday = low.normalize() - pd.Timedelta(days=low.weekday())
+    return pd.date_range(monday, high, freq="W-MON")
+
+
+def _end(interval: str, start: pd.Timestamp) -> pd.Timestamp:
+    return start + (pd.offsets.MonthBegin(1) if interval == "month" else pd.Timedelta(weeks=1))
+
+
+def plan(columns: list[dict], row_count: int) -> PartitionPlan | None:
+    """Partitioning for a load, or None when it is too small or has no datetime column worth it.
+
+    Prefers a datetime column that only grows in file order (an event time),
+    then one without empty values, which would all land in the DEFAULT partition.
+    """
+    if not settings.pg_partition_min_rows or row_count < settings.pg_partition_min_rows:
+        return None
+    candidates = [c for c in columns if c["dtype"] == "datetime" and _span(c)]
+    for col in sorted(candidates, key=lambda c: (not c.get("monotonic"), c.get("nullable", True))):
+        low, high = _span(col)
+        interval = "week" if high - low < WEEKLY_MAX_SPAN else "month"
+        if MIN_PARTITIONS <= len(_starts(interval, low, high)) <= MAX_PARTITIONS:
+            return PartitionPlan(col["name"], interval)
+    return None
+
+
+def partition_name(table: str, start: pd.Timestamp) -> str:
+    return f"{table[:_NAME_PREFIX]}_p{start:%Y%m%d}"
+
+
+def partition_by_sql(partition: PartitionPlan) -> str:
+    return f'PARTITION BY RANGE ("{partition.column}")'
+
+
+def partition_statements(
+    table: str, partition: PartitionPlan, time_range: Iterable | None, default: bool = False
+) -> list[str]:
+    """CREATE statements for the partitions of `table` covering time_range, and its DEFAULT partition."""
+    statements = []
+    span = _span({"time_range": time_range})
+    if span is not None:
+        for start in _starts(partition.interval, *span):
+            statements.append(
+                f'CREATE TABLE IF NOT EXISTS "{partition_name(table, start)}" PARTITION OF "{table}" '
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{_end(partition.interval, start):%Y-%m-%d}')"
+            )
+    if default:
+        statements.append(
+            f'CREATE TABLE IF NOT EXISTS "{table[:_NAME_PREFIX]}_default" PARTITION OF "{table}" DEFAULT'
+        )
+    return statements
+
+
+async def create_partitions(
+    session: AsyncSession, table: str, partition: PartitionPlan, columns: list[dict]
+) -> None:
+    """Create the partitions a load into an existing partitioned table needs, from its sniffed time range.
+
+    Done before the rows arrive: a partition cannot be added for a range the
+    DEFAULT partition already holds rows of.
+    """
+    col = next((c for c in columns if c["name"] == partition.column), None)
+    if col is None:
+        return
+    for statement in partition_statements(table, partition, col.get("time_range")):
+        await session.execute(text(statement))
+
+
+async def rename_partitions(session: AsyncSession, old_table: str, table: str) -> None:
+    """Rename the partitions of `table`, named after old_table when created, after the table itself."""
+    old_prefix, prefix = old_table[:_NAME_PREFIX], table[:_NAME_PREFIX]
+    result = await session.execute(_PARTITIONS_SQL, {"table": f'"{table}"'})
+    for (name,) in list(result):
+        if name.startswith(old_prefix):
+            await session.execute(
+                text(f'ALTER TABLE "{name}" RENAME TO "{prefix}{name[len(old_prefix):]}"')
+            )
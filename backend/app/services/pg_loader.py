@@ -0,0 +1,214 @@
+"""Bulk writers that load conformed DataFrame chunks into a PostgreSQL table.
+
+Chunks are parsed and converted to row tuples on the CPU thread pool; only
+the writes run on the event loop.
+"""
+
+import asyncio
+import contextlib
+import json
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Any
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.postgres import async_session
+from app.services import cpu_pool
+
+INSERT_BATCH_SIZE = 1000
+UPSERT_STAGE_TABLE = "_upsert_stage"
+
+Loader = Callable[[AsyncSession, str, list[str], Iterable[pd.DataFrame], Iterable[str]], Awaitable[int]]
+
+
+def _to_text(value: Any) -> Any:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def chunk_records(df: pd.DataFrame, text_columns: Iterable[str] = ()) -> list[tuple]:
+    """Convert a chunk to row tuples of plain Python values (None for nulls).
+
+    Binary COPY is strict about types, so numpy scalars are boxed and any
+    non-string value in a TEXT column is stringified.
+    """
+    df = df.astype(object).where(df.notna(), None)
+    for col in text_columns:
+        if pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty"):
+            df[col] = df[col].map(_to_text)
+    return list(df.itertuples(index=False, name=None))
+
+
+async def _driver_connection(session: AsyncSession) -> Any:
+    """Return the DBAPI driver connection (asyncpg) behind the session's transaction."""
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    return raw.driver_connection
+
+
+async def supports_copy(session: AsyncSession) -> bool:
+    return hasattr(await _driver_connection(session), "copy_records_to_table")
+
+
+async def copy_chunks(
+    session: AsyncSession,
+    table: str,
+    col_names: list[str],
+    chunks: Iterable[pd.DataFrame],
+    text_columns: Iterable[str] = (),
+) -> int:
+    """Stream chunks into the table with binary COPY ... FROM STDIN.
+
+    Runs on the session's own connection, so it shares the DDL transaction
+    and is committed (or rolled back) with it.
+    """
+    conn = await _driver_connection(session)
+    text_columns = list(text_columns)
+    total = 0
+    async for records in cpu_pool.iterate(chunk_records(df[col_names], text_columns) for df in chunks):
+        if records:
+            await conn.copy_records_to_table(table, records=records, columns=col_names)
+        total += len(records)
+    return total
+
+
+async def _put(queue: asyncio.Queue, item: Any, writers: list[asyncio.Task]) -> None:
+    """Queue item for the writers, raising a writer's error instead of waiting on a full queue forever."""
+    put = asyncio.ensure_future(queue.put(item))
+    done, _ = await asyncio.wait([put, *writers], return_when=asyncio.FIRST_COMPLETED)
+    if put not in done:
+        put.cancel()
+        # A writer only returns before its end marker by failing
+        next(iter(done)).result()
+
+
+async def parallel_copy_chunks(
+    table: str,
+    col_names: list[str],
+    chunks: Iterable[pd.DataFrame],
+    text_columns: Iterable[str] = (),
+    writers: int = 2,
+) -> int:
+    """Binary COPY split across up to `writers` pooled connections, each in a transaction of its own.
+
+    The table must already be committed, since the writers cannot see the
+    caller's uncommitted DDL. Chunks go to whichever writer is free, and a
+    writer connection is only opened while every open one is busy, so a small
+    load stays on one. The writers commit once all of them have finished; if
+    any fails the others are cancelled and rolled back, and the caller drops
+    the table. Rows land in no particular order across writers.
+    """
+    text_columns = list(text_columns)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=writers)
+    tasks: list[asyncio.Task] = []
+    sessions: list[AsyncSession] = []
+
+    async def write(conn: Any) -> int:
+        total = 0
+        while (records := await queue.get()) is not None:
+            if records:
+                await conn.copy_records_to_table(table, records=records, columns=col_names)
+            total += len(records)
+        return total
+
+    async with contextlib.AsyncExitStack() as stack:
+        try:
+            async for records in cpu_pool.iterate(chunk_records(df[col_names], text_columns) for df in chunks):
+                # The previous chunk still queued means every open writer is busy
+                if not tasks or (queue.qsize() and len(tasks) < writers):
+                    session = await stack.enter_async_context(async_session())
+                    sessions.append(session)
+                    tasks.append(asyncio.create_task(write(await _driver_connection(session))))
+                await _put(queue, records, tasks)
+            for _ in tasks:
+                await _put(queue, None, tasks)
+            totals = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise  # closing the sessions rolls every writer back
+        for session in sessions:
+            await session.commit()
+    return sum(totals)
+
+
+async def insert_chunks(
+    session: AsyncSession,
+    table: str,
+    col_names: list[str],
+    chunks: Iterable[pd.DataFrame],
+    text_columns: Iterable[str] = (),
+) -> int:
+    """Fallback loader: executemany parameterized INSERTs in batches."""
+    placeholders = ", ".join(f":p{i}" for i in range(len(col_names)))
+    col_list = ", ".join(f'"{c}"' for c in col_names)
+    insert_sql = text(f'INSERT INTO "{table}" ({col_list}) VALUES ({placeholders})')
+    keys = [f"p{i}" for i in range(len(col_names))]
+
+    text_columns = list(text_columns)
+    total = 0
+    async for records in cpu_pool.iterate(chunk_records(df[col_names], text_columns) for df in chunks):
+        for i in range(0, len(records), INSERT_BATCH_SIZE):
+            batch = [dict(zip(keys, row)) for row in records[i : i + INSERT_BATCH_SIZE]]
+            await session.execute(insert_sql, batch)
+        total += len(records)
+    return total
+
+
+def _quoted(names: Iterable[str]) -> str:
+    return ", ".join(f'"{name}"' for name in names)
+
+
+def merge_sql(table: str, col_names: list[str], key_columns: list[str]) -> str:
+    """INSERT ... ON CONFLICT from the staging table, returning (rows inserted, rows written).
+
+    DISTINCT ON keeps the last staged row per key, since ON CONFLICT cannot
+    touch the same row twice in one statement.
+    """
+    cols, keys = _quoted(col_names), _quoted(key_columns)
+    updates = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in col_names if c not in key_columns)
+    action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    return (
+        f'WITH merged AS (INSERT INTO "{table}" ({cols}) '
+        f'SELECT DISTINCT ON ({keys}) {cols} FROM "{UPSERT_STAGE_TABLE}" ORDER BY {keys}, ctid DESC '
+        f"ON CONFLICT ({keys}) {action} RETURNING (xmax = 0) AS inserted) "
+        "SELECT count(*) FILTER (WHERE inserted), count(*) FROM merged"
+    )
+
+
+async def upsert_chunks(
+    session: AsyncSession,
+    table: str,
+    col_names: list[str],
+    chunks: Iterable[pd.DataFrame],
+    key_columns: list[str],
+    loader: Loader,
+    text_columns: Iterable[str] = (),
+) -> tuple[int, int]:
+    """Upsert chunks by key; returns (rows written, rows updated).
+
+    Each chunk is bulk-loaded with `loader` into a temporary staging table and
+    merged into the target with one INSERT ... ON CONFLICT, so the data still
+    travels by COPY and the cost follows the chunk, not the table. The target
+    needs a unique index on the key columns.
+    """
+    text_columns = list(text_columns)
+    await session.execute(text(
+        f'CREATE TEMP TABLE "{UPSERT_STAGE_TABLE}" ON COMMIT DROP AS '
+        f'SELECT {_quoted(col_names)} FROM "{table}" WITH NO DATA'
+    ))
+    merge = text(merge_sql(table, col_names, key_columns))
+    written = updated = 0
+    async for df in cpu_pool.iterate(chunks):
+        await loader(session, UPSERT_STAGE_TABLE, col_names, [df], text_columns)
+        inserted, total = (await session.execute(merge)).one()
+        await session.execute(text(f'TRUNCATE "{UPSERT_STAGE_TABLE}"'))
+        written += total
+        updated += total - inserted
+    return written, updated
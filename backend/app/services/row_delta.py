@@ -0,0 +1,123 @@
+"""Row hashes, and delta loads that only write the rows that changed.
+
+Every load stores a stable 64-bit hash of each row in a hidden column
+(Postgres) or field (MongoDB), ROW_HASH_COLUMN. It is computed from the
+conformed chunk, over its columns in name order, so reordering the file's
+columns does not change it. A `delta` load hashes the re-uploaded rows the
+same way and compares them with the stored hashes in bulk: rows whose hash
+is not stored are inserted, stored rows whose hash is gone are deleted, and
+the rest are not touched. Identical rows are matched by count, so the
+collection ends up holding exactly the upload's rows, as after an overwrite.
+Rows stored before hashes existed have none and are replaced. Documents
+loaded without pandas (see documents) are hashed from their canonical JSON.
+"""
+
+import hashlib
+import json
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+ROW_HASH_COLUMN = "_row_hash"
+DELTA_STAGE_TABLE = "_delta_stage"
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Stable int64 hash of each row's values (pandas' SipHash, with its fixed key)."""
+    data = df[sorted(c for c in df.columns if c != ROW_HASH_COLUMN)]
+    return pd.util.hash_pandas_object(data, index=False).to_numpy().view(np.int64)
+
+
+def document_hash(doc: dict) -> int:
+    """Stable int64 hash of a document's fields, in any key order."""
+    fields = {k: v for k, v in doc.items() if k not in (ROW_HASH_COLUMN, "_id")}
+    canonical = json.dumps(fields, sort_keys=True, default=str).encode()
+    return int.from_bytes(hashlib.blake2b(canonical, digest_size=8).digest(), "big", signed=True)
+
+
+def with_row_hashes(chunks: Iterable) -> Iterator:
+    """Add the hash column to DataFrame chunks, or the hash field to batches of documents (in place)."""
+    for chunk in chunks:
+        if isinstance(chunk, pd.DataFrame):
+            yield chunk.assign(**{ROW_HASH_COLUMN: row_hashes(chunk)})
+            continue
+        for doc in chunk:
+            doc[ROW_HASH_COLUMN] = document_hash(doc)
+        yield chunk
+
+
+def _quoted(names: Iterable[str]) -> str:
+    return ", ".join(f'"{name}"' for name in names)
+
+
+def stage_sql(table: str, col_names: list[str]) -> str:
+    """CREATE the temporary table an upload is staged in, typed like `table`'s columns."""
+    return (
+        f'CREATE TEMP TABLE "{DELTA_STAGE_TABLE}" ON COMMIT DROP AS '
+        f'SELECT {_quoted([*col_names, ROW_HASH_COLUMN])} FROM "{table}" WITH NO DATA'
+    )
+
+
+def delete_sql(table: str) -> str:
+    """DELETE the rows of `table` beyond the count of their hash in the staging table.
+
+    Rows are numbered within their hash, so of k stored copies of a row the
+    upload holding j keeps j; rows without a hash never match.
+    """
+    return (
+        f'DELETE FROM "{table}" AS t USING ('
+        f'SELECT o.id FROM (SELECT id, "{ROW_HASH_COLUMN}", '
+        f'row_number() OVER (PARTITION BY "{ROW_HASH_COLUMN}") AS n FROM "{table}") o '
+        f'LEFT JOIN (SELECT "{ROW_HASH_COLUMN}", count(*) AS c FROM "{DELTA_STAGE_TABLE}" GROUP BY 1) s '
+        f'USING ("{ROW_HASH_COLUMN}") WHERE o.n > coalesce(s.c, 0)'
+        ") gone WHERE t.id = gone.id"
+    )
+
+
+def insert_sql(table: str, col_names: list[str]) -> str:
+    """INSERT the staged rows beyond the count of their hash left in `table` once delete_sql ran."""
+    cols = _quoted([*col_names, ROW_HASH_COLUMN])
+    return (
+        f'INSERT INTO "{table}" ({cols}) SELECT {cols} FROM ('
+        f'SELECT *, row_number() OVER (PARTITION BY "{ROW_HASH_COLUMN}") AS _n FROM "{DELTA_STAGE_TABLE}") s '
+        f'LEFT JOIN (SELECT "{ROW_HASH_COLUMN}", count(*) AS _c FROM "{table}" GROUP BY 1) o '
+        f'USING ("{ROW_HASH_COLUMN}") WHERE s._n > coalesce(o._c, 0)'
+    )
+
+
+class HashMatcher:
+    """Matches incoming rows against the hash counts of the stored ones, for a MongoDB delta.
+
+    Holds one count per distinct stored row. Each incoming row uses up one
+    stored copy of its hash or, when none is left, is new; the copies left
+    over at the end are the rows to delete.
+    """
+
+    def __init__(self, stored: dict):
+        self.stored = stored  # hash (None for documents without one) -> stored copies
+        self.used: dict = {}
+        self.unchanged = 0
+
+    def new_rows(self, chunks: Iterable) -> Iterator:
+        """The rows of DataFrame chunks (or batches of documents) that no stored row matches."""
+        for chunk in with_row_hashes(chunks):
+            is_frame = isinstance(chunk, pd.DataFrame)
+            hashes = chunk[ROW_HASH_COLUMN].tolist() if is_frame else [doc[ROW_HASH_COLUMN] for doc in chunk]
+            keep = np.ones(len(chunk), dtype=bool)
+            for i, h in enumerate(hashes):
+                used = self.used.get(h, 0)
+                if used < self.stored.get(h, 0):
+                    self.used[h] = used + 1
+                    keep[i] = False
+            self.unchanged += len(chunk) - int(keep.sum())
+            if keep.any():
+                yield chunk[keep] if is_frame else [doc for doc, k in zip(chunk, keep) if k]
+
+    def leftover(self) -> Iterator[tuple[Any, int, int]]:
+        """(hash, stored copies no incoming row matched, stored copies) for each hash with any left."""
+        for h, copies in self.stored.items():
+            left = copies - self.used.get(h, 0)
+            if left > 0:
+                yield h, left, copies
@@ -1,21 +1,79 @@
+import contextlib
+import hashlib
 import io
+import itertools
 import json
+import logging
+import os
 import re
+import resource
+import tempfile
+import time
+import warnings
+from collections.abc import AsyncIterator, Iterable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
 from typing import Any
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from fastapi import UploadFile
+from pandas.tseries.api import guess_datetime_format
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
 from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.db.mongodb import get_mongodb
-from app.middleware.error_handler import ValidationError, AppError
-from app.middleware.input_guard import validate_collection_name, sanitize_filename
-from app.models.metadata import CollectionMetadata, ColumnSchema
+from app.middleware.error_handler import NotFoundError, ValidationError, AppError
+from app.middleware.input_guard import (
+    MAX_COLLECTION_NAME_LENGTH,
+    sanitize_filename,
+    validate_collection_name,
+)
+from app.models.metadata import CollectionMetadata, ColumnProfile, ColumnSchema
 from app.repositories import metadata_repo
+from app.services import (
+    archive_reader,
+    arrow_readers,
+    cpu_pool,
+    documents,
+    excel_reader,
+    json_stream,
+    mongo_loader,
+    partitioning,
+    pg_loader,
+    row_delta,
+    upload_store,
+)
+from app.services.partitioning import PartitionPlan
+from app.services.row_delta import ROW_HASH_COLUMN
+
+logger = logging.getLogger(__name__)
 
 SNIFF_ROWS = 5
-MAX_FILE_SIZE_MB = 100
+MAX_FILE_SIZE_MB = 1000
+CHUNK_ROWS = 50_000  # rows per parse -> clean -> write chunk
+SPOOL_READ_BYTES = 1024 * 1024
+SUPPORTED_EXTENSIONS = (
+    "csv", "tsv", "xlsx", "xls", "json", "jsonl", "ndjson", "parquet", "arrow", "feather", "ipc",
+)
+_FORMAT_ALIASES = {"ndjson": "jsonl", "feather": "arrow", "ipc": "arrow"}
+NUMERIC_SAMPLE_ROWS = 1000  # values checked before converting a whole column
+NUMERIC_MIN_RATIO = 0.8
+DATETIME_GUESS_VALUES = 20  # sampled values whose format is guessed; the candidates are then tried on the sample
+DISTINCT_CAP = 1000  # distinct values tracked per column by the sniff; more counts as high-cardinality
+_MONOTONIC_DTYPES = ("integer", "float", "datetime")
+_NARROW_INTEGERS = (("SMALLINT", 2**15), ("INTEGER", 2**31))
+ENUM_MAX_VALUES = 64  # string columns with at most this many distinct labels are stored as an enum
+ENUM_MIN_LENGTH = 4  # mean label bytes below which TEXT is as small as an enum
+JSONB_MAX_FIELDS = 2  # nested fields a mostly tabular record may have and still be recommended Postgres (as JSONB)
+JSON_PATHS_MAX = 50  # leaf paths recorded per JSONB column
 
 
 def _sanitize_column_name(name: str) -> str:
@@ -23,11 +81,13 @@ def _sanitize_column_name(name: str) -> str:
     name = re.sub(r"[^\w]", "_", str(name).strip().lower())
     if name and name[0].isdigit():
         name = f"col_{name}"
+    if name == ROW_HASH_COLUMN:
+        name = f"{name}_"  # taken by the hidden row hash
     return name or "unnamed"
 
 
 def _pandas_dtype_to_str(dtype) -> str:
-    dtype_str = str(dtype)
+    dtype_str = str(dtype).lower()  # nullable extension dtypes are capitalized (Int64, Float64)
     if "int" in dtype_str:
         return "integer"
     if "float" in dtype_str:
@@ -39,6 +99,15 @@ def _pandas_dtype_to_str(dtype) -> str:
     return "string"
 
 
+def _column_dtype(series: pd.Series) -> str:
+    """Like _pandas_dtype_to_str, but reports "object" for columns holding lists/dicts."""
+    dtype = _pandas_dtype_to_str(series.dtype)
+    if dtype == "string" and pd.api.types.infer_dtype(series, skipna=True) == "mixed":
+        if series.map(lambda v: isinstance(v, (list, dict))).any():
+            return "object"
+    return dtype
+
+
 def _pandas_dtype_to_sql(dtype_str: str) -> str:
     mapping = {
         "integer": "BIGINT",
@@ -50,105 +119,207 @@ def _pandas_dtype_to_sql(dtype_str: str) -> str:
     return mapping.get(dtype_str, "TEXT")
 
 
-async def parse_file(file: UploadFile) -> pd.DataFrame:
-    """Parse uploaded file into a DataFrame."""
-    content = await file.read()
+@dataclass
+class SpooledUpload:
+    """An uploaded file copied to a local temp file so it can be re-read in chunks."""
+    path: str
+    filename: str
+    ext: str  # canonical format: csv, tsv, xlsx, xls, json, jsonl, parquet or arrow
+    size: int
+    sheet: str | None = None  # Excel only: the sheet to read; None reads the first
+    content_hash: str = ""  # SHA-256 of the file's bytes, computed while it was spooled
 
-    if len(content) > MAX_FILE_SIZE_MB * 1024 * 1024:
-        raise ValidationError(f"File exceeds {MAX_FILE_SIZE_MB}MB limit")
 
-    filename = file.filename or ""
-    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
-
-    if ext == "csv":
-        return pd.read_csv(io.BytesIO(content))
-    elif ext == "tsv":
-        return pd.read_csv(io.BytesIO(content), sep="\t")
-    elif ext in ("xlsx", "xls"):
-        return pd.read_excel(io.BytesIO(content))
-    elif ext == "json":
-        return _parse_json(content)
-    else:
-        raise ValidationError(f"Unsupported file type: .{ext}. Supported: csv, tsv, xlsx, xls, json")
+@dataclass
+class IngestStats:
+    """Outcome of one ingest: rows written, wall time, loader used and peak process RSS."""
+    row_count: int
+    elapsed_s: float
+    method: str
+    peak_rss_mb: float = 0.0
+    rows_updated: int = 0  # upserts: rows that replaced an existing key (the rest are new)
+    rows_deleted: int = 0  # delta loads: stored rows the upload no longer has
+    rows_unchanged: int = 0  # delta loads: upload rows already stored, left alone
+    storage_saved_bytes: int = 0  # Postgres: estimated saving of the narrowed column types
 
+    @property
+    def rows_inserted(self) -> int:
+        return self.row_count - self.rows_updated
 
-def _parse_json(content: bytes) -> pd.DataFrame:
-    """Parse JSON content. Handles wrapper objects, GeoJSON, arrays, and nested structures."""
-    data = json.loads(content)
+    @property
+    def rows_per_sec(self) -> float:
+        return self.row_count / self.elapsed_s if self.elapsed_s > 0 else 0.0
 
-    if isinstance(data, list):
-        items = data
-    elif isinstance(data, dict):
-        items = _unwrap_json_object(data)
-    else:
-        raise ValidationError("JSON must be an object or array of objects")
 
-    if not items:
-        raise ValidationError("JSON contains no records")
+def _rss_bytes() -> int:
+    """Current resident set size of this process (high-water mark where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _PeakRss:
+    """Samples RSS each time a chunk is pulled through an ingest, keeping the maximum."""
+
+    def __init__(self) -> None:
+        self.peak = _rss_bytes()
+
+    def track(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        for chunk in chunks:
+            self.peak = max(self.peak, _rss_bytes())
+            yield chunk
+        self.peak = max(self.peak, _rss_bytes())
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak / (1024 * 1024)
+
 
-    items = _flatten_geojson(items)
-    return pd.json_normalize(items)
+def _log_ingest(db_type: str, collection_name: str, stats: IngestStats) -> None:
+    logger.info(
+        "Loaded %d rows into %s:%s via %s in %.2fs (%.0f rows/s, peak RSS %.0f MB, compact types saved ~%.1f MB)",
+        stats.row_count, db_type, collection_name, stats.method,
+        stats.elapsed_s, stats.rows_per_sec, stats.peak_rss_mb, stats.storage_saved_bytes / (1024 * 1024),
+    )
+
+
+@dataclass
+class UploadSource:
+    """Data ready for ingestion: its sniff result and a stream of conformed chunks (or document batches)."""
+    filename: str
+    sniff_result: dict
+    chunks: Iterator[pd.DataFrame] | Iterator[list[dict]]
 
 
-def _unwrap_json_object(data: dict) -> list[dict]:
-    """Unwrap a JSON wrapper object to extract the array of records.
+def _file_extension(filename: str) -> str:
+    return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
 
-    Strategy:
-    1. Check well-known keys (data, results, records, items, rows, features)
-    2. If no match, detect a single top-level field whose value is a list of dicts
-    3. Otherwise treat as a single record
+
+@asynccontextmanager
+async def spooled_upload(file: UploadFile, archive: bool = False) -> AsyncIterator[SpooledUpload]:
+    """Stream an UploadFile to disk, enforcing the size cap without buffering it in memory.
+
+    The bytes are hashed on the way through (see dataset_hash). With `archive`
+    the file must be a zip or tar.gz (see archive_reader). The temp file is
+    removed when the context exits, unless it was moved away.
     """
-    well_known = ("data", "results", "records", "items", "rows", "features")
-    for key in well_known:
-        if key in data and isinstance(data[key], list) and data[key]:
-            return data[key]
+    filename = file.filename or ""
+    if archive:
+        ext = archive_reader.archive_format(filename)
+        if ext is None:
+            raise ValidationError(
+                f"Unsupported archive type: {filename}. Supported: {', '.join(archive_reader.ARCHIVE_FORMATS)}"
+            )
+    else:
+        ext = _file_extension(filename)
+        if ext not in SUPPORTED_EXTENSIONS:
+            raise ValidationError(
+                f"Unsupported file type: .{ext}. Supported: {', '.join(SUPPORTED_EXTENSIONS)}"
+            )
 
-    # Auto-detect: find fields whose value is a list of dicts
-    array_fields = [
-        k for k, v in data.items()
-        if isinstance(v, list) and v and isinstance(v[0], dict)
-    ]
-    if len(array_fields) == 1:
-        return data[array_fields[0]]
+    max_bytes = MAX_FILE_SIZE_MB * 1024 * 1024
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=f".{ext}")
+    try:
+        size = 0
+        digest = hashlib.sha256()
+        with os.fdopen(fd, "wb") as out:
+            while block := await file.read(SPOOL_READ_BYTES):
+                size += len(block)
+                if size > max_bytes:
+                    raise ValidationError(f"File exceeds {MAX_FILE_SIZE_MB}MB limit")
+                out.write(block)
+                digest.update(block)
+        fmt = _FORMAT_ALIASES.get(ext, ext)
+        yield SpooledUpload(path=path, filename=filename, ext=fmt, size=size, content_hash=digest.hexdigest())
+    finally:
+        # A fast sniff may have moved the file into the upload store already
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
 
-    # Treat the whole object as a single record
-    return [data]
 
+def _column_filter(columns: list[str] | None) -> arrow_readers.ColumnFilter:
+    """Predicate on raw source column names that keeps the given sanitized names."""
+    if columns is None:
+        return None
+    wanted = set(columns)
 
-def _flatten_geojson(items: list[dict]) -> list[dict]:
-    """If items look like GeoJSON features, flatten properties to top level."""
-    if not items:
-        return items
+    def keep(raw_name: str) -> bool:
+        return _sanitize_column_name(raw_name) in wanted
 
-    sample = items[0]
-    is_geojson = (
-        isinstance(sample, dict)
-        and sample.get("type") == "Feature"
-        and isinstance(sample.get("properties"), dict)
-    )
-    if not is_geojson:
-        return items
+    return keep
 
-    flattened = []
-    for item in items:
-        props = item.get("properties") or {}
-        row = {**props}
 
-        geometry = item.get("geometry")
-        if isinstance(geometry, dict):
-            row["geometry_type"] = geometry.get("type", "")
-            coords = geometry.get("coordinates")
-            if coords is not None:
-                row["geometry_coordinates"] = json.dumps(coords)
+def iter_chunks(
+    spool: SpooledUpload,
+    chunk_rows: int = CHUNK_ROWS,
+    columns: list[str] | None = None,
+    json_fields: list[str] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield the spooled file as raw DataFrames of at most chunk_rows rows.
 
-        # Preserve any other top-level fields besides type/properties/geometry
-        for k, v in item.items():
-            if k not in ("type", "properties", "geometry"):
-                row[k] = v
+    `columns` (sanitized names) projects the read; CSV, Excel, Parquet and
+    Arrow IPC skip decoding the other columns entirely. The top-level fields
+    of JSON and JSON Lines records named in `json_fields` are kept whole, as
+    dicts and lists, instead of being flattened to dotted columns.
+    """
+    keep = _column_filter(columns)
+    whole = _column_filter(json_fields or None)
+    if spool.ext in ("csv", "tsv"):
+        sep = "\t" if spool.ext == "tsv" else ","
+        with pd.read_csv(spool.path, sep=sep, chunksize=chunk_rows, usecols=keep) as reader:
+            yield from reader
+        return
+    if spool.ext == "parquet":
+        yield from arrow_readers.iter_parquet(spool.path, chunk_rows, keep)
+        return
+    if spool.ext == "arrow":
+        yield from arrow_readers.iter_table(spool.path, spool.ext, chunk_rows, keep)
+        return
+    if spool.ext == "jsonl":
+        yield from arrow_readers.iter_jsonl(spool.path, chunk_rows, keep, whole)
+        return
+
+    if spool.ext == "json":
+        with open(spool.path, "rb") as f:
+            yield from _iter_json(json_stream.JsonRecordStream(f), chunk_rows, keep, whole)
+        return
+    yield from excel_reader.iter_sheet(spool.path, spool.sheet, chunk_rows, keep)
 
-        flattened.append(row)
 
-    return flattened
+def _iter_json(
+    stream: Iterable,
+    chunk_rows: int,
+    keep: arrow_readers.ColumnFilter = None,
+    whole: arrow_readers.ColumnFilter = None,
+) -> Iterator[pd.DataFrame]:
+    """Normalize a JSON record stream into DataFrames of at most chunk_rows rows."""
+    batch: list = []
+    for record in stream:
+        batch.append(record)
+        if len(batch) == chunk_rows:
+            yield _normalize_records(batch, keep, whole)
+            batch = []
+    if batch:
+        yield _normalize_records(batch, keep, whole)
+
+
+def _normalize_records(
+    records: list, keep: arrow_readers.ColumnFilter, whole: arrow_readers.ColumnFilter = None
+) -> pd.DataFrame:
+    """Flatten records with json_normalize; the top-level fields `whole` accepts are left as they are, last."""
+    held: dict[str, list] = {}
+    if whole is not None:
+        names = {k for r in records if isinstance(r, dict) for k in r if whole(k)}
+        held = {name: [r.get(name) if isinstance(r, dict) else None for r in records] for name in names}
+        records = [{k: v for k, v in r.items() if k not in names} if isinstance(r, dict) else r for r in records]
+    df = pd.json_normalize(records)
+    for name, values in held.items():
+        df[name] = pd.Series(values, index=df.index, dtype=object)
+    if keep is not None:
+        df = df[[c for c in df.columns if keep(c)]]
+    return df
 
 
 def _is_nested(data: Any) -> bool:
@@ -158,32 +329,325 @@ def _is_nested(data: Any) -> bool:
     return False
 
 
-def sniff_data(df: pd.DataFrame, raw_json: bytes | None = None) -> dict:
-    """Analyze first few rows and produce schema + recommendation."""
-    df.columns = [_sanitize_column_name(c) for c in df.columns]
+def _jsonb_fields(items: list | None) -> list[str]:
+    """Nested fields of mostly tabular records, to keep whole as JSONB columns; [] when the records are not that.
+
+    Mostly tabular: every record is an object, and at most JSONB_MAX_FIELDS
+    of their top-level fields hold objects or arrays, outnumbered by the
+    fields holding scalars. GeoJSON is flattened its own way instead.
+    """
+    items = (items or [])[:SNIFF_ROWS]
+    if not items or not all(isinstance(item, dict) for item in items) or json_stream.is_geojson_feature(items[0]):
+        return []
+    nested = {k for item in items for k, v in item.items() if isinstance(v, (dict, list))}
+    scalar = {k for item in items for k in item} - nested
+    if not nested or len(nested) > JSONB_MAX_FIELDS or len(scalar) <= len(nested):
+        return []
+    return sorted(_sanitize_column_name(k) for k in nested)
+
+
+def _json_paths(value: Any, path: str = "") -> Iterator[str]:
+    """Paths to the leaves of a JSON value: "a.b" through objects, "a[]" through arrays."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _json_paths(item, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list):
+        for item in value:
+            yield from _json_paths(item, f"{path}[]")
+    elif path:
+        yield path
+
+
+_MAX_NS_SECONDS = 9_223_372_035  # seconds either side of the epoch a datetime64[ns] can hold
+
+
+def _parse_datetimes(series: pd.Series, fmt: str | None = None) -> pd.Series:
+    """Parse a column with its sniffed format (None infers it) as naive UTC, unparseable values as NaT.
+
+    Explicit formats on all-string columns go through Arrow's strptime kernel,
+    about 20x faster than pandas'; it has no fractional seconds (%f), which
+    fall back to pandas along with ISO 8601.
+    """
+    if fmt and fmt != "ISO8601" and "%f" not in fmt and pd.api.types.infer_dtype(series, skipna=True) == "string":
+        strings = pa.array(series, type=pa.string(), from_pandas=True)
+        seconds = pc.strptime(strings, format=fmt, unit="s", error_is_null=True)
+        if seconds.type.tz is not None:
+            seconds = seconds.cast(pa.timestamp("s"))  # %z offsets are already applied: the values are UTC
+        in_range = pc.less_equal(pc.abs(seconds.cast(pa.int64())), _MAX_NS_SECONDS)
+        seconds = pc.if_else(in_range, seconds, pa.scalar(None, seconds.type))
+        return seconds.cast(pa.timestamp("ns")).to_pandas().set_axis(series.index)
+    return pd.to_datetime(series, format=fmt, errors="coerce", utc=True).dt.tz_localize(None)
+
+
+def _format_datetimes(series: pd.Series, fmt: str | None) -> pd.Series:
+    if not fmt or fmt == "ISO8601":
+        fmt = "%Y-%m-%d" if (series.dropna() == series.dropna().dt.normalize()).all() else "%Y-%m-%dT%H:%M:%S"
+    return series.dt.strftime(fmt).astype(object).where(series.notna(), None)
+
+
+def _is_date_format(fmt: str) -> bool:
+    """Whether a strftime format pins down a calendar date (a bare month name or time of day does not)."""
+    return any(d in fmt for d in ("%Y", "%y")) and "%d" in fmt and any(m in fmt for m in ("%m", "%b", "%B"))
+
+
+def _datetime_format(series: pd.Series) -> str | None:
+    """Detect the date/timestamp format of a string column from a sample of its values.
+
+    Formats are guessed month-first and day-first from the first sampled
+    values; the first candidate that parses every sampled value wins. ISO
+    8601 variants collapse to pandas' "ISO8601", which takes mixed
+    precisions and offsets.
+    """
+    values = series.dropna()
+    if values.empty:
+        return None
+    step = max(len(values) // NUMERIC_SAMPLE_ROWS, 1)
+    sample = values.iloc[::step]
+    candidates: list[str] = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # guesses warn when a dayfirst hint does not apply
+        for value in sample.iloc[:DATETIME_GUESS_VALUES]:
+            for dayfirst in (False, True):
+                fmt = guess_datetime_format(str(value), dayfirst=dayfirst)
+                if fmt and _is_date_format(fmt):
+                    fmt = "ISO8601" if fmt.startswith("%Y-%m-%d") else fmt
+                    if fmt not in candidates:
+                        candidates.append(fmt)
+
+    for fmt in candidates:
+        if _parse_datetimes(sample, fmt).notna().all():
+            return fmt
+    return None
+
+
+def _detect_datetimes(series: pd.Series, fmt: str | None) -> tuple[pd.Series, str] | None:
+    """Parse a string chunk column as datetimes, with a known format or one detected from it.
+
+    None when it does not hold dates, or any value does not parse or falls
+    outside the datetime64[ns] range: the column then stays text rather than
+    lose those values to NULL.
+    """
+    if fmt and not series.notna().any():
+        return pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]"), fmt
+    if pd.api.types.infer_dtype(series, skipna=True) != "string":
+        return None
+    fmt = fmt or _datetime_format(series)
+    if fmt is None:
+        return None
+    parsed = _parse_datetimes(series, fmt)
+    if parsed.notna().sum() < series.notna().sum():
+        return None
+    return parsed, fmt
+
+
+def _merge_dtypes(a: str, b: str) -> str:
+    """Widen two column dtypes seen in different chunks to one that holds both.
+
+    "object" (nested lists/dicts) absorbs everything, as it is stored verbatim.
+    """
+    if a == b:
+        return a
+    if "object" in (a, b):
+        return "object"
+    if {a, b} == {"integer", "float"}:
+        return "float"
+    return "string"
+
+
+class _ColumnStats:
+    """Per-column facts gathered by the sniff across chunks.
+
+    The distinct-value count (up to DISTINCT_CAP) and file-order monotonicity
+    feed the index advisor; the value range, float32 exactness, time-of-day
+    and category labels pick the narrowest Postgres type (see sql_type).
+    """
+
+    def __init__(self) -> None:
+        self.values: set | None = set()
+        self.json_paths: set[str] = set()
+        self.monotonic = True
+        self.last: Any = None
+        self.low: Any = None
+        self.high: Any = None
+        self.float32_exact = True
+        self.date_only = True
+        self.all_strings = True
+
+    def update(self, series: pd.Series, dtype: str) -> None:
+        if self.values is not None:
+            try:
+                self.values.update(series.unique())  # nulls included; excluded when counted
+            except TypeError:  # lists/dicts are unhashable
+                self.values = None
+            else:
+                if len(self.values) > DISTINCT_CAP + 2:
+                    self.values = None
+        if dtype != "string":
+            self.all_strings = False
+        if dtype == "object":
+            for value in series.dropna():
+                if len(self.json_paths) >= JSON_PATHS_MAX:
+                    break
+                self.json_paths.update(_json_paths(value))
+        if dtype not in _MONOTONIC_DTYPES:
+            self.monotonic = False
+            return
+        values = series.dropna()
+        if not len(values):
+            return
+        low, high = values.min(), values.max()
+        try:
+            self.low = low if self.low is None else min(self.low, low)
+            self.high = high if self.high is None else max(self.high, high)
+        except TypeError:  # dates in one chunk, numbers in another: the column ends up text
+            self.low = self.high = None
+        if dtype == "datetime":
+            if values.dt.tz is not None:  # stored as naive UTC, so midnight must hold in UTC
+                values = values.dt.tz_convert("UTC")
+            self.date_only = self.date_only and bool((values == values.dt.normalize()).all())
+        elif self.float32_exact:
+            numbers = values.to_numpy(dtype=np.float64)
+            with np.errstate(over="ignore"):
+                self.float32_exact = bool(np.array_equal(numbers.astype(np.float32), numbers))
+        if self.monotonic:
+            try:
+                self.monotonic = values.is_monotonic_increasing and (
+                    self.last is None or values.iloc[0] >= self.last
+                )
+            except TypeError:
+                self.monotonic = False
+            self.last = values.iloc[-1]
+
+    @property
+    def distinct_count(self) -> int | None:
+        if self.values is None:
+            return None
+        count = sum(1 for v in self.values if not pd.isna(v))
+        return count if count <= DISTINCT_CAP else None
+
+    def enum_values(self, dtype: str) -> list[str] | None:
+        """Labels of a string column worth storing as an enum: few, valid labels, longer than the enum's 4 bytes."""
+        if dtype != "string" or not self.all_strings or self.values is None:
+            return None
+        labels = sorted(v for v in self.values if not pd.isna(v))
+        if not 2 <= len(labels) <= ENUM_MAX_VALUES or not all(isinstance(v, str) for v in labels):
+            return None
+        sizes = [len(v.encode()) for v in labels]
+        if not all(1 <= n <= 63 for n in sizes) or sum(sizes) / len(sizes) < ENUM_MIN_LENGTH:
+            return None
+        return labels
+
+    def sql_type(self, dtype: str) -> str | None:
+        """Narrowest Postgres type holding every value seen; None where that is the dtype's default."""
+        if dtype == "object":
+            return "JSONB"
+        if self.low is not None:
+            if dtype == "integer":
+                fits = (name for name, bound in _NARROW_INTEGERS if -bound <= self.low and self.high < bound)
+                return next(fits, None)
+            if dtype == "float" and self.float32_exact:
+                return "REAL"
+            if dtype == "datetime" and self.date_only:
+                return "DATE"
+        if self.enum_values(dtype):
+            return "ENUM"
+        return None
+
+    def time_range(self, dtype: str) -> list[datetime] | None:
+        """Earliest and latest value of a datetime column, as naive UTC like the stored values."""
+        if dtype != "datetime" or self.low is None:
+            return None
+        bounds = [pd.Timestamp(self.low), pd.Timestamp(self.high)]
+        if bounds[0].tz is not None:
+            bounds = [b.tz_convert("UTC").tz_localize(None) for b in bounds]
+        return [b.to_pydatetime(warn=False) for b in bounds]
+
+    def fields(self, dtype: str) -> dict:
+        return {
+            "distinct_count": self.distinct_count,
+            "time_range": self.time_range(dtype),
+            "monotonic": self.monotonic and self.last is not None and dtype in _MONOTONIC_DTYPES,
+            "sql_type": self.sql_type(dtype),
+            "enum_values": self.enum_values(dtype),
+            "json_paths": sorted(self.json_paths)[:JSON_PATHS_MAX] if dtype == "object" else None,
+        }
+
+
+def sniff_chunks(
+    chunks: Iterable[pd.DataFrame], json_items: list | None = None, json_fields: Iterable[str] = ()
+) -> dict:
+    """Produce schema + recommendation from a stream of chunks, holding one chunk at a time.
+
+    Column dtypes are widened across chunks (integer + float -> float, any other
+    mix -> string) and a column is nullable if any chunk has a null in it or lacks it.
+    Text columns holding dates are detected and parsed (see _datetime_format).
+    Each column also gets the statistics the index advisor works from: its
+    distinct count and whether it is monotonic. Records whose nested fields
+    the reader kept whole (`json_fields`, see _jsonb_fields) are recommended
+    Postgres, with those fields as JSONB columns.
+    """
+    json_fields = list(json_fields)
+    dtypes: dict[str, str] = {}
+    nullable: dict[str, bool] = {}
+    stats: dict[str, _ColumnStats] = {}
+    datetime_formats: dict[str, str] = {}
+    sample: pd.DataFrame | None = None
+    row_count = 0
+
+    for df in chunks:
+        df.columns = [_sanitize_column_name(c) for c in df.columns]
+        for col in dtypes.keys() - set(df.columns):
+            nullable[col] = True
+        for col in df.columns:
+            dtype = _column_dtype(df[col])
+            # Text dates: detected in the first chunk, then every chunk must parse with the same format
+            if col in datetime_formats or (dtype == "string" and col not in dtypes):
+                detected = _detect_datetimes(df[col], datetime_formats.get(col))
+                if detected is not None:
+                    df[col], datetime_formats[col] = detected
+                    dtype = "datetime"
+            has_nulls = bool(df[col].isna().any())
+            if col in dtypes:
+                dtypes[col] = _merge_dtypes(dtypes[col], dtype)
+                nullable[col] = nullable[col] or has_nulls
+            else:
+                dtypes[col] = dtype
+                nullable[col] = has_nulls or row_count > 0
+                stats[col] = _ColumnStats()
+            stats[col].update(df[col], dtype)
+            if dtypes[col] != "datetime":
+                datetime_formats.pop(col, None)
+        if sample is None:
+            sample = df.head(SNIFF_ROWS)
+        row_count += len(df)
+
+    if sample is None:
+        sample = pd.DataFrame()
 
-    sample = df.head(SNIFF_ROWS)
     columns = []
-    for col in df.columns:
+    for col in dtypes:
         col_schema = ColumnSchema(
             name=col,
-            dtype=_pandas_dtype_to_str(df[col].dtype),
-            nullable=bool(df[col].isna().any()),
-            sample_values=sample[col].dropna().tolist()[:SNIFF_ROWS],
+            dtype=dtypes[col],
+            nullable=nullable[col],
+            sample_values=sample[col].dropna().tolist()[:SNIFF_ROWS] if col in sample else [],
+            datetime_format=datetime_formats.get(col),
+            **stats[col].fields(dtypes[col]),
         )
         columns.append(col_schema)
 
     # Determine if data is nested (favor MongoDB)
-    has_nested = any("." in col for col in df.columns)  # json_normalize produces dotted names
-    if raw_json:
-        try:
-            parsed = json.loads(raw_json)
-            items = parsed if isinstance(parsed, list) else [parsed]
-            has_nested = any(_is_nested(item) for item in items[:SNIFF_ROWS])
-        except (json.JSONDecodeError, TypeError):
-            pass
+    has_nested = any("." in col for col in dtypes)  # json_normalize produces dotted names
+    if json_items is not None:
+        has_nested = any(_is_nested(item) for item in json_items[:SNIFF_ROWS])
 
-    if has_nested:
+    if json_fields:
+        recommended_db = "postgres"
+        reason = (
+            f"Data is mostly tabular; its nested field(s) {', '.join(json_fields)} fit PostgreSQL "
+            "as JSONB columns with GIN indexes."
+        )
+    elif has_nested:
         recommended_db = "mongodb"
         reason = "Data contains nested/hierarchical structures, better suited for MongoDB document storage."
     else:
@@ -195,94 +659,1270 @@ def sniff_data(df: pd.DataFrame, raw_json: bytes | None = None) -> dict:
     return {
         "columns": [c.model_dump() for c in columns],
         "sample_rows": sample_rows,
-        "row_count": len(df),
+        "row_count": row_count,
         "recommended_db": recommended_db,
         "recommendation_reason": reason,
+        "confidence": "exact",
     }
 
 
-async def ingest_postgres(
-    session: AsyncSession,
-    df: pd.DataFrame,
+def sniff_upload(spool: SpooledUpload, columns: list[str] | None = None, spill: str | None = None) -> dict:
+    """Sniff a spooled upload chunk by chunk, typing columns as they will be stored.
+
+    With `spill`, the chunks are also written to that file as parsed (see
+    iter_conformed), so loading them does not parse the upload again.
+    """
+    if spool.ext == "json":
+        with open(spool.path, "rb") as f:
+            stream = json_stream.JsonRecordStream(f)
+            records = iter(stream)
+            # The first chunk's records fill stream.head, which decides the fields kept whole
+            first = list(itertools.islice(records, CHUNK_ROWS))
+            json_fields = _jsonb_fields(stream.head)
+            whole = _column_filter(json_fields or None)
+            chunks = _iter_json(itertools.chain(first, records), CHUNK_ROWS, _column_filter(columns), whole)
+            chunks = _spilled(chunks, spill)
+            result = sniff_chunks((_clean_dataframe(c) for c in chunks), stream.head, json_fields)
+    elif spool.ext == "jsonl":
+        head = _jsonl_head(spool)
+        json_fields = _jsonb_fields(head)
+        chunks = _spilled(iter_chunks(spool, columns=columns, json_fields=json_fields), spill)
+        result = sniff_chunks((_clean_dataframe(c) for c in chunks), head, json_fields)
+    else:
+        chunks = _spilled(iter_chunks(spool, columns=columns), spill)
+        result = sniff_chunks(_clean_dataframe(c) for c in chunks)
+    if columns is not None:
+        _check_selected_columns(result, columns)
+    return result
+
+
+def _read_line_prefix(spool: SpooledUpload, max_lines: int) -> tuple[list[bytes], bool]:
+    """The first max_lines lines of the file and whether that was all of it."""
+    with open(spool.path, "rb") as f:
+        lines = []
+        while len(lines) < max_lines and (line := f.readline()):
+            lines.append(line)
+        return lines, not f.read(1)
+
+
+def _estimate_rows(spool: SpooledUpload, sample_rows: int, lines: list[bytes], header: bool) -> int:
+    """Extrapolate a row count from the bytes the sampled lines took up."""
+    header_bytes = len(lines[0]) if header else 0
+    body_bytes = sum(len(line) for line in lines) - header_bytes
+    if body_bytes <= 0:
+        return sample_rows
+    return max(round(sample_rows * (spool.size - header_bytes) / body_bytes), sample_rows)
+
+
+def _read_csv_sample(spool: SpooledUpload, rows: int) -> tuple[pd.DataFrame, int, bool]:
+    """Parse the first `rows` lines; estimate the total from the bytes they took up."""
+    sep = "\t" if spool.ext == "tsv" else ","
+    lines, exhausted = _read_line_prefix(spool, rows + 1)
+    try:
+        df = pd.read_csv(io.BytesIO(b"".join(lines)), sep=sep)
+    except pd.errors.ParserError:
+        # The cut landed inside a quoted multi-line field
+        df = pd.read_csv(spool.path, sep=sep, nrows=rows)
+    if exhausted or len(lines) < 2:
+        return df, len(df), True
+    return df, _estimate_rows(spool, len(df), lines, header=True), False
+
+
+def _parse_jsonl_head(lines: list[bytes]) -> list | None:
+    try:
+        return [json.loads(line) for line in lines[:SNIFF_ROWS] if line.strip()]
+    except ValueError:
+        return None
+
+
+def _jsonl_head(spool: SpooledUpload) -> list | None:
+    """The first few records of a JSON Lines file, used to detect nesting; None if they do not parse."""
+    lines, _ = _read_line_prefix(spool, SNIFF_ROWS)
+    return _parse_jsonl_head(lines)
+
+
+def _read_jsonl_sample(spool: SpooledUpload, rows: int) -> tuple[pd.DataFrame, int, bool, list | None]:
+    lines, exhausted = _read_line_prefix(spool, rows)
+    head = _parse_jsonl_head(lines)
+    df = arrow_readers.read_jsonl_bytes(b"".join(lines), _column_filter(_jsonb_fields(head) or None))
+    if exhausted:
+        return df, len(df), True, head
+    return df, _estimate_rows(spool, len(df), lines, header=False), False, head
+
+
+def _read_json_sample(spool: SpooledUpload, rows: int) -> tuple[pd.DataFrame, int, bool, list]:
+    """Normalize the first `rows` records; estimate the total from the bytes they took up."""
+    with open(spool.path, "rb") as f:
+        stream = json_stream.JsonRecordStream(f)
+        records = list(itertools.islice(stream, rows + 1))
+        consumed = stream.bytes_consumed
+    df = _normalize_records(records[:rows], None, _column_filter(_jsonb_fields(stream.head) or None))
+    if len(records) <= rows:
+        return df, len(df), True, stream.head
+    estimate = round(len(records) * spool.size / consumed) if consumed else len(records)
+    return df, max(estimate, len(records)), False, stream.head
+
+
+def _read_excel_sample(spool: SpooledUpload, rows: int) -> tuple[pd.DataFrame, int, bool]:
+    """Read the first `rows` rows; take the total from the sheet's dimensions."""
+    df, total = excel_reader.sample_sheet(spool.path, spool.sheet, rows)
+    return df, total, total <= rows
+
+
+def sniff_sample(spool: SpooledUpload, rows: int | None = None) -> dict:
+    """Fast sniff: infer schema and nullability from a bounded prefix of the file.
+
+    Reads at most `rows` rows or records of any format and reports an
+    estimated row count with confidence "sampled" unless the whole file fit
+    in the sample. JSON wrapper objects are still read end to end once to
+    locate their records array.
+    Parquet and Arrow row counts come from file metadata and are exact.
+    """
+    rows = rows or settings.sniff_sample_rows
+    json_items = None
+    if spool.ext in ("csv", "tsv"):
+        df, row_count, exact = _read_csv_sample(spool, rows)
+    elif spool.ext in ("xlsx", "xls"):
+        df, row_count, exact = _read_excel_sample(spool, rows)
+    elif spool.ext == "jsonl":
+        df, row_count, exact, json_items = _read_jsonl_sample(spool, rows)
+    elif spool.ext in ("parquet", "arrow"):
+        sample = arrow_readers.sample_parquet if spool.ext == "parquet" else arrow_readers.sample_ipc
+        df, row_count = sample(spool.path, rows)
+        exact = row_count <= rows
+    else:
+        df, row_count, exact, json_items = _read_json_sample(spool, rows)
+
+    result = sniff_chunks([_clean_dataframe(df)], json_items, _jsonb_fields(json_items))
+    result["row_count"] = row_count
+    result["confidence"] = "exact" if exact else "sampled"
+    return result
+
+
+def sniff_documents(spool: SpooledUpload, rows: int | None = None) -> dict:
+    """Sniff a JSON/JSONL upload loaded as nested documents (see documents) from its first `rows` records.
+
+    The columns are the dotted paths of the sample's leaves as the documents
+    store them, typed so their text leaves can be converted. Nothing else is
+    read: the documents are not conformed to the schema, so it needs no exact
+    pass over the whole file.
+    """
+    rows = rows or settings.sniff_sample_rows
+    with open(spool.path, "rb") as f:
+        if spool.ext == "jsonl":
+            sample = list(itertools.islice(documents.iter_jsonl(f), rows + 1))
+            consumed = f.tell()
+        else:
+            stream = json_stream.JsonRecordStream(f, documents=True)
+            sample = list(itertools.islice(stream, rows + 1))
+            consumed = stream.bytes_consumed
+    docs = [documents.to_document(record, {}) for record in sample[:rows]]
+    df = pd.json_normalize(docs)
+    paths = {_sanitize_column_name(c): c for c in df.columns}
+
+    result = sniff_chunks([_clean_dataframe(df)], docs)
+    for col in result["columns"]:
+        col["name"] = paths.get(col["name"], col["name"])
+    types = documents.leaf_types(result["columns"])
+    result["sample_rows"] = [documents.to_document(record, types) for record in sample[:SNIFF_ROWS]]
+    if len(sample) <= rows:
+        result["row_count"], result["confidence"] = len(docs), "exact"
+    else:
+        estimate = round(len(sample) * spool.size / consumed) if consumed else len(sample)
+        result["row_count"], result["confidence"] = max(estimate, len(sample)), "sampled"
+    result["nested"] = True
+    return result
+
+
+def sniff_and_store(spool: SpooledUpload, owner_id: str, sample: bool = True) -> dict:
+    """Sniff a spooled upload and keep it under an upload token for confirm.
+
+    A sampled sniff keeps the raw file (confirm does the single full parse,
+    loading the chunks that pass spilled, see spill_file); a full sniff
+    stores the conformed data, so confirm does not parse at all.
+    Excel results also list the workbook's sheets (the schema describes the
+    first); a workbook with several sheets is always kept raw so any of them
+    can be ingested.
+    """
+    sheets = excel_reader.sheet_names(spool.path) if spool.ext in ("xlsx", "xls") else []
+    if sample or len(sheets) > 1:
+        result = sniff_sample(spool) if sample else sniff_upload(spool)
+        result["sheets"] = sheets
+        result["upload_token"] = upload_store.save_raw(
+            owner_id, spool.filename, spool.ext, result, spool.path, spool.content_hash
+        )
+        return result
+
+    with spill_file(spool) as spill:
+        result = sniff_upload(spool, spill=spill)
+        result["sheets"] = sheets
+        result["upload_token"] = upload_store.save(
+            owner_id, spool.filename, result, iter_conformed(spool, result["columns"], spill), spool.content_hash
+        )
+    return result
+
+
+def dataset_hash(content_hash: str, sheet: str | None, columns: list[str] | None) -> str:
+    """Identity of the data a load writes: the file's bytes, and the sheet and columns taken from it."""
+    return hashlib.sha256(json.dumps([content_hash, sheet, columns]).encode()).hexdigest()
+
+
+def sheet_collection_name(base: str, sheet: str) -> str:
+    """Collection name for one sheet of a multi-sheet ingest: <base>_<sheet>."""
+    suffix = re.sub(r"_+", "_", re.sub(r"[^a-z0-9]", "_", sheet.lower())).strip("_") or "sheet"
+    return f"{base}_{suffix}"[:MAX_COLLECTION_NAME_LENGTH]
+
+
+def member_collection_name(prefix: str | None, member: str) -> str:
+    """Collection name for one file of an archive: its base name without extension, after `prefix`."""
+    stem = os.path.basename(member).rsplit(".", 1)[0]
+    name = re.sub(r"_+", "_", re.sub(r"[^a-z0-9]", "_", stem.lower())).strip("_") or "file"
+    if prefix:
+        return f"{prefix}_{name}"[:MAX_COLLECTION_NAME_LENGTH]
+    return (name if name[0].isalpha() else f"f_{name}")[:MAX_COLLECTION_NAME_LENGTH]
+
+
+def spooled_member(member: archive_reader.ExtractedMember) -> SpooledUpload:
+    """An extracted archive member as a spooled upload, ready to sniff."""
+    ext = _file_extension(member.name)
+    return SpooledUpload(
+        path=member.path,
+        filename=os.path.basename(member.name),
+        ext=_FORMAT_ALIASES.get(ext, ext),
+        size=member.size,
+        content_hash=member.content_hash,
+    )
+
+
+def _check_selected_columns(sniff_result: dict, columns: list[str]) -> None:
+    known = {c["name"] for c in sniff_result["columns"]}
+    unknown = [c for c in columns if c not in known]
+    if unknown:
+        raise ValidationError(f"Unknown columns: {', '.join(unknown)}")
+
+
+def _project_sniff(sniff_result: dict, columns: list[str] | None) -> dict:
+    """Restrict a sniff result to the selected columns (in their original order)."""
+    if columns is None:
+        return sniff_result
+    _check_selected_columns(sniff_result, columns)
+    wanted = set(columns)
+    return {
+        **sniff_result,
+        "columns": [c for c in sniff_result["columns"] if c["name"] in wanted],
+        "sample_rows": [
+            {k: v for k, v in row.items() if k in wanted} for row in sniff_result["sample_rows"]
+        ],
+    }
+
+
+async def stage_upload(
+    owner_id: str,
+    file: UploadFile | None = None,
+    upload_token: str | None = None,
+    columns: list[str] | None = None,
+    sheets: list[str] | None = None,
+) -> upload_store.StoredUpload:
+    """Make sure the upload to ingest sits in the token store, where a background job can read it.
+
+    A file sent straight to confirm gets the fast sniff and is stored exactly
+    as /upload/sniff would have stored it. `columns` can only be checked up
+    front against the sniffed (first) sheet; other sheets check them when
+    their job sniffs them.
+    """
+    if not upload_token:
+        if file is None:
+            raise ValidationError("Either a file or an upload_token is required")
+        async with spooled_upload(file) as spool:
+            upload_token = (await cpu_pool.run(sniff_and_store, spool, owner_id))["upload_token"]
+
+    stored = upload_store.get(upload_token, owner_id)
+    if stored is None:
+        raise NotFoundError("Upload expired or not found. Please upload the file again.")
+
+    available = stored.sniff_result.get("sheets") or []
+    if sheets:
+        if not available:
+            raise ValidationError("Sheets can only be selected for Excel uploads")
+        unknown = [s for s in sheets if s not in available]
+        if unknown:
+            raise ValidationError(f"Unknown sheets: {', '.join(unknown)}")
+    if columns is not None and (not sheets or sheets == available[:1]):
+        _check_selected_columns(stored.sniff_result, columns)
+    return stored
+
+
+def check_incremental_target(
+    stored: upload_store.StoredUpload,
+    columns: list[str] | None,
+    target: dict,
+    key_columns: list[str] | None,
+) -> None:
+    """Fail fast at confirm when the sniffed upload cannot be appended to `target` (its metadata).
+
+    The job checks again against the exact schema once it has read the file.
+    """
+    sniff_result = _project_sniff(stored.sniff_result, columns)
+    merge_schema(
+        target["name"],
+        target["columns"],
+        sniff_result["columns"],
+        target["db_type"],
+        key_columns,
+        partition_column(target),
+    )
+
+
+def partition_column(target: dict) -> str | None:
+    """The column a collection's table is range-partitioned on (from its metadata), if any."""
+    return (target.get("partition") or {}).get("column")
+
+
+@asynccontextmanager
+async def upload_source(
+    owner_id: str,
+    file: UploadFile | None = None,
+    upload_token: str | None = None,
+    columns: list[str] | None = None,
+    sheet: str | None = None,
+    discard: bool = True,
+) -> AsyncIterator[UploadSource]:
+    """Resolve what confirm should ingest: a stored sniff (by token) or a freshly sent file.
+
+    `columns` limits ingestion to a subset of the sniffed columns; the others are
+    never written and, where the format allows, never decoded. `sheet` picks an
+    Excel sheet other than the first. A token is discarded once ingestion
+    succeeds (unless `discard` is False, for callers sharing it); on failure it
+    is kept for a retry.
+    """
+    if upload_token:
+        stored = upload_store.get(upload_token, owner_id)
+        if stored is None:
+            raise NotFoundError("Upload expired or not found. Please upload the file again.")
+        first_sheet = (stored.sniff_result.get("sheets") or [None])[0]
+        if stored.format == "raw":
+            # Sampled sniff: run the exact schema pass now, over the stored file
+            spool = SpooledUpload(
+                path=upload_store.data_path(stored),
+                filename=stored.filename,
+                ext=stored.ext,
+                size=stored.size,
+                sheet=sheet,
+            )
+            if columns is not None and sheet in (None, first_sheet):
+                _check_selected_columns(stored.sniff_result, columns)
+            with spill_file(spool) as spill:
+                sniff_result = await cpu_pool.run(sniff_upload, spool, columns, spill)
+                chunks = iter_conformed(spool, sniff_result["columns"], spill)
+                yield UploadSource(filename=stored.filename, sniff_result=sniff_result, chunks=chunks)
+        else:
+            if sheet not in (None, first_sheet):
+                raise ValidationError(f"Unknown sheet: {sheet}")
+            sniff_result = _project_sniff(stored.sniff_result, columns)
+            chunks = upload_store.iter_chunks(stored, columns)
+            yield UploadSource(filename=stored.filename, sniff_result=sniff_result, chunks=chunks)
+        if discard:
+            upload_store.discard(upload_token)
+        return
+
+    if file is None:
+        raise ValidationError("Either a file or an upload_token is required")
+    async with spooled_upload(file) as spool:
+        spool.sheet = sheet
+        with spill_file(spool) as spill:
+            sniff_result = await cpu_pool.run(sniff_upload, spool, columns, spill)
+            yield UploadSource(
+                filename=spool.filename,
+                sniff_result=sniff_result,
+                chunks=iter_conformed(spool, sniff_result["columns"], spill),
+            )
+
+
+def loads_as_documents(owner_id: str, upload_token: str, columns: list[str] | None) -> bool:
+    """Whether a stored upload can load into MongoDB as nested documents: all of a raw JSON/JSONL file."""
+    stored = upload_store.get(upload_token, owner_id)
+    return (
+        columns is None
+        and stored is not None
+        and stored.format == "raw"
+        and stored.ext in documents.DOCUMENT_EXTENSIONS
+    )
+
+
+@asynccontextmanager
+async def document_source(owner_id: str, upload_token: str) -> AsyncIterator[UploadSource]:
+    """Resolve a stored JSON/JSONL upload as batches of nested documents, for MongoDB.
+
+    Only a sample is sniffed (see sniff_documents). The token is kept; the
+    caller discards it once ingestion succeeds.
+    """
+    stored = upload_store.get(upload_token, owner_id)
+    if stored is None:
+        raise NotFoundError("Upload expired or not found. Please upload the file again.")
+    spool = SpooledUpload(
+        path=upload_store.data_path(stored), filename=stored.filename, ext=stored.ext, size=stored.size
+    )
+    sniff_result = await cpu_pool.run(sniff_documents, spool)
+    yield UploadSource(
+        filename=stored.filename, sniff_result=sniff_result, chunks=iter_documents(spool, sniff_result["columns"])
+    )
+
+
+def iter_documents(spool: SpooledUpload, columns: list[dict]) -> Iterator[list[dict]]:
+    """Batches of nested documents from a JSON/JSONL upload, text leaves typed by the sniffed columns."""
+    with open(spool.path, "rb") as f:
+        yield from documents.iter_documents(f, spool.ext, documents.leaf_types(columns))
+
+
+def _json_text(value: Any) -> str | None:
+    return None if value is None else json.dumps(value, default=str)
+
+
+def _json_encoded(chunks: Iterable[pd.DataFrame], columns: list[dict]) -> Iterable[pd.DataFrame]:
+    """Chunks with their JSONB columns' values as JSON text, so a plain string is written as a JSON string."""
+    names = [c["name"] for c in columns if c.get("sql_type") == "JSONB"]
+    if not names:
+        return chunks
+    return (df.assign(**{name: df[name].map(_json_text) for name in names}) for df in chunks)
+
+
+def _conform_chunk(df: pd.DataFrame, columns: list[dict]) -> pd.DataFrame:
+    """Clean a raw chunk and cast it to the sniffed schema so every chunk writes alike.
+
+    Numeric coercion is left to the schema: a column typed "string" keeps its
+    original text even where a single chunk looked numeric.
+    """
+    df = _clean_dataframe(df, coerce_numeric=False)
+    df.columns = [_sanitize_column_name(c) for c in df.columns]
+    df = df.reindex(columns=[c["name"] for c in columns])
+
+    for col_info in columns:
+        col, dtype = col_info["name"], col_info["dtype"]
+        series = df[col]
+        if dtype == "integer":
+            df[col] = _to_numeric(series).astype("Int64")
+        elif dtype == "float":
+            df[col] = _to_numeric(series).astype("float64")
+        elif dtype == "boolean":
+            df[col] = series.astype("boolean")
+        elif dtype == "datetime":
+            df[col] = _parse_datetimes(series, col_info.get("datetime_format"))
+        elif dtype == "object":
+            df[col] = series.astype(object).where(series.notna(), None)
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            # Detected dates written to an existing text column: back to text, in their sniffed format
+            df[col] = _format_datetimes(series, col_info.get("datetime_format"))
+        elif pd.api.types.infer_dtype(series, skipna=True) not in ("string", "empty"):
+            df[col] = series.astype(object).where(series.notna(), None).map(
+                lambda x: x if x is None or isinstance(x, str) else str(x)
+            )
+    return df
+
+
+@contextmanager
+def spill_file(spool: SpooledUpload) -> Iterator[str | None]:
+    """A temp file for sniff_upload to spill a text upload's parsed chunks to; None for Parquet and Arrow IPC.
+
+    Reading the spill back is a fraction of the cost of parsing CSV, JSON or
+    Excel again, while Parquet and Arrow IPC decode about as fast as a spill
+    would load.
+    """
+    if spool.ext in ("parquet", "arrow"):
+        yield None
+        return
+    fd, path = tempfile.mkstemp(prefix="spill_", suffix=".arrows")
+    os.close(fd)
+    try:
+        yield path
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+
+
+# Object columns Arrow holds as one scalar type; their values are restored from it as the same Python objects
+_SPILL_SCALAR_KINDS = frozenset({"integer", "floating", "boolean", "decimal", "datetime", "date", "time"})
+_SPILL_KINDS_KEY = b"datalens.spill"
+
+
+def _spill_batch(chunk: pd.DataFrame) -> pa.RecordBatch:
+    """A raw chunk as a record batch that _from_spill_batch turns back into the same frame.
+
+    Object columns that are not all text are either kept as their one scalar
+    type or, when mixed or nested, JSON-encoded like upload_store's object
+    columns; the schema metadata records which, by position.
+    """
+    encoded, kinds = chunk.copy(deep=False), {}
+    for i, (_, series) in enumerate(chunk.items()):
+        inferred = pd.api.types.infer_dtype(series, skipna=True) if series.dtype == object else None
+        if inferred in (None, "string", "empty"):
+            continue
+        kind = "json"
+        if inferred in _SPILL_SCALAR_KINDS:
+            with contextlib.suppress(pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                pa.array(series, from_pandas=True)
+                kind = "object"
+        if kind == "json":
+            encoded.isetitem(i, series.map(lambda v: None if v is None else json.dumps(v, default=str)))
+        kinds[i] = kind
+    batch = pa.RecordBatch.from_pandas(encoded, preserve_index=False)
+    return batch.replace_schema_metadata({**batch.schema.metadata, _SPILL_KINDS_KEY: json.dumps(kinds)})
+
+
+def _from_spill_batch(batch: pa.RecordBatch) -> pd.DataFrame:
+    df = batch.to_pandas()
+    for i, kind in json.loads(batch.schema.metadata[_SPILL_KINDS_KEY]).items():
+        i = int(i)
+        if kind == "json":
+            values = [None if v is None else json.loads(v) for v in batch.column(i).to_pylist()]
+        else:
+            values = batch.column(i).to_pylist()
+        df.isetitem(i, pd.Series(values, index=df.index, dtype=object))
+    return df
+
+
+def _spilled(chunks: Iterable[pd.DataFrame], spill: str | None) -> Iterator[pd.DataFrame]:
+    """Pass chunks through, writing each to `spill` before anything modifies it.
+
+    Chunks of one upload need not share columns or types, so each is written
+    as an Arrow IPC stream of its own, one after the other.
+    """
+    if spill is None:
+        yield from chunks
+        return
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.OSFile(spill, "wb") as sink:
+        for chunk in chunks:
+            batch = _spill_batch(chunk)
+            with pa.ipc.new_stream(sink, batch.schema, options=options) as writer:
+                writer.write_batch(batch)
+            yield chunk
+
+
+def _iter_spilled(spill: str) -> Iterator[pd.DataFrame]:
+    with pa.memory_map(spill) as source:
+        while source.tell() < source.size():
+            with pa.ipc.open_stream(source) as reader:
+                for batch in reader:
+                    yield _from_spill_batch(batch)
+
+
+def iter_conformed(spool: SpooledUpload, columns: list[dict], spill: str | None = None) -> Iterator[pd.DataFrame]:
+    """Yield the spooled file as cleaned chunks cast to the sniffed schema.
+
+    Only the schema's columns are read, so a projected schema projects the
+    parse. With `spill` (the file sniff_upload spilled the same chunks to),
+    the chunks are read back from it instead of parsing the upload again.
+    """
+    if spill is not None:
+        chunks = _iter_spilled(spill)
+    else:
+        json_fields = [c["name"] for c in columns if c.get("sql_type") == "JSONB"]
+        chunks = iter_chunks(spool, columns=[c["name"] for c in columns], json_fields=json_fields)
+    for chunk in chunks:
+        yield _conform_chunk(chunk, columns)
+
+
+def _dtype_fits(dtype: str, target: str) -> bool:
+    """Whether values sniffed as `dtype` can be written to a column typed `target`."""
+    return dtype == target or target in ("string", "object") or (dtype, target) == ("integer", "float")
+
+
+_WIDENING = (("SMALLINT", "INTEGER", "BIGINT"), ("REAL", "DOUBLE PRECISION"), ("DATE", "TIMESTAMP"), ("ENUM", "TEXT"))
+
+
+def _widened_type(target: dict, col: dict) -> dict:
+    """The target column's sql_type and enum_values once the upload column `col` is written to it.
+
+    Types only widen, along their chain in _WIDENING; the widest is the
+    dtype's default and recorded as None. An enum becomes TEXT when the upload
+    has labels it lacks, as new labels cannot be used in the transaction that
+    adds them.
+    """
+    current = target.get("sql_type")
+    if current in (None, "JSONB"):  # JSONB holds any value as JSON
+        return {}
+    needed = _sql_type(col)
+    if col["dtype"] != target["dtype"]:  # integer -> float, or anything -> string
+        needed = "REAL" if (target["dtype"], needed) == ("float", "SMALLINT") else _pandas_dtype_to_sql(target["dtype"])
+    if current == needed == "ENUM" and not set(col["enum_values"]) <= set(target["enum_values"]):
+        needed = "TEXT"
+    chain = next(c for c in _WIDENING if current in c)
+    widest = max(current, needed, key=chain.index) if needed in chain else chain[-1]
+    if widest == chain[-1]:
+        return {"sql_type": None, "enum_values": None}
+    return {"sql_type": widest}
+
+
+def merge_schema(
     collection_name: str,
+    target_columns: list[dict],
     columns: list[dict],
-) -> int:
-    """Create table and insert data into PostgreSQL."""
-    collection_name = validate_collection_name(collection_name)
-    df = _clean_dataframe(df.copy())
-    df.columns = [_sanitize_column_name(c) for c in df.columns]
+    db_type: str,
+    key_columns: list[str] | None = None,
+    partition_column: str | None = None,
+) -> tuple[list[dict], list[dict]]:
+    """Check an upload's schema against an existing collection before appending or upserting.
+
+    Returns the columns to write (the upload's, cast to the collection's
+    dtypes) and the collection's merged schema, where new columns are added as
+    nullable and, in Postgres, narrowed column types are widened to hold the
+    upload's values. A partitioned table's unique keys must include its
+    partition column, whose type cannot change. Raises ValidationError
+    listing every incompatibility.
+    """
+    target = {c["name"]: c for c in target_columns}
+    incoming = {c["name"]: c for c in columns}
+    problems = []
+
+    for col in columns:
+        existing = target.get(col["name"])
+        if existing is None:
+            continue
+        if not _dtype_fits(col["dtype"], existing["dtype"]):
+            problems.append(f"'{col['name']}' is {existing['dtype']} there but {col['dtype']} in the upload")
+        elif db_type == "postgres" and col.get("nullable", True) and not existing.get("nullable", True):
+            problems.append(f"'{col['name']}' cannot be empty there but has empty values in the upload")
+    if db_type == "postgres":
+        problems.extend(
+            f"'{name}' cannot be empty there but is missing from the upload"
+            for name, col in target.items()
+            if name not in incoming and not col.get("nullable", True)
+        )
+    for key in key_columns or []:
+        if key not in target or key not in incoming:
+            problems.append(f"key column '{key}' must exist in both")
+        elif incoming[key].get("nullable", True):
+            problems.append(f"key column '{key}' has empty values in the upload")
+    if key_columns and partition_column and partition_column not in key_columns:
+        problems.append(f"key columns must include '{partition_column}', which the table is partitioned on")
+    if problems:
+        raise ValidationError(f"Upload does not match '{collection_name}': {'; '.join(problems)}")
+
+    write_columns = [
+        {**col, "dtype": target[col["name"]]["dtype"], "sql_type": target[col["name"]].get("sql_type")}
+        if col["name"] in target else col
+        for col in columns
+    ]
+    merged = []
+    for col in target_columns:
+        new = incoming.get(col["name"])
+        nullable = col.get("nullable", True) or new is None or new.get("nullable", True)
+        widened = _widened_type(col, new) if new is not None and db_type == "postgres" else {}
+        if col["name"] == partition_column and widened.get("sql_type", col.get("sql_type")) != col.get("sql_type"):
+            raise ValidationError(
+                f"Upload does not match '{collection_name}': '{col['name']}' is the partition column "
+                f"and cannot be widened from {_sql_type(col)} to {_sql_type({**col, **widened})}"
+            )
+        merged.append({**col, "nullable": nullable, **widened})
+    merged.extend({**col, "nullable": True} for col in columns if col["name"] not in target)
+    return write_columns, merged
+
+
+def conform_to(
+    chunks: Iterable[pd.DataFrame], columns: list[dict], write_columns: list[dict]
+) -> Iterable[pd.DataFrame]:
+    """Re-cast chunks conformed to `columns` to `write_columns`; a no-op when no dtype differs."""
+    if all(a["dtype"] == b["dtype"] for a, b in zip(columns, write_columns)):
+        return chunks
+    return (_conform_chunk(df, write_columns) for df in chunks)
+
 
-    # Build CREATE TABLE
-    col_defs = []
+def _sql_type(col: dict) -> str:
+    """Declared Postgres type of a column: its narrowed sql_type, else its dtype's default."""
+    return col.get("sql_type") or _pandas_dtype_to_sql(col["dtype"])
+
+
+def _enum_type_name(table: str, column: str) -> str:
+    digest = hashlib.md5(f"{table}.{column}".encode()).hexdigest()[:8]
+    return f"{table[:40]}_{digest}_enum"
+
+
+def _column_type_sql(table: str, col: dict) -> tuple[str | None, str]:
+    """The column's type for DDL, and the CREATE TYPE an ENUM column needs first."""
+    sql_type = _sql_type(col)
+    if sql_type != "ENUM":
+        return None, sql_type
+    type_name = _enum_type_name(table, col["name"])
+    labels = ", ".join("'" + label.replace("'", "''") + "'" for label in col["enum_values"])
+    return f'CREATE TYPE "{type_name}" AS ENUM ({labels})', f'"{type_name}"'
+
+
+def _create_table_statements(
+    collection_name: str, columns: list[dict], partition: PartitionPlan | None = None
+) -> list[str]:
+    """CREATE TYPE/TABLE statements for a new table, and the partitions of a partitioned one.
+
+    A partitioned table's id has no primary key: Postgres requires every
+    unique index of it to include the partition column. Every table has the
+    hidden row hash column (see row_delta).
+    """
+    statements, col_defs = [], []
     for col_info in columns:
-        sql_type = _pandas_dtype_to_sql(col_info["dtype"])
+        create_type, sql_type = _column_type_sql(collection_name, col_info)
+        if create_type:
+            statements.append(create_type)
         nullable = "NULL" if col_info.get("nullable", True) else "NOT NULL"
         col_defs.append(f'"{col_info["name"]}" {sql_type} {nullable}')
 
-    create_sql = f'CREATE TABLE IF NOT EXISTS "{collection_name}" (\n  id BIGSERIAL PRIMARY KEY,\n  {",\n  ".join(col_defs)}\n)'
-    await session.execute(text(create_sql))
+    id_def = "id BIGSERIAL NOT NULL" if partition else "id BIGSERIAL PRIMARY KEY"
+    body = ",\n  ".join([id_def, f'"{ROW_HASH_COLUMN}" BIGINT NULL', *col_defs])
+    create = f'CREATE TABLE IF NOT EXISTS "{collection_name}" (\n  {body}\n)'
+    if partition is None:
+        return [*statements, create]
+    time_range = next(c.get("time_range") for c in columns if c["name"] == partition.column)
+    return [
+        *statements,
+        f"{create} {partitioning.partition_by_sql(partition)}",
+        *partitioning.partition_statements(collection_name, partition, time_range, default=True),
+    ]
+
+
+_NARROWED_BYTES = {"SMALLINT": 6, "INTEGER": 4, "REAL": 4, "DATE": 4}  # saved per value against the default
 
-    # Insert rows in batches
-    if len(df) == 0:
+
+def estimate_storage_saved(columns: list[dict], row_count: int) -> int:
+    """Estimated bytes the narrowed column types save over the defaults (BIGINT, DOUBLE, TIMESTAMP, TEXT).
+
+    Counts value widths only: an enum replaces a short text of mean label
+    length plus its 1-byte header with 4 bytes. Alignment padding, which
+    narrow types often reduce further, is not counted.
+    """
+    per_row = 0.0
+    for col in columns:
+        sql_type = col.get("sql_type")
+        if sql_type == "ENUM":
+            labels = col["enum_values"]
+            per_row += 1 + sum(len(label.encode()) for label in labels) / len(labels) - 4
+        else:
+            per_row += _NARROWED_BYTES.get(sql_type, 0)
+    return round(per_row * row_count)
+
+
+async def _pg_load_method(session: AsyncSession) -> tuple[str, pg_loader.Loader]:
+    method = settings.pg_load_method
+    if method == "copy" and not await pg_loader.supports_copy(session):
+        method = "insert"
+    return method, pg_loader.copy_chunks if method == "copy" else pg_loader.insert_chunks
+
+
+async def ingest_postgres(
+    session: AsyncSession,
+    chunks: Iterable[pd.DataFrame],
+    collection_name: str,
+    columns: list[dict],
+    partition: PartitionPlan | None = None,
+) -> IngestStats:
+    """Create table and load conformed chunks into PostgreSQL, one chunk at a time.
+
+    Uses binary COPY when the driver supports it and `pg_load_method` is "copy";
+    otherwise falls back to batched executemany INSERTs. With `pg_copy_writers`
+    above one the COPY is split across that many pooled connections, which
+    commit together once all have finished; the table is committed before
+    they start, so it is dropped again if any of them fails. With a
+    `partition` plan the table is range-partitioned and Postgres routes each
+    row to its partition.
+    """
+    collection_name = validate_collection_name(collection_name)
+    start = time.perf_counter()
+    for statement in _create_table_statements(collection_name, columns, partition):
+        await session.execute(text(statement))
+
+    method, loader = await _pg_load_method(session)
+    col_names = [c["name"] for c in columns] + [ROW_HASH_COLUMN]
+    text_columns = [c["name"] for c in columns if _pandas_dtype_to_sql(c["dtype"]) == "TEXT"]
+    chunks = row_delta.with_row_hashes(_json_encoded(chunks, columns))
+    memory = _PeakRss()
+    if method == "copy" and settings.pg_copy_writers > 1:
+        method = f"copy x{settings.pg_copy_writers}"
         await session.commit()
-        return 0
+        try:
+            total = await pg_loader.parallel_copy_chunks(
+                collection_name, col_names, memory.track(chunks), text_columns, settings.pg_copy_writers
+            )
+        except BaseException:
+            await _drop_table(session, collection_name)
+            await session.commit()
+            raise
+    else:
+        total = await loader(session, collection_name, col_names, memory.track(chunks), text_columns)
+
+    await session.commit()
+    stats = IngestStats(
+        row_count=total,
+        elapsed_s=time.perf_counter() - start,
+        method=method,
+        peak_rss_mb=memory.peak_mb,
+        storage_saved_bytes=estimate_storage_saved(columns, total),
+    )
+    _log_ingest("postgres", collection_name, stats)
+    return stats
 
-    col_names = [c["name"] for c in columns]
-    placeholders = ", ".join(f":{c}" for c in col_names)
-    col_list = ", ".join(f'"{c}"' for c in col_names)
-    insert_sql = text(f'INSERT INTO "{collection_name}" ({col_list}) VALUES ({placeholders})')
 
-    records = df.where(df.notna(), None).to_dict(orient="records")
-    batch_size = 1000
-    for i in range(0, len(records), batch_size):
-        batch = records[i : i + batch_size]
-        await session.execute(insert_sql, batch)
+def _copy_column_sql(table: str, col: dict) -> str:
+    # The copy has enum types of its own; enums only convert to one another through text
+    _, sql_type = _column_type_sql(table, col)
+    if _sql_type(col) == "ENUM":
+        return f'"{col["name"]}"::text::{sql_type}'
+    return f'"{col["name"]}"'
 
+
+async def copy_postgres(
+    session: AsyncSession,
+    source: str,
+    collection_name: str,
+    columns: list[dict],
+    partition: PartitionPlan | None = None,
+) -> IngestStats:
+    """Create collection_name as a server-side copy of the table `source`, which holds the same data.
+
+    The table is created from the columns' DDL rather than with CREATE TABLE
+    AS, so it gets its own id sequence, primary key, enum types and
+    partitions and either table can be dropped alone; one INSERT ... SELECT
+    then fills it without the data leaving the server. Row hashes are copied
+    along when the source has them.
+    """
+    source = validate_collection_name(source)
+    collection_name = validate_collection_name(collection_name)
+    start = time.perf_counter()
+    for statement in _create_table_statements(collection_name, columns, partition):
+        await session.execute(text(statement))
+    names = [f'"{c["name"]}"' for c in columns]
+    values = [_copy_column_sql(collection_name, c) for c in columns]
+    if await _has_row_hashes(session, source):
+        names.append(f'"{ROW_HASH_COLUMN}"')
+        values.append(f'"{ROW_HASH_COLUMN}"')
+    names, values = ", ".join(names), ", ".join(values)
+    result = await session.execute(text(f'INSERT INTO "{collection_name}" ({names}) SELECT {values} FROM "{source}"'))
     await session.commit()
-    return len(records)
+    stats = IngestStats(
+        row_count=result.rowcount,
+        elapsed_s=time.perf_counter() - start,
+        method="copy-table",
+        storage_saved_bytes=estimate_storage_saved(columns, result.rowcount),
+    )
+    _log_ingest("postgres", collection_name, stats)
+    return stats
+
+
+_ROW_HASH_SQL = text(
+    "SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass(:table) AND attname = :column AND NOT attisdropped"
+)
+
+
+async def _has_row_hashes(session: AsyncSession, table: str) -> bool:
+    """Whether the table has the row hash column (tables loaded before hashes existed do not)."""
+    result = await session.execute(_ROW_HASH_SQL, {"table": f'"{table}"', "column": ROW_HASH_COLUMN})
+    return result.first() is not None
+
+
+def _upsert_index_name(table: str, key_columns: list[str]) -> str:
+    digest = hashlib.md5(",".join(key_columns).encode()).hexdigest()[:8]
+    return f"{table[:48]}_key_{digest}"
+
 
+async def _ensure_postgres_key(session: AsyncSession, table: str, key_columns: list[str]) -> None:
+    """Create the unique index ON CONFLICT needs; only the first upsert with these keys builds it."""
+    keys = ", ".join(f'"{k}"' for k in key_columns)
+    try:
+        await session.execute(text(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS "{_upsert_index_name(table, key_columns)}" ON "{table}" ({keys})'
+        ))
+    except IntegrityError as exc:
+        raise ValidationError(f"Key columns ({', '.join(key_columns)}) are not unique in '{table}'") from exc
+
+
+async def append_postgres(
+    session: AsyncSession,
+    chunks: Iterable[pd.DataFrame],
+    collection_name: str,
+    columns: list[dict],
+    new_columns: Iterable[dict] = (),
+    key_columns: list[str] | None = None,
+    retyped_columns: Iterable[dict] = (),
+    partition: PartitionPlan | None = None,
+) -> IngestStats:
+    """Append conformed chunks to an existing table, or upsert them by `key_columns`.
+
+    Columns whose narrowed type is too small for the upload are widened
+    first (`retyped_columns`, as merge_schema widened them; this rewrites the
+    table). New columns are added as nullable, which only touches the catalog.
+    A partitioned table (`partition`) first gets the partitions the upload's
+    time range needs. Everything runs in one transaction, so a failed load leaves the table as
+    it was.
+    """
+    collection_name = validate_collection_name(collection_name)
+    start = time.perf_counter()
+    await _prepare_incremental(session, collection_name, columns, new_columns, retyped_columns, partition)
+
+    method, loader = await _pg_load_method(session)
+    col_names = [c["name"] for c in columns] + [ROW_HASH_COLUMN]
+    text_columns = [c["name"] for c in columns if _pandas_dtype_to_sql(c["dtype"]) == "TEXT"]
+    chunks = row_delta.with_row_hashes(_json_encoded(chunks, columns))
+    memory = _PeakRss()
+    if key_columns:
+        await _ensure_postgres_key(session, collection_name, key_columns)
+        total, updated = await pg_loader.upsert_chunks(
+            session, collection_name, col_names, memory.track(chunks), key_columns, loader, text_columns
+        )
+        method = f"{method}+upsert"
+    else:
+        total = await loader(session, collection_name, col_names, memory.track(chunks), text_columns)
+        updated = 0
 
-def _clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    """Strip whitespace from string columns and coerce numeric-looking columns."""
+    await session.commit()
+    stats = IngestStats(
+        row_count=total,
+        elapsed_s=time.perf_counter() - start,
+        method=method,
+        peak_rss_mb=memory.peak_mb,
+        rows_updated=updated,
+    )
+    _log_ingest("postgres", collection_name, stats)
+    return stats
+
+
+async def _prepare_incremental(
+    session: AsyncSession,
+    collection_name: str,
+    columns: list[dict],
+    new_columns: Iterable[dict],
+    retyped_columns: Iterable[dict],
+    partition: PartitionPlan | None,
+) -> None:
+    """Make an existing table ready for an append or delta load of `columns` (see append_postgres)."""
+    enum_types = await _enum_types(session, collection_name) if retyped_columns else {}
+    for col in retyped_columns:
+        _, sql_type = _column_type_sql(collection_name, col)
+        await session.execute(text(
+            f'ALTER TABLE "{collection_name}" ALTER COLUMN "{col["name"]}" TYPE {sql_type} '
+            f'USING "{col["name"]}"::{sql_type}'
+        ))
+        if col["name"] in enum_types:
+            await session.execute(text(f'DROP TYPE IF EXISTS "{enum_types[col["name"]]}"'))
+    for col in new_columns:
+        create_type, sql_type = _column_type_sql(collection_name, col)
+        if create_type:
+            await session.execute(text(create_type))
+        await session.execute(text(
+            f'ALTER TABLE "{collection_name}" ADD COLUMN IF NOT EXISTS "{col["name"]}" {sql_type} NULL'
+        ))
+    # Tables loaded before row hashes existed get the column now; their rows stay without one
+    await session.execute(text(
+        f'ALTER TABLE "{collection_name}" ADD COLUMN IF NOT EXISTS "{ROW_HASH_COLUMN}" BIGINT NULL'
+    ))
+    if partition is not None:
+        await partitioning.create_partitions(session, collection_name, partition, columns)
+
+
+async def delta_postgres(
+    session: AsyncSession,
+    chunks: Iterable[pd.DataFrame],
+    collection_name: str,
+    columns: list[dict],
+    new_columns: Iterable[dict] = (),
+    retyped_columns: Iterable[dict] = (),
+    partition: PartitionPlan | None = None,
+) -> IngestStats:
+    """Make an existing table hold exactly the upload's rows, writing only those that changed.
+
+    The upload is bulk-loaded with its row hashes into a temporary staging
+    table; one DELETE then removes the stored rows it no longer has and one
+    INSERT ... SELECT adds its new ones (see row_delta). The schema is
+    prepared as for an append, and it all runs in one transaction.
+    """
+    collection_name = validate_collection_name(collection_name)
+    start = time.perf_counter()
+    await _prepare_incremental(session, collection_name, columns, new_columns, retyped_columns, partition)
+
+    method, loader = await _pg_load_method(session)
+    col_names = [c["name"] for c in columns]
+    text_columns = [c["name"] for c in columns if _pandas_dtype_to_sql(c["dtype"]) == "TEXT"]
+    await session.execute(text(row_delta.stage_sql(collection_name, col_names)))
+    memory = _PeakRss()
+    staged = await loader(
+        session,
+        row_delta.DELTA_STAGE_TABLE,
+        [*col_names, ROW_HASH_COLUMN],
+        memory.track(row_delta.with_row_hashes(_json_encoded(chunks, columns))),
+        text_columns,
+    )
+    deleted = (await session.execute(text(row_delta.delete_sql(collection_name)))).rowcount
+    inserted = (await session.execute(text(row_delta.insert_sql(collection_name, col_names)))).rowcount
+
+    await session.commit()
+    stats = IngestStats(
+        row_count=inserted,
+        elapsed_s=time.perf_counter() - start,
+        method=f"{method}+delta",
+        peak_rss_mb=memory.peak_mb,
+        rows_deleted=deleted,
+        rows_unchanged=staged - inserted,
+    )
+    _log_ingest("postgres", collection_name, stats)
+    return stats
+
+
+def _strip_strings(series: pd.Series) -> pd.Series:
+    """Strip surrounding whitespace from string values, leaving other values untouched.
+
+    All-string columns go through Arrow's trim kernel; the original series is
+    returned as-is when nothing needed trimming.
+    """
+    kind = pd.api.types.infer_dtype(series, skipna=True)
+    if kind == "string":
+        arr = pa.array(series, type=pa.string(), from_pandas=True)
+        trimmed = pc.utf8_trim_whitespace(arr)
+        if trimmed.equals(arr):
+            return series
+        return trimmed.to_pandas().set_axis(series.index)
+    if kind in ("mixed", "mixed-integer"):
+        stripped = series.str.strip()
+        return stripped.where(stripped.notna(), series)
+    return series
+
+
+def _to_numeric(series: pd.Series) -> pd.Series:
+    """pd.to_numeric(errors="coerce") with an Arrow cast fast path for clean all-string columns."""
+    if pd.api.types.infer_dtype(series, skipna=True) == "string":
+        arr = pa.array(series, type=pa.string(), from_pandas=True)
+        for target in (pa.int64(), pa.float64()):
+            try:
+                return arr.cast(target).to_pandas().set_axis(series.index)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                continue
+    return pd.to_numeric(series, errors="coerce")
+
+
+def _looks_numeric(series: pd.Series) -> bool:
+    """Check an evenly spaced sample of non-null values for numeric convertibility."""
+    non_null = series.dropna()
+    if non_null.empty:
+        return False
+    step = max(len(non_null) // NUMERIC_SAMPLE_ROWS, 1)
+    sample = non_null.iloc[::step]
+    return pd.to_numeric(sample, errors="coerce").notna().mean() >= NUMERIC_MIN_RATIO
+
+
+def _clean_dataframe(df: pd.DataFrame, coerce_numeric: bool = True) -> pd.DataFrame:
+    """Strip whitespace from string columns and coerce numeric-looking columns.
+
+    Numeric coercion is decided on a sample first, so text columns never pay
+    for a full-column to_numeric; the full conversion is still checked against
+    the ratio before it is kept.
+    """
     for col in df.columns:
-        if df[col].dtype == object:
-            # Strip whitespace from string values
-            df[col] = df[col].map(lambda x: x.strip() if isinstance(x, str) else x)
-            # Try to coerce to numeric (int/float) — leaves non-numeric as-is
-            coerced = pd.to_numeric(df[col], errors="coerce")
+        if df[col].dtype != object:
+            continue
+        df[col] = _strip_strings(df[col])
+        if coerce_numeric and _looks_numeric(df[col]):
+            coerced = _to_numeric(df[col])
             # Only convert if most non-null values successfully converted
-            non_null = df[col].notna().sum()
-            if non_null > 0 and coerced.notna().sum() / non_null >= 0.8:
+            if coerced.notna().sum() / df[col].notna().sum() >= NUMERIC_MIN_RATIO:
                 df[col] = coerced
     return df
 
 
 async def ingest_mongodb(
-    df: pd.DataFrame,
+    chunks: Iterable[pd.DataFrame],
     collection_name: str,
-) -> int:
-    """Create collection and insert data into MongoDB."""
+) -> IngestStats:
+    """Insert conformed chunks into a MongoDB collection with bounded concurrency."""
     db = get_mongodb()
-    df = _clean_dataframe(df.copy())
-    records = json.loads(df.to_json(orient="records", date_format="iso"))
-    if not records:
-        return 0
+    start = time.perf_counter()
+    memory = _PeakRss()
+    total = await mongo_loader.insert_chunks(
+        db[collection_name], memory.track(row_delta.with_row_hashes(chunks)), settings.mongo_insert_concurrency
+    )
 
-    collection = db[collection_name]
-    batch_size = 1000
-    total = 0
-    for i in range(0, len(records), batch_size):
-        batch = records[i : i + batch_size]
-        await collection.insert_many(batch)
-        total += len(batch)
+    stats = IngestStats(
+        row_count=total,
+        elapsed_s=time.perf_counter() - start,
+        method="insert_many",
+        peak_rss_mb=memory.peak_mb,
+    )
+    _log_ingest("mongodb", collection_name, stats)
+    return stats
 
-    return total
+
+async def append_mongodb(
+    chunks: Iterable[pd.DataFrame],
+    collection_name: str,
+    key_columns: list[str] | None = None,
+) -> IngestStats:
+    """Append conformed chunks to a MongoDB collection, or upsert them by `key_columns`.
+
+    Upserts match on a unique index over the keys, created on first use.
+    MongoDB has no transaction here: a failed load keeps what it wrote.
+    """
+    collection = get_mongodb()[collection_name]
+    start = time.perf_counter()
+    memory = _PeakRss()
+    chunks = row_delta.with_row_hashes(chunks)
+    if key_columns:
+        try:
+            await collection.create_index([(k, ASCENDING) for k in key_columns], unique=True)
+        except OperationFailure as exc:
+            raise ValidationError(
+                f"Could not index key columns ({', '.join(key_columns)}) in '{collection_name}': {exc}"
+            ) from exc
+        total, updated = await mongo_loader.upsert_chunks(
+            collection, memory.track(chunks), key_columns, settings.mongo_insert_concurrency
+        )
+        method = "bulk_write"
+    else:
+        total = await mongo_loader.insert_chunks(collection, memory.track(chunks), settings.mongo_insert_concurrency)
+        updated = 0
+        method = "insert_many"
+
+    stats = IngestStats(
+        row_count=total,
+        elapsed_s=time.perf_counter() - start,
+        method=method,
+        peak_rss_mb=memory.peak_mb,
+        rows_updated=updated,
+    )
+    _log_ingest("mongodb", collection_name, stats)
+    return stats
+
+
+async def delta_mongodb(chunks: Iterable[pd.DataFrame], collection_name: str) -> IngestStats:
+    """Make an existing collection hold exactly the upload's rows, writing only those that changed.
+
+    The stored row hashes are counted in one aggregation (indexed on first
+    use); the upload's rows that match none are inserted, then the stored
+    rows nothing matched are deleted (see row_delta.HashMatcher). MongoDB has
+    no transaction here, but a rerun converges on the same documents.
+    """
+    collection = get_mongodb()[collection_name]
+    start = time.perf_counter()
+    await collection.create_index(ROW_HASH_COLUMN)
+    counts = collection.aggregate(
+        [{"$group": {"_id": f"${ROW_HASH_COLUMN}", "n": {"$sum": 1}}}], allowDiskUse=True
+    )
+    matcher = row_delta.HashMatcher({doc["_id"]: doc["n"] async for doc in counts})
+    memory = _PeakRss()
+    inserted = await mongo_loader.insert_chunks(
+        collection, memory.track(matcher.new_rows(chunks)), settings.mongo_insert_concurrency
+    )
+
+    deleted, gone = 0, []
+    for row_hash, left, copies in matcher.leftover():
+        if left == copies:
+            gone.append(row_hash)
+            continue
+        # Some copies of a duplicated row stay: delete just the surplus
+        match = {ROW_HASH_COLUMN: row_hash}
+        ids = [doc["_id"] async for doc in collection.find(match, {"_id": 1}).limit(left)]
+        deleted += (await collection.delete_many({"_id": {"$in": ids}})).deleted_count
+    for i in range(0, len(gone), mongo_loader.INSERT_BATCH_SIZE):
+        batch = gone[i : i + mongo_loader.INSERT_BATCH_SIZE]
+        deleted += (await collection.delete_many({ROW_HASH_COLUMN: {"$in": batch}})).deleted_count
+
+    stats = IngestStats(
+        row_count=inserted,
+        elapsed_s=time.perf_counter() - start,
+        method="insert_many+delta",
+        peak_rss_mb=memory.peak_mb,
+        rows_deleted=deleted,
+        rows_unchanged=matcher.unchanged,
+    )
+    _log_ingest("mongodb", collection_name, stats)
+    return stats
+
+
+async def copy_mongodb(source: str, collection_name: str) -> IngestStats:
+    """Create collection_name as a server-side copy of the collection `source` (an internal $out)."""
+    start = time.perf_counter()
+    db = get_mongodb()
+    await db[source].aggregate([{"$match": {}}, {"$out": collection_name}]).to_list(length=None)
+    stats = IngestStats(
+        row_count=await db[collection_name].estimated_document_count(),
+        elapsed_s=time.perf_counter() - start,
+        method="copy-collection",
+    )
+    _log_ingest("mongodb", collection_name, stats)
+    return stats
+
+
+async def mongodb_row_count(collection_name: str) -> int:
+    """Document count from collection metadata, without scanning."""
+    return await get_mongodb()[collection_name].estimated_document_count()
+
+
+def staging_name(collection_name: str, job_id: str, attempt: int = 0) -> str:
+    """Name of the table/collection a job loads into before it is swapped in as collection_name.
+
+    Each attempt gets its own, so a stale worker cleaning up cannot drop its successor's.
+    """
+    return f"{collection_name[:40]}_stg_{job_id[:8]}_{attempt}"
+
+
+async def analyze_postgres(session: AsyncSession, table: str) -> None:
+    """Refresh the planner statistics of a freshly loaded table rather than waiting for autovacuum."""
+    await session.execute(text(f'ANALYZE "{validate_collection_name(table)}"'))
+    await session.commit()
+
+
+async def swap_in_postgres(session: AsyncSession, staging: str, collection_name: str) -> None:
+    """Replace collection_name with the loaded staging table in one short transaction.
+
+    The staging table is analyzed first, in its own transaction, so the first
+    queries after the swap are planned with statistics. Readers of the old
+    table block only for the DROP + RENAME and then see the new one. The
+    partitions of a partitioned table are renamed after it too.
+    """
+    staging = validate_collection_name(staging)
+    collection_name = validate_collection_name(collection_name)
+    await analyze_postgres(session, staging)
+
+    await _drop_table(session, collection_name)
+    await session.execute(text(f'ALTER TABLE "{staging}" RENAME TO "{collection_name}"'))
+    await session.execute(text(f'ALTER INDEX IF EXISTS "{staging}_pkey" RENAME TO "{collection_name}_pkey"'))
+    await session.execute(text(f'ALTER SEQUENCE IF EXISTS "{staging}_id_seq" RENAME TO "{collection_name}_id_seq"'))
+    await partitioning.rename_partitions(session, staging, collection_name)
+    await session.commit()
+
+
+async def swap_in_mongodb(staging: str, collection_name: str) -> None:
+    """Replace collection_name with the loaded staging collection (renameCollection with dropTarget)."""
+    db = get_mongodb()
+    await db[staging].rename(collection_name, dropTarget=True)
+
+
+_ENUM_COLUMNS_SQL = text(
+    "SELECT a.attname, t.typname FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid "
+    "WHERE a.attrelid = to_regclass(:table) AND a.attnum > 0 AND NOT a.attisdropped AND t.typtype = 'e'"
+)
+
+
+async def _enum_types(session: AsyncSession, table: str) -> dict[str, str]:
+    """Enum type of each ENUM column of the table (named after the staging table it was created for)."""
+    result = await session.execute(_ENUM_COLUMNS_SQL, {"table": f'"{table}"'})
+    return {column: type_name for column, type_name in result}
+
+
+async def _drop_table(session: AsyncSession, table: str) -> None:
+    """Drop a table and the enum types of its columns, which DROP TABLE leaves behind."""
+    enum_types = await _enum_types(session, table)
+    await session.execute(text(f'DROP TABLE IF EXISTS "{table}" CASCADE'))
+    for type_name in enum_types.values():
+        await session.execute(text(f'DROP TYPE IF EXISTS "{type_name}"'))
+
+
+async def postgres_table_exists(session: AsyncSession, table: str) -> bool:
+    result = await session.execute(text("SELECT to_regclass(:table) IS NOT NULL"), {"table": f'"{table}"'})
+    return bool(result.scalar())
+
+
+async def mongodb_collection_exists(collection_name: str) -> bool:
+    db = get_mongodb()
+    return bool(await db.list_collection_names(filter={"name": collection_name}))
 
 
 async def drop_existing_postgres(session: AsyncSession, collection_name: str) -> None:
     """Drop a PostgreSQL table if it exists."""
     collection_name = validate_collection_name(collection_name)
-    await session.execute(text(f'DROP TABLE IF EXISTS "{collection_name}" CASCADE'))
+    await _drop_table(session, collection_name)
     await session.commit()
 
 
@@ -301,8 +1941,16 @@ async def save_metadata(
     row_count: int,
     sniff_result: dict,
     is_public: bool = False,
+    profiles: dict[str, ColumnProfile] | None = None,
+    partition: PartitionPlan | None = None,
+    content_hash: str | None = None,
 ) -> None:
-    """Save collection metadata to MongoDB."""
+    """Save collection metadata to MongoDB, with the column profiles computed during ingestion.
+
+    `content_hash` (see dataset_hash) lets a later upload of the same data
+    be copied from this collection instead of parsed again.
+    """
+    profiles = profiles or {}
     original_filename = sanitize_filename(original_filename)
     meta = CollectionMetadata(
         name=collection_name,
@@ -311,9 +1959,24 @@ async def save_metadata(
         owner_id=owner_id,
         owner_username=owner_username,
         row_count=row_count,
-        columns=[ColumnSchema(**c) for c in sniff_result["columns"]],
+        columns=[
+            ColumnSchema(**{**c, "profile": profiles.get(c["name"], c.get("profile"))}) for c in sniff_result["columns"]
+        ],
         description=f"Uploaded from {original_filename}. {row_count} rows, {len(sniff_result['columns'])} columns.",
         sample_rows=sniff_result["sample_rows"],
         is_public=is_public,
+        partition=asdict(partition) if partition else None,
+        content_hash=content_hash,
+        nested=sniff_result.get("nested", False),
     )
     await metadata_repo.upsert_metadata(meta)
+
+
+async def record_incremental_load(owner_id: str, collection_name: str, added_rows: int, columns: list[dict]) -> None:
+    """Add an append/upsert's new rows and merged columns to the collection metadata."""
+    await metadata_repo.add_rows(
+        owner_id,
+        collection_name,
+        added_rows,
+        [ColumnSchema(**c).model_dump(mode="json") for c in columns],
+    )
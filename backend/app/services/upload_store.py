@@ -0,0 +1,258 @@
+"""On-disk store for sniffed uploads, keyed by an opaque upload token.
+
+A full sniff writes the cleaned, schema-conformed data as a zstd-compressed
+Arrow IPC stream; a sampled (fast) sniff keeps the raw spooled file instead.
+Either sits next to a small JSON sidecar (owner, filename, sniff result), so
+confirm never needs the file sent again. Entries expire after a TTL and the
+oldest are evicted when the store exceeds its size budget, except those
+pinned for the ingestion jobs still waiting to load them. Everything lives
+on disk, so any worker can serve a token.
+"""
+
+import json
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+
+from app.config import settings
+
+TOKEN_RE = re.compile(r"^[A-Za-z0-9_-]{32}$")
+JSON_FIELD_KEY = b"datalens.json"  # field metadata flag: values are JSON-encoded
+
+_ARROW_TYPES = {
+    "integer": pa.int64(),
+    "float": pa.float64(),
+    "boolean": pa.bool_(),
+    "datetime": pa.timestamp("ns"),
+}
+_PANDAS_TYPES = {pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype()}
+
+
+@dataclass
+class StoredUpload:
+    token: str
+    owner_id: str
+    filename: str
+    sniff_result: dict
+    size: int
+    created_at: float
+    format: str = "arrow"  # "arrow" (conformed batches) or "raw" (the original file)
+    ext: str = ""
+    content_hash: str = ""  # SHA-256 of the uploaded file
+    pinned_until: float = 0.0  # neither expires nor is evicted before this (see pin)
+
+
+def _store_dir() -> str:
+    path = settings.upload_store_dir or os.path.join(tempfile.gettempdir(), "datalens_uploads")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _data_path(token: str) -> str:
+    return os.path.join(_store_dir(), f"{token}.data")
+
+
+def _meta_path(token: str) -> str:
+    return os.path.join(_store_dir(), f"{token}.json")
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _arrow_schema(columns: list[dict]) -> pa.Schema:
+    fields = []
+    for col in columns:
+        arrow_type = _ARROW_TYPES.get(col["dtype"], pa.string())
+        metadata = {JSON_FIELD_KEY: b"1"} if col["dtype"] == "object" else None
+        fields.append(pa.field(col["name"], arrow_type, metadata=metadata))
+    return pa.schema(fields)
+
+
+def _to_batch(df: pd.DataFrame, schema: pa.Schema) -> pa.RecordBatch:
+    for field in schema:
+        if field.metadata and JSON_FIELD_KEY in field.metadata:
+            df[field.name] = df[field.name].map(
+                lambda v: None if v is None else json.dumps(v, default=str)
+            )
+    return pa.RecordBatch.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def _from_batch(batch: pa.RecordBatch) -> pd.DataFrame:
+    df = batch.to_pandas(types_mapper=_PANDAS_TYPES.get)
+    for field in batch.schema:
+        if field.metadata and JSON_FIELD_KEY in field.metadata:
+            df[field.name] = df[field.name].map(lambda v: None if v is None else json.loads(v))
+    return df
+
+
+def save(
+    owner_id: str,
+    filename: str,
+    sniff_result: dict,
+    chunks: Iterable[pd.DataFrame],
+    content_hash: str = "",
+) -> str:
+    """Persist conformed chunks and their sniff result; return the new upload token."""
+    evict()
+    token = secrets.token_urlsafe(24)
+    data_path = _data_path(token)
+    tmp_path = f"{data_path}.tmp"
+    schema = _arrow_schema(sniff_result["columns"])
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_stream(sink, schema, options=options) as writer:
+            for df in chunks:
+                writer.write_batch(_to_batch(df, schema))
+        os.replace(tmp_path, data_path)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+
+    _write_meta(token, owner_id, filename, sniff_result, format="arrow", content_hash=content_hash)
+    return token
+
+
+def save_raw(
+    owner_id: str, filename: str, ext: str, sniff_result: dict, src_path: str, content_hash: str = ""
+) -> str:
+    """Move an already spooled file into the store as-is; return the new upload token."""
+    evict()
+    token = secrets.token_urlsafe(24)
+    shutil.move(src_path, _data_path(token))
+    _write_meta(token, owner_id, filename, sniff_result, format="raw", ext=ext, content_hash=content_hash)
+    return token
+
+
+def _write_meta(token: str, owner_id: str, filename: str, sniff_result: dict, **extra) -> None:
+    meta = {
+        "token": token,
+        "owner_id": owner_id,
+        "filename": filename,
+        "sniff_result": sniff_result,
+        "size": os.path.getsize(_data_path(token)),
+        "created_at": time.time(),
+        **extra,
+    }
+    _dump_meta(token, meta)
+    evict(keep=token)
+
+
+def _read_meta(token: str) -> dict | None:
+    try:
+        with open(_meta_path(token), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _dump_meta(token: str, meta: dict) -> None:
+    tmp_path = f"{_meta_path(token)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, default=str)
+    os.replace(tmp_path, _meta_path(token))  # readers never see a half-written sidecar
+
+
+def pin(tokens: Iterable[str], seconds: float) -> None:
+    """Keep these uploads past their TTL and out of eviction for `seconds`; their TTL restarts from now.
+
+    Ingestion jobs pin their upload when queued and the job sweeper renews
+    the pins of every queued or running job, so an upload outlives a wait
+    behind the memory budget or a requeue; once no job renews it, it ages
+    out like any other.
+    """
+    now = time.time()
+    for token in set(tokens):
+        if not TOKEN_RE.match(token or ""):
+            continue
+        meta = _read_meta(token)
+        if meta is not None:
+            _dump_meta(token, {**meta, "created_at": now, "pinned_until": now + seconds})
+
+
+def get(token: str, owner_id: str) -> StoredUpload | None:
+    """Return a live upload owned by owner_id, or None if unknown, expired or not theirs."""
+    if not TOKEN_RE.match(token or ""):
+        return None
+    meta = _read_meta(token)
+    if meta is None:
+        return None
+
+    stored = StoredUpload(**meta)
+    if stored.owner_id != owner_id or _is_expired(meta):
+        return None
+    if not os.path.exists(_data_path(token)):
+        return None
+    return stored
+
+
+def data_path(stored: StoredUpload) -> str:
+    return _data_path(stored.token)
+
+
+def iter_chunks(stored: StoredUpload, columns: list[str] | None = None) -> Iterator[pd.DataFrame]:
+    """Yield stored arrow data back as DataFrames, one record batch at a time.
+
+    With `columns`, each batch is projected before any conversion to pandas.
+    """
+    with pa.memory_map(_data_path(stored.token)) as source, pa.ipc.open_stream(source) as reader:
+        if columns is not None:
+            wanted = set(columns)
+            columns = [name for name in reader.schema.names if name in wanted]
+        for batch in reader:
+            if columns is not None:
+                batch = batch.select(columns)
+            yield _from_batch(batch)
+
+
+def discard(token: str) -> None:
+    if TOKEN_RE.match(token or ""):
+        _remove(_meta_path(token))
+        _remove(_data_path(token))
+
+
+def _is_pinned(meta: dict, now: float) -> bool:
+    return meta.get("pinned_until", 0.0) > now
+
+
+def _is_expired(meta: dict, now: float | None = None) -> bool:
+    now = time.time() if now is None else now
+    return not _is_pinned(meta, now) and now - meta["created_at"] > settings.upload_token_ttl_minutes * 60
+
+
+def evict(keep: str | None = None) -> None:
+    """Drop expired entries, then the oldest unpinned ones until the store fits its size budget."""
+    now = time.time()
+    entries = []
+    for name in os.listdir(_store_dir()):
+        if not name.endswith(".json"):
+            continue
+        token = name.removesuffix(".json")
+        meta = _read_meta(token)
+        if meta is None:
+            continue
+        if _is_expired(meta, now):
+            discard(token)
+        else:
+            entries.append((meta["created_at"], meta["size"], token, _is_pinned(meta, now)))
+
+    budget = settings.upload_store_max_mb * 1024 * 1024
+    total = sum(size for _, size, _, _ in entries)
+    for _, size, token, pinned in sorted(entries):
+        if total <= budget:
+            break
+        if token != keep and not pinned:
+            discard(token)
+            total -= size
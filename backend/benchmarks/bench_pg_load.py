@@ -0,0 +1,67 @@
+"""Compare PostgreSQL load methods (binary COPY vs executemany INSERT).
+
+Needs a reachable PostgreSQL configured through the usual POSTGRES_* settings.
+`--writers` repeats the COPY load split across each number of connections.
+
+    cd backend && python -m benchmarks.bench_pg_load --rows 1000000
+    cd backend && python -m benchmarks.bench_pg_load --rows 5000000 --methods copy --writers 1 2 4 8
+"""
+
+import argparse
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from app.config import settings
+from app.db.postgres import async_session, engine
+from app.services import upload_service
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "id_ref": np.arange(rows),
+        "amount": rng.normal(100, 25, rows).round(2),
+        "category": rng.choice(["alpha", "beta", "gamma", "delta"], rows),
+        "flag": rng.random(rows) > 0.5,
+    })
+
+
+def chunked(df: pd.DataFrame, columns: list[dict], size: int):
+    for start in range(0, len(df), size):
+        yield upload_service._conform_chunk(df.iloc[start : start + size].copy(), columns)
+
+
+async def run(rows: int, methods: list[str], writers: list[int]) -> None:
+    df = make_frame(rows)
+    columns = upload_service.sniff_chunks([df.copy()])["columns"]
+
+    runs = [(method, n) for method in methods for n in (writers if method == "copy" else [1])]
+    for method, n in runs:
+        table = f"bench_load_{method}_{n}"
+        settings.pg_load_method = method
+        settings.pg_copy_writers = n
+        async with async_session() as session:
+            await upload_service.drop_existing_postgres(session, table)
+            stats = await upload_service.ingest_postgres(
+                session, chunked(df, columns, upload_service.CHUNK_ROWS), table, columns
+            )
+            await upload_service.drop_existing_postgres(session, table)
+        print(f"{stats.method:>8}: {stats.row_count} rows in {stats.elapsed_s:.2f}s "
+              f"({stats.rows_per_sec:,.0f} rows/s)")
+
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--methods", nargs="+", default=["copy", "insert"])
+    parser.add_argument("--writers", nargs="+", type=int, default=[1], help="COPY connections to compare")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.methods, args.writers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.error_handler import ErrorHandlerMiddleware, TooManyRequestsError
+from app.repositories import job_repo
+from app.services import admission, job_service
+
+
+@pytest.fixture(autouse=True)
+def _budget(monkeypatch):
+    monkeypatch.setattr(admission.settings, "ingest_memory_budget_mb", 1000)
+    monkeypatch.setattr(admission.settings, "ingest_queue_max_mb", 2000)
+    monkeypatch.setattr(admission, "_reserved", {})
+
+
+class TestEstimate:
+    def test_grows_with_size_and_format(self):
+        mb = 1024 * 1024
+        assert admission.estimate_mb("a.csv", 100 * mb) == admission.BASE_MB + 200
+        assert admission.estimate_mb("a.xlsx", 100 * mb) > admission.estimate_mb("a.parquet", 100 * mb)
+        assert admission.estimate_mb("noext", 0) == admission.BASE_MB
+
+
+class TestClaim:
+    def test_headroom_is_what_running_jobs_leave(self):
+        assert admission.headroom_mb() is None  # idle: even a job over the budget may start
+        admission.reserve("a", 700)
+        assert admission.headroom_mb() == 300
+        admission.reserve("b", 500)
+        assert admission.headroom_mb() == 0
+        admission.release("a")
+        admission.release("b")
+        assert admission.headroom_mb() is None
+
+    @pytest.mark.asyncio
+    async def test_worker_claims_within_headroom_and_releases_when_done(self, monkeypatch):
+        claim = AsyncMock(return_value={"job_id": "j2", "memory_mb": 250})
+        monkeypatch.setattr(job_service.job_repo, "claim_next", claim)
+        admission.reserve("j1", 600)
+
+        job = await job_service._claim()
+
+        assert claim.await_args.args[1] == 400
+        assert admission.reserved_mb() == 850
+        for name in ("finish_job", "heartbeat"):
+            monkeypatch.setattr(job_service.job_repo, name, AsyncMock(return_value=False))
+        monkeypatch.setattr(job_service, "_ingest", AsyncMock(return_value={}))
+        await job_service._run(job)
+        assert admission.reserved_mb() == 600
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("waited, only_head", [(60, False), (900, True)])
+    async def test_a_long_waiting_head_stops_smaller_jobs_overtaking_it(self, monkeypatch, waited, only_head):
+        created = (datetime.now(timezone.utc) - timedelta(seconds=waited)).isoformat()
+        jobs = MagicMock()
+        jobs.find_one = AsyncMock(return_value={"job_id": "big", "created_at": created})
+        jobs.find_one_and_update = AsyncMock(return_value=None)
+        monkeypatch.setattr(job_repo, "get_mongodb", lambda: {job_repo.COLLECTION: jobs})
+
+        await job_repo.claim_next("w1", 300, max_wait_seconds=600)
+
+        query = jobs.find_one_and_update.await_args.args[0]
+        assert query["memory_mb"] == {"$not": {"$gt": 300}}
+        assert (query.get("job_id") == "big") is only_head
+
+
+class TestAdmit:
+    @pytest.mark.asyncio
+    async def test_empty_queue_always_admits(self, monkeypatch):
+        monkeypatch.setattr(job_service.job_repo, "queued_memory_mb", AsyncMock(return_value=0))
+        await job_service.admit(5000)
+
+    @pytest.mark.asyncio
+    async def test_full_queue_is_refused_until_a_running_job_finishes(self, monkeypatch):
+        started = (datetime.now(timezone.utc) - timedelta(seconds=10)).isoformat()
+        running = [{"status": "running", "started_at": started, "rows_written": 100, "total_rows": 300}]
+        monkeypatch.setattr(job_service.job_repo, "queued_memory_mb", AsyncMock(return_value=1900))
+        monkeypatch.setattr(job_service.job_repo, "list_running", AsyncMock(return_value=running))
+
+        await job_service.admit(100)
+        with pytest.raises(TooManyRequestsError) as exc:
+            await job_service.admit(101)
+        assert exc.value.status_code == 429
+        assert exc.value.headers == {"Retry-After": "20"}
+        assert "datalens_ingest_jobs_rejected_total" in admission.metrics()
+
+    def test_refusal_carries_retry_after(self):
+        app = FastAPI()
+        app.add_middleware(ErrorHandlerMiddleware)
+
+        @app.get("/busy")
+        async def busy():
+            raise TooManyRequestsError("Queue full", retry_after=42)
+
+        response = TestClient(app).get("/busy")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "42"
+        assert response.json()["error"] == "Queue full"
+
+
+def test_metrics_report_budget_usage():
+    admission.reserve("j1", 300)
+    text = admission.metrics()
+    assert "datalens_ingest_memory_budget_mb 1000\n" in text
+    assert "datalens_ingest_memory_reserved_mb 300\n" in text
+    assert "# TYPE datalens_ingest_jobs_running gauge" in text
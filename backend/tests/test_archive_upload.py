@@ -0,0 +1,153 @@
+import io
+import tarfile
+import zipfile
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.config import settings
+from app.middleware.error_handler import TooManyRequestsError, ValidationError
+from app.services import archive_reader, archive_service, upload_service
+
+CSV = b"id,region\n1,north\n2,south\n"
+JSONL = b'{"id": 1, "region": "north"}\n{"id": 2, "region": "south"}\n'
+NESTED = b'[{"id": 1, "tags": {"a": 1}}, {"id": 2, "tags": {"a": 2}}]'
+MB = 1024 * 1024
+
+
+def _zip(path, members: dict[str, bytes]) -> str:
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return str(path)
+
+
+def _extract(path: str, fmt: str, out_dir, max_member_bytes: int = MB) -> archive_reader.Extraction:
+    return archive_reader.extract(
+        path, fmt, str(out_dir), upload_service.SUPPORTED_EXTENSIONS, max_member_bytes, 10 * MB
+    )
+
+
+class TestExtract:
+    def test_zip_members_are_extracted_and_hashed(self, tmp_path):
+        import hashlib
+
+        path = _zip(tmp_path / "drop.zip", {
+            "2024/jan.csv": CSV,
+            "2024/events.jsonl": JSONL,
+            "README.txt": b"notes",
+            "__MACOSX/2024/._jan.csv": b"\x00",
+            ".DS_Store": b"\x00",
+        })
+        (tmp_path / "out").mkdir()
+        result = _extract(path, "zip", tmp_path / "out")
+
+        assert [(m.name, m.size) for m in result.members] == [
+            ("2024/jan.csv", len(CSV)),
+            ("2024/events.jsonl", len(JSONL)),
+        ]
+        assert result.members[0].content_hash == hashlib.sha256(CSV).hexdigest()
+        assert open(result.members[1].path, "rb").read() == JSONL
+        assert result.skipped == [("README.txt", "Unsupported file type: .txt")]
+
+    def test_tar_gz_is_read_as_a_stream(self, tmp_path):
+        path = tmp_path / "drop.tar.gz"
+        with tarfile.open(path, "w:gz") as archive:
+            info = tarfile.TarInfo("feb.csv")
+            info.size = len(CSV)
+            archive.addfile(info, io.BytesIO(CSV))
+        (tmp_path / "out").mkdir()
+        result = _extract(str(path), "tar.gz", tmp_path / "out")
+        assert [m.name for m in result.members] == ["feb.csv"]
+
+    def test_oversized_member_is_skipped_by_its_real_size(self, tmp_path):
+        path = _zip(tmp_path / "bomb.zip", {"big.csv": b"0" * (3 * MB), "small.csv": CSV})
+        (tmp_path / "out").mkdir()
+        result = _extract(path, "zip", tmp_path / "out", max_member_bytes=2 * MB)
+        assert [m.name for m in result.members] == ["small.csv"]
+        assert result.skipped == [("big.csv", "File exceeds 2MB limit")]
+
+    def test_unreadable_archive(self, tmp_path):
+        path = tmp_path / "broken.zip"
+        path.write_bytes(b"not a zip")
+        with pytest.raises(ValidationError, match="Could not read the zip archive"):
+            _extract(str(path), "zip", tmp_path)
+
+    def test_archive_format_and_member_names(self):
+        assert archive_reader.archive_format("Drop.TAR.GZ") == "tar.gz"
+        assert archive_reader.archive_format("data.csv") is None
+        assert upload_service.member_collection_name("sales", "2024/Jan Sales.csv") == "sales_jan_sales"
+        assert upload_service.member_collection_name(None, "2024-01.csv") == "f_2024_01"
+
+
+class TestStageArchive:
+    @pytest.fixture
+    def queued(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "cpu_pool_kind", "thread")
+        monkeypatch.setattr(settings, "upload_store_dir", str(tmp_path / "store"))
+        jobs = []
+        monkeypatch.setattr(archive_service.job_repo, "create_job", AsyncMock(side_effect=jobs.append))
+        monkeypatch.setattr(archive_service.job_service, "enqueue", AsyncMock(side_effect=jobs.append))
+        monkeypatch.setattr(archive_service.job_service, "admit", AsyncMock())
+        monkeypatch.setattr(archive_service.job_service, "check_target_free", AsyncMock())
+        monkeypatch.setattr(archive_service.job_repo, "get_active_for_collection", AsyncMock(return_value=None))
+        existing = AsyncMock(side_effect=lambda owner, name: {"name": name} if name == "drop_taken" else None)
+        monkeypatch.setattr(archive_service.metadata_repo, "get_owned_by_name", existing)
+        return jobs
+
+    @pytest.mark.asyncio
+    async def test_one_job_per_file_in_one_batch(self, tmp_path, queued):
+        path = _zip(tmp_path / "drop.zip", {
+            "jan.csv": CSV, "events.json": NESTED, "taken.csv": CSV, "JAN.csv": CSV, "notes.txt": b"x",
+        })
+        spool = upload_service.SpooledUpload(path=path, filename="drop.zip", ext="zip", size=0)
+        batch_id = await archive_service.stage_archive(spool, "u1", "alice", None, "drop", False, False)
+
+        by_file = {job.filename: job for job in queued}
+        assert {job.batch_id for job in queued} == {batch_id}
+        assert (by_file["jan.csv"].collection_name, by_file["jan.csv"].db_type) == ("drop_jan", "postgres")
+        assert by_file["events.json"].db_type == "mongodb"  # recommended for nested data
+        assert by_file["jan.csv"].status == "queued" and by_file["jan.csv"].total_rows == 2
+        assert by_file["taken.csv"].error == "Collection 'drop_taken' already exists. Set overwrite to replace it."
+        assert by_file["JAN.csv"].error == "Another file of the archive loads into the same collection"
+        assert by_file["notes.txt"].status == "failed"
+
+    @pytest.mark.asyncio
+    async def test_members_are_admitted_together_before_any_is_queued(self, tmp_path, queued, monkeypatch):
+        admit = AsyncMock(side_effect=TooManyRequestsError("The ingestion queue is full", retry_after=5))
+        monkeypatch.setattr(archive_service.job_service, "admit", admit)
+        path = _zip(tmp_path / "drop.zip", {"jan.csv": CSV, "feb.csv": CSV, "notes.txt": b"x"})
+        spool = upload_service.SpooledUpload(path=path, filename="drop.zip", ext="zip", size=0)
+
+        with pytest.raises(TooManyRequestsError):
+            await archive_service.stage_archive(spool, "u1", "alice", None, "drop", False, False)
+        admit.assert_awaited_once_with(2 * archive_service.admission.estimate_mb("jan.csv", len(CSV)))
+        assert queued == []
+
+    @pytest.mark.asyncio
+    async def test_unexpected_error_fails_only_that_member(self, tmp_path, queued, monkeypatch):
+        sniff = upload_service.sniff_and_store
+
+        def flaky(spool, owner_id):
+            if spool.filename == "feb.csv":
+                raise RuntimeError("disk full")
+            return sniff(spool, owner_id)
+
+        monkeypatch.setattr(archive_service.upload_service, "sniff_and_store", flaky)
+        path = _zip(tmp_path / "drop.zip", {"jan.csv": CSV, "feb.csv": CSV})
+        spool = upload_service.SpooledUpload(path=path, filename="drop.zip", ext="zip", size=0)
+        await archive_service.stage_archive(spool, "u1", "alice", None, "drop", False, False)
+
+        by_file = {job.filename: job for job in queued}
+        assert by_file["jan.csv"].status == "queued"
+        assert (by_file["feb.csv"].status, by_file["feb.csv"].error) == ("failed", "Could not stage this file")
+
+    def test_batch_report(self):
+        jobs = [
+            {"status": "succeeded", "rows_written": 10, "total_rows": 10},
+            {"status": "failed", "rows_written": 0, "total_rows": 5},
+        ]
+        report = archive_service.batch_report("b1", jobs)
+        assert (report["status"], report["files"], report["succeeded"], report["rows_written"]) == ("partial", 2, 1, 10)
+        jobs.append({"status": "running", "rows_written": 3, "total_rows": 8})
+        assert archive_service.batch_report("b1", jobs)["status"] == "running"
@@ -0,0 +1,129 @@
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from fastapi import UploadFile
+
+from app.config import settings
+from app.middleware.error_handler import ValidationError
+from app.services import arrow_readers, upload_service
+from app.services.upload_service import iter_chunks, sniff_sample, spooled_upload
+
+TABLE = pa.table({
+    "Order ID": pa.array([1, 2, 3, None], type=pa.int32()),
+    "price": [1.5, 2.5, 3.5, 4.5],
+    "city": ["a", "b", "c", "d"],
+    "meta": [{"k": 1, "v": "x"}, {"k": 2, "v": "y"}, None, {"k": 4, "v": "z"}],
+})
+
+
+def _parquet_bytes() -> bytes:
+    buf = io.BytesIO()
+    pq.write_table(TABLE, buf, row_group_size=2)
+    return buf.getvalue()
+
+
+def _ipc_bytes() -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, TABLE.schema) as writer:
+        writer.write_table(TABLE)
+    return sink.getvalue().to_pybytes()
+
+
+JSONL = b'{"id": 1, "geo": {"lat": 1.0, "lon": 2.0}}\n{"id": 2, "geo": {"lat": 3.0, "lon": 4.0}}\n'
+
+
+def _upload(content: bytes, filename: str) -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+
+class TestFormats:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("content,filename", [
+        (_parquet_bytes(), "orders.parquet"),
+        (_ipc_bytes(), "orders.feather"),
+    ])
+    async def test_columnar_files_chunked_and_flattened(self, content, filename):
+        async with spooled_upload(_upload(content, filename)) as spool:
+            chunks = list(iter_chunks(spool, chunk_rows=2))
+        df = pd.concat(chunks, ignore_index=True)
+        assert [len(c) for c in chunks] == [2, 2]
+        assert list(df.columns) == ["Order ID", "price", "city", "meta.k", "meta.v"]
+        assert str(df["Order ID"].dtype) == "Int64"
+
+    @pytest.mark.asyncio
+    async def test_jsonl_alias_and_struct_flattening(self):
+        async with spooled_upload(_upload(JSONL, "points.ndjson")) as spool:
+            assert spool.ext == "jsonl"
+            df = pd.concat(iter_chunks(spool))
+        assert list(df.columns) == ["id", "geo.lat", "geo.lon"]
+
+    def test_jsonl_is_decoded_a_block_of_lines_at_a_time(self, tmp_path):
+        path = tmp_path / "events.jsonl"
+        path.write_bytes(b'{"id": 1}\n{"id": 2}\n\n{"id": "three"}\n{"id": 4}\n{"id": 5}')
+        chunks = list(arrow_readers.iter_jsonl(str(path), 2))
+        assert [c["id"].tolist() for c in chunks] == [[1, 2], ["three"], [4, 5]]
+
+        path.write_bytes(b'{"id": 1}\n{"id": 2}\n{"id": \n')
+        with pytest.raises(ValidationError) as exc:
+            list(arrow_readers.iter_jsonl(str(path), 2))
+        assert "from line 3" in exc.value.detail
+
+    @pytest.mark.asyncio
+    async def test_parquet_projection_skips_other_columns(self):
+        async with spooled_upload(_upload(_parquet_bytes(), "orders.parquet")) as spool:
+            df = pd.concat(iter_chunks(spool, columns=["order_id", "meta_v"]))
+        assert list(df.columns) == ["Order ID", "meta.v"]
+
+    @pytest.mark.asyncio
+    async def test_parquet_sample_row_count_from_footer(self):
+        async with spooled_upload(_upload(_parquet_bytes(), "orders.parquet")) as spool:
+            result = sniff_sample(spool, rows=2)
+        assert result["row_count"] == 4
+        assert result["confidence"] == "sampled"
+        types = {c["name"]: c["dtype"] for c in result["columns"]}
+        assert types["order_id"] == "integer"
+
+    def test_corrupt_file_is_validation_error(self, tmp_path):
+        path = tmp_path / "bad.arrow"
+        path.write_bytes(b"not arrow at all")
+        with pytest.raises(ValidationError):
+            list(arrow_readers.iter_table(str(path), "arrow", 10))
+
+    @pytest.mark.parametrize("content", [b"not parquet at all", _parquet_bytes()[:-40]])
+    def test_corrupt_parquet_sample_is_validation_error(self, tmp_path, content):
+        path = tmp_path / "bad.parquet"
+        path.write_bytes(content)
+        with pytest.raises(ValidationError, match="Could not read .parquet file"):
+            arrow_readers.sample_parquet(str(path), 10)
+
+
+class TestColumnSelection:
+    @pytest.fixture(autouse=True)
+    def store_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "upload_store_dir", str(tmp_path))
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("sample", [True, False])
+    async def test_confirm_subset_from_token(self, sample):
+        async with spooled_upload(_upload(_parquet_bytes(), "orders.parquet")) as spool:
+            token = upload_service.sniff_and_store(spool, "u1", sample=sample)["upload_token"]
+
+        async with upload_service.upload_source(
+            "u1", upload_token=token, columns=["city", "order_id"]
+        ) as source:
+            df = pd.concat(list(source.chunks))
+        names = [c["name"] for c in source.sniff_result["columns"]]
+        assert names == ["order_id", "city"]
+        assert list(df.columns) == names
+        assert df["city"].tolist() == ["a", "b", "c", "d"]
+
+    @pytest.mark.asyncio
+    async def test_unknown_column_rejected(self):
+        async with spooled_upload(_upload(_parquet_bytes(), "orders.parquet")) as spool:
+            token = upload_service.sniff_and_store(spool, "u1", sample=False)["upload_token"]
+        with pytest.raises(ValidationError, match="Unknown columns"):
+            async with upload_service.upload_source("u1", upload_token=token, columns=["nope"]):
+                pass
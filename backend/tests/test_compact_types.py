@@ -0,0 +1,156 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import upload_service
+from app.services.upload_service import sniff_chunks
+
+
+def _sniffed(df: pd.DataFrame) -> dict:
+    return {c["name"]: c for c in sniff_chunks([df])["columns"]}
+
+
+class TestSniffedTypes:
+    def test_narrowest_type_from_values(self):
+        columns = _sniffed(pd.DataFrame({
+            "small": [1, -32768, 32767],
+            "medium": [1, 40_000, -5],
+            "big": [1, 2**40, 3],
+            "halves": [0.5, 1.25, -3.0],
+            "decimals": [0.1, 0.2, 0.3],
+            "day": pd.to_datetime(["2024-01-01", "2024-02-01", None]),
+            "moment": pd.to_datetime(["2024-01-01 10:30", "2024-02-01 00:00", None]),
+            "region": ["north", "south", "north"],
+        }))
+        assert {name: c["sql_type"] for name, c in columns.items()} == {
+            "small": "SMALLINT",
+            "medium": "INTEGER",
+            "big": None,
+            "halves": "REAL",
+            "decimals": None,  # not exact in float32
+            "day": "DATE",
+            "moment": None,
+            "region": "ENUM",
+        }
+        assert columns["region"]["enum_values"] == ["north", "south"]
+
+    def test_range_and_labels_span_chunks(self):
+        chunks = [
+            pd.DataFrame({"n": [1, 2], "label": ["first", "second"]}),
+            pd.DataFrame({"n": [70_000, 3], "label": ["third", "first"]}),
+        ]
+        columns = {c["name"]: c for c in sniff_chunks(chunks)["columns"]}
+        assert columns["n"]["sql_type"] == "INTEGER"
+        assert columns["label"]["enum_values"] == ["first", "second", "third"]
+
+    def test_strings_that_stay_text(self, monkeypatch):
+        monkeypatch.setattr(upload_service, "ENUM_MAX_VALUES", 3)
+        columns = _sniffed(pd.DataFrame({
+            "short": ["a", "b", "a", "b"],  # an enum is no smaller than one-byte text
+            "many": ["alpha", "bravo", "charlie", "delta"],
+            "long": ["x" * 64, "y" * 64, "x" * 64, "y" * 64],  # enum labels are at most 63 bytes
+        }))
+        assert [c["sql_type"] for c in columns.values()] == [None, None, None]
+
+    def test_midnight_must_hold_in_utc(self):
+        local = pd.to_datetime(["2024-01-01", "2024-01-02"]).tz_localize("Europe/Berlin")
+        assert _sniffed(pd.DataFrame({"d": local}))["d"]["sql_type"] is None
+
+    def test_float32_overflow_is_not_real(self):
+        assert _sniffed(pd.DataFrame({"x": [1.0, np.float64(1e300)]}))["x"]["sql_type"] is None
+
+
+class TestDDL:
+    def test_enum_type_is_created_with_the_table(self):
+        columns = [
+            {"name": "qty", "dtype": "integer", "nullable": False, "sql_type": "SMALLINT"},
+            {"name": "region", "dtype": "string", "sql_type": "ENUM", "enum_values": ["north", "o'hare"]},
+        ]
+        create_type, create_table = upload_service._create_table_statements("sales", columns)
+
+        type_name = upload_service._enum_type_name("sales", "region")
+        assert create_type == f"""CREATE TYPE "{type_name}" AS ENUM ('north', 'o''hare')"""
+        assert '"qty" SMALLINT NOT NULL' in create_table
+        assert f'"region" "{type_name}" NULL' in create_table
+
+    def test_storage_saved_estimate(self):
+        columns = [
+            {"name": "a", "dtype": "integer", "sql_type": "SMALLINT"},
+            {"name": "b", "dtype": "datetime", "sql_type": "DATE"},
+            {"name": "c", "dtype": "string", "sql_type": "ENUM", "enum_values": ["abcdef", "ghijkl"]},
+            {"name": "d", "dtype": "float"},
+        ]
+        assert upload_service.estimate_storage_saved(columns, 1000) == (6 + 4 + (1 + 6 - 4)) * 1000
+
+    @pytest.mark.asyncio
+    async def test_dropping_a_table_drops_its_enum_types(self):
+        session = AsyncMock()
+        session.execute.side_effect = [[("region", "sales_stg_1_abc_enum")], MagicMock(), MagicMock()]
+        await upload_service.drop_existing_postgres(session, "sales")
+        statements = [str(c.args[0]) for c in session.execute.await_args_list[1:]]
+        assert statements == ['DROP TABLE IF EXISTS "sales" CASCADE', 'DROP TYPE IF EXISTS "sales_stg_1_abc_enum"']
+
+
+def _col(name: str, dtype: str, sql_type: str | None = None, enum_values: list | None = None) -> dict:
+    return {"name": name, "dtype": dtype, "nullable": True, "sql_type": sql_type, "enum_values": enum_values}
+
+
+class TestWidening:
+    TARGET = [
+        _col("qty", "integer", "SMALLINT"),
+        _col("price", "float", "REAL"),
+        _col("region", "string", "ENUM", ["north", "south"]),
+        _col("day", "datetime", "DATE"),
+        _col("legacy", "integer"),
+    ]
+
+    def _merged(self, incoming: list[dict]) -> dict:
+        _, merged = upload_service.merge_schema("t", self.TARGET, incoming, "postgres")
+        return {c["name"]: (c["sql_type"], c["enum_values"]) for c in merged}
+
+    def test_types_that_hold_the_upload_are_kept(self):
+        merged = self._merged([
+            _col("qty", "integer", "SMALLINT"),
+            _col("price", "integer", "SMALLINT"),
+            _col("region", "string", "ENUM", ["south"]),
+            _col("day", "datetime", "DATE"),
+            _col("legacy", "integer", "SMALLINT"),
+        ])
+        assert merged == {
+            "qty": ("SMALLINT", None),
+            "price": ("REAL", None),
+            "region": ("ENUM", ["north", "south"]),
+            "day": ("DATE", None),
+            "legacy": (None, None),
+        }
+
+    def test_types_widen_to_hold_the_upload(self):
+        merged = self._merged([
+            _col("qty", "integer", "INTEGER"),
+            _col("price", "integer", "INTEGER"),
+            _col("region", "string", "ENUM", ["east"]),
+            _col("day", "datetime"),
+        ])
+        assert merged["qty"] == ("INTEGER", None)
+        assert merged["price"] == (None, None)
+        assert merged["region"] == (None, None)
+        assert merged["day"] == (None, None)
+
+    @pytest.mark.asyncio
+    async def test_append_alters_widened_columns(self, monkeypatch):
+        monkeypatch.setattr(upload_service, "_pg_load_method", AsyncMock(return_value=("copy", AsyncMock(return_value=0))))
+        session = AsyncMock()
+        session.execute.side_effect = [[("region", "t_stg_1_abc_enum")], *(MagicMock() for _ in range(4))]
+        retyped = [_col("qty", "integer", "INTEGER"), _col("region", "string")]
+
+        await upload_service.append_postgres(session, [], "t", [], retyped_columns=retyped)
+
+        statements = [str(c.args[0]) for c in session.execute.await_args_list[1:]]
+        assert statements == [
+            'ALTER TABLE "t" ALTER COLUMN "qty" TYPE INTEGER USING "qty"::INTEGER',
+            'ALTER TABLE "t" ALTER COLUMN "region" TYPE TEXT USING "region"::TEXT',
+            'DROP TYPE IF EXISTS "t_stg_1_abc_enum"',
+            'ALTER TABLE "t" ADD COLUMN IF NOT EXISTS "_row_hash" BIGINT NULL',
+        ]
@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+
+import pytest
+
+from app.config import settings
+from app.middleware.error_handler import AppError, NotFoundError, ValidationError
+from app.services import cpu_pool
+
+
+def _pid_and_square(x: int) -> tuple[int, int]:
+    return os.getpid(), x * x
+
+
+def _raise_not_found() -> None:
+    raise NotFoundError("gone")
+
+
+def _allocate(mb: int) -> int:
+    return len(bytearray(mb * 1024 * 1024))
+
+
+def _sleep(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+class TestRun:
+    @pytest.mark.asyncio
+    async def test_runs_in_a_worker_process(self):
+        pid, result = await cpu_pool.run(_pid_and_square, 7)
+        assert result == 49
+        assert pid != os.getpid()
+
+    @pytest.mark.asyncio
+    async def test_app_errors_keep_their_status(self):
+        with pytest.raises(AppError, match="gone") as exc_info:
+            await cpu_pool.run(_raise_not_found)
+        assert exc_info.value.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_memory_budget(self, monkeypatch):
+        monkeypatch.setattr(settings, "cpu_job_memory_mb", 64)
+        assert await cpu_pool.run(_allocate, 16) == 16 * 1024 * 1024
+        with pytest.raises(ValidationError, match="more than 64MB"):
+            await cpu_pool.run(_allocate, 256)
+
+    @pytest.mark.asyncio
+    async def test_time_limit_kills_the_worker(self, monkeypatch):
+        monkeypatch.setattr(settings, "cpu_job_timeout_seconds", 1)
+        start = time.perf_counter()
+        with pytest.raises(ValidationError, match="longer than 1s"):
+            await cpu_pool.run(_sleep, 30)
+        assert time.perf_counter() - start < 10
+
+    @pytest.mark.asyncio
+    async def test_thread_mode(self, monkeypatch):
+        monkeypatch.setattr(settings, "cpu_pool_kind", "thread")
+        pid, result = await cpu_pool.run(_pid_and_square, 3)
+        assert (pid, result) == (os.getpid(), 9)
+
+
+class TestIterate:
+    @pytest.mark.asyncio
+    async def test_items_computed_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        items = (threading.get_ident() for _ in range(3))
+        threads = [t async for t in cpu_pool.iterate(items)]
+        assert len(threads) == 3
+        assert loop_thread not in threads
+
+    @pytest.mark.asyncio
+    async def test_async_iterables_pass_through(self):
+        async def gen():
+            for i in range(3):
+                yield i
+
+        assert [i async for i in cpu_pool.iterate(gen())] == [0, 1, 2]
@@ -0,0 +1,122 @@
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from app.config import settings
+from app.middleware.error_handler import ValidationError
+from app.services import documents, job_service, upload_service, upload_store
+from app.services.llm_service import _format_schemas
+from app.services.row_delta import ROW_HASH_COLUMN
+from tests.test_row_delta import FakeCollection
+
+RECORDS = [
+    {"id": 1, "user": {"name": " Ann ", "age": "31", "joined": "2024-01-02"}, "tags": ["a", "b"]},
+    {"id": 2, "user": {"name": "Bob", "age": "40", "joined": "2024-03-04"}, "tags": []},
+    {"id": 3, "user": {"name": "", "age": "25", "joined": "2024-05-06"}, "tags": ["c"]},
+]
+
+
+def _spool(tmp_path, payload: bytes, ext: str = "json") -> upload_service.SpooledUpload:
+    path = tmp_path / f"data.{ext}"
+    path.write_bytes(payload)
+    return upload_service.SpooledUpload(path=str(path), filename=path.name, ext=ext, size=len(payload))
+
+
+class TestToDocument:
+    def test_only_leaves_change(self):
+        record = {"a": {"n": " 12 ", "when": "2024-01-02", "x.y": 1.5}, "$k": "", "tags": [" t "], "_row_hash": 7}
+        types = {"a.n": ("integer", None), "a.when": ("datetime", "%Y-%m-%d")}
+        assert documents.to_document(record, types) == {
+            "a": {"n": 12, "when": datetime(2024, 1, 2), "x_y": 1.5},
+            "_k": None,
+            "tags": ["t"],
+            "_row_hash_": 7,
+        }
+
+    def test_leaf_that_does_not_parse_keeps_its_text(self):
+        types = {"n": ("float", None), "ok": ("boolean", None)}
+        assert documents.to_document({"n": "n/a", "ok": "TRUE"}, types) == {"n": "n/a", "ok": True}
+        assert documents.to_document(5, {}) == {"value": 5}
+
+    def test_jsonl_batches_and_bad_line(self):
+        lines = b'{"a": 1}\n\n{"a": 2}\n'
+        assert list(documents.iter_documents(io.BytesIO(lines), "jsonl", {})) == [[{"a": 1}, {"a": 2}]]
+        with pytest.raises(ValidationError, match="line 2"):
+            list(documents.iter_jsonl(io.BytesIO(b'{"a": 1}\n{"a": \n')))
+
+
+class TestSniffDocuments:
+    def test_columns_are_dotted_paths_of_the_sample(self, tmp_path):
+        spool = _spool(tmp_path, json.dumps({"data": RECORDS}).encode())
+        result = upload_service.sniff_documents(spool)
+
+        types = {c["name"]: c["dtype"] for c in result["columns"]}
+        assert types["user.age"] == "integer"
+        assert types["user.joined"] == "datetime"
+        assert (result["nested"], result["row_count"], result["confidence"]) == (True, 3, "exact")
+        assert result["recommended_db"] == "mongodb"
+        assert result["sample_rows"][0]["user"] == {"name": "Ann", "age": 31, "joined": datetime(2024, 1, 2)}
+
+    def test_sample_only(self, tmp_path):
+        payload = b"".join(json.dumps(r).encode() + b"\n" for r in RECORDS * 100)
+        result = upload_service.sniff_documents(_spool(tmp_path, payload, "jsonl"), rows=10)
+        assert result["confidence"] == "sampled"
+        assert 200 < result["row_count"] < 400
+
+    def test_geojson_keeps_its_geometry(self, tmp_path):
+        feature = {"type": "Feature", "properties": {"name": "p"}, "geometry": {"type": "Point", "coordinates": [1, 2]}}
+        spool = _spool(tmp_path, json.dumps({"type": "FeatureCollection", "features": [feature]}).encode())
+        (doc,) = next(upload_service.iter_documents(spool, []))
+        assert doc == {"name": "p", "geometry": {"type": "Point", "coordinates": [1, 2]}}
+
+
+class TestLoad:
+    @pytest.fixture
+    def collection(self, monkeypatch):
+        fake = FakeCollection()
+        monkeypatch.setattr(upload_service, "get_mongodb", lambda: {"t": fake})
+        return fake
+
+    @pytest.mark.asyncio
+    async def test_documents_are_inserted_nested_and_delta_loaded(self, collection, tmp_path):
+        spool = _spool(tmp_path, json.dumps(RECORDS).encode())
+        columns = upload_service.sniff_documents(spool)["columns"]
+        stats = await upload_service.ingest_mongodb(upload_service.iter_documents(spool, columns), "t")
+        assert stats.row_count == 3
+        assert collection.docs[0]["user"]["age"] == 31
+        assert all(ROW_HASH_COLUMN in doc for doc in collection.docs)
+
+        changed = [RECORDS[0], {**RECORDS[1], "tags": ["x"]}]
+        spool = _spool(tmp_path, json.dumps(changed).encode())
+        stats = await upload_service.delta_mongodb(upload_service.iter_documents(spool, columns), "t")
+        assert (stats.row_count, stats.rows_deleted, stats.rows_unchanged) == (1, 2, 1)
+        assert sorted(doc["tags"] for doc in collection.docs) == [["a", "b"], ["x"]]
+
+
+class TestChoosePath:
+    @pytest.fixture
+    def token(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "upload_store_dir", str(tmp_path / "store"))
+        spool = _spool(tmp_path, json.dumps(RECORDS).encode())
+        return upload_store.save_raw("u1", "data.json", "json", {"columns": []}, spool.path)
+
+    def _job(self, token, **fields):
+        return {"owner_id": "u1", "upload_token": token, "db_type": "mongodb", "mode": "create", "columns": None,
+                **fields}
+
+    def test_whole_json_files_for_mongodb(self, token):
+        assert job_service._loads_as_documents(self._job(token), None)
+        assert not job_service._loads_as_documents(self._job(token, db_type="postgres"), None)
+        assert not job_service._loads_as_documents(self._job(token, columns=["id"]), None)
+
+    def test_incremental_loads_keep_the_collection_shape(self, token):
+        job = self._job(token, mode="append")
+        assert job_service._loads_as_documents(job, {"db_type": "mongodb", "nested": True})
+        assert not job_service._loads_as_documents(job, {"db_type": "mongodb"})
+
+
+def test_prompt_names_dotted_paths():
+    schema = {"name": "t", "db_type": "mongodb", "nested": True, "columns": [{"name": "user.age", "dtype": "integer"}]}
+    assert "dotted field paths" in _format_schemas([schema])
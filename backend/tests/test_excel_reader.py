@@ -0,0 +1,115 @@
+import datetime
+import io
+
+import pandas as pd
+import pytest
+from fastapi import UploadFile
+from openpyxl import Workbook
+
+from app.config import settings
+from app.middleware.error_handler import ValidationError
+from app.services import excel_reader, upload_service
+from app.services.upload_service import sniff_sample, spooled_upload
+
+
+def _workbook_bytes() -> bytes:
+    workbook = Workbook()
+    sales = workbook.active
+    sales.title = "Sales 2024"
+    sales.append(["Region", "Units", "Price", "Date", "Units", None])
+    sales.append(["North", 10, 1.5, datetime.datetime(2024, 1, 2), 1, "x"])
+    sales.append([None, None, None, None, None, None])  # blank rows are skipped
+    sales.append(["South", 20, 2.0, datetime.datetime(2024, 1, 3), 2, None])
+    sales.append(["East", None, 2.25, None, 3, "N/A"])
+    other = workbook.create_sheet("Notes")
+    other.append(["id", "text"])
+    other.append([1, "hello"])
+    buf = io.BytesIO()
+    workbook.save(buf)
+    return buf.getvalue()
+
+
+def _upload(content: bytes, filename: str = "book.xlsx") -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+
+@pytest.fixture
+def book(tmp_path) -> str:
+    path = tmp_path / "book.xlsx"
+    path.write_bytes(_workbook_bytes())
+    return str(path)
+
+
+class TestExcelReader:
+    def test_sheet_names(self, book):
+        assert excel_reader.sheet_names(book) == ["Sales 2024", "Notes"]
+
+    def test_cells_converted_like_read_excel(self, book):
+        df = pd.concat(excel_reader.iter_sheet(book, None, chunk_rows=2), ignore_index=True)
+        assert list(df.columns) == ["Region", "Units", "Price", "Date", "Units.1", "Unnamed: 5"]
+        assert df["Region"].tolist() == ["North", "South", "East"]
+        assert str(df["Units"].dtype) == "Int64"
+        assert df["Units"].isna().tolist() == [False, False, True]
+        assert df["Price"].dtype == "float64"
+        assert pd.api.types.is_datetime64_any_dtype(df["Date"])
+        assert df["Unnamed: 5"].tolist() == ["x", None, None]  # "N/A" is null, as in read_excel
+
+    def test_chunks_and_projection(self, book):
+        chunks = list(excel_reader.iter_sheet(book, None, 2, keep=lambda name: name == "Price"))
+        assert [len(c) for c in chunks] == [2, 1]
+        assert list(chunks[0].columns) == ["Price"]
+
+    def test_other_sheet_and_unknown_sheet(self, book):
+        df = next(excel_reader.iter_sheet(book, "Notes", 10))
+        assert df.to_dict(orient="list") == {"id": [1], "text": ["hello"]}
+        with pytest.raises(ValidationError, match="Unknown sheet"):
+            list(excel_reader.iter_sheet(book, "Missing", 10))
+
+    def test_sample_counts_rows_from_dimensions(self, book):
+        df, total = excel_reader.sample_sheet(book, None, 1)
+        assert len(df) == 1
+        assert total == 4  # dimensions include the blank row
+
+    def test_corrupt_file_is_validation_error(self, tmp_path):
+        path = tmp_path / "bad.xlsx"
+        path.write_bytes(b"not a workbook")
+        with pytest.raises(ValidationError):
+            excel_reader.sheet_names(str(path))
+
+
+class TestSheetSelection:
+    @pytest.fixture(autouse=True)
+    def store_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "upload_store_dir", str(tmp_path / "store"))
+
+    @pytest.mark.asyncio
+    async def test_sniff_lists_sheets(self):
+        async with spooled_upload(_upload(_workbook_bytes())) as spool:
+            result = sniff_sample(spool, rows=2)
+        assert result["confidence"] == "sampled"
+        assert [c["name"] for c in result["columns"]][:2] == ["region", "units"]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("sample", [True, False])
+    async def test_every_sheet_ingestible_from_one_token(self, sample):
+        async with spooled_upload(_upload(_workbook_bytes())) as spool:
+            result = upload_service.sniff_and_store(spool, "u1", sample=sample)
+        assert result["sheets"] == ["Sales 2024", "Notes"]
+
+        for sheet, rows in (("Sales 2024", 3), ("Notes", 1)):
+            async with upload_service.upload_source(
+                "u1", upload_token=result["upload_token"], sheet=sheet, discard=False
+            ) as source:
+                df = pd.concat(list(source.chunks))
+            assert len(df) == rows
+
+    @pytest.mark.asyncio
+    async def test_stage_rejects_unknown_sheet(self):
+        async with spooled_upload(_upload(_workbook_bytes())) as spool:
+            token = upload_service.sniff_and_store(spool, "u1")["upload_token"]
+        with pytest.raises(ValidationError, match="Unknown sheets: Nope"):
+            await upload_service.stage_upload("u1", upload_token=token, sheets=["Notes", "Nope"])
+
+    def test_sheet_collection_name(self):
+        assert upload_service.sheet_collection_name("finance", "Sales 2024") == "finance_sales_2024"
+        assert upload_service.sheet_collection_name("finance", "$$$") == "finance_sheet"
@@ -0,0 +1,156 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pandas as pd
+import pytest
+
+from app.middleware.error_handler import NotFoundError, ValidationError
+from app.services import job_service, mongo_loader, pg_loader, upload_service
+
+
+def _col(name: str, dtype: str, nullable: bool = True) -> dict:
+    return {"name": name, "dtype": dtype, "nullable": nullable, "sample_values": []}
+
+
+TARGET = [_col("id", "integer", nullable=False), _col("price", "float"), _col("label", "string")]
+
+
+class TestMergeSchema:
+    def test_casts_to_target_and_adds_new_columns(self):
+        incoming = [_col("id", "integer", nullable=False), _col("price", "integer"), _col("extra", "boolean", False)]
+        write, merged = upload_service.merge_schema("t", TARGET, incoming, "postgres", ["id"])
+
+        assert [(c["name"], c["dtype"]) for c in write] == [("id", "integer"), ("price", "float"), ("extra", "boolean")]
+        assert [c["name"] for c in merged] == ["id", "price", "label", "extra"]
+        assert merged[-1]["nullable"] is True
+
+    def test_lists_every_incompatibility(self):
+        incoming = [_col("id", "string"), _col("price", "boolean")]
+        with pytest.raises(ValidationError) as exc_info:
+            upload_service.merge_schema("t", TARGET, incoming, "postgres")
+        message = exc_info.value.message
+        assert "'id' is integer there but string" in message
+        assert "'price' is float there but boolean" in message
+
+    def test_not_null_columns_must_be_filled_in_postgres_only(self):
+        incoming = [_col("price", "float")]
+        with pytest.raises(ValidationError, match="'id' cannot be empty there but is missing"):
+            upload_service.merge_schema("t", TARGET, incoming, "postgres")
+        _, merged = upload_service.merge_schema("t", TARGET, incoming, "mongodb")
+        assert merged[0]["nullable"] is True
+
+    def test_key_columns_must_exist_and_be_filled(self):
+        incoming = [_col("id", "integer"), _col("price", "float")]
+        with pytest.raises(ValidationError, match="key column 'id' has empty values"):
+            upload_service.merge_schema("t", TARGET, incoming, "mongodb", ["id"])
+        with pytest.raises(ValidationError, match="key column 'sku' must exist in both"):
+            upload_service.merge_schema("t", TARGET, incoming, "mongodb", ["sku"])
+
+    def test_conform_to_recasts_only_when_a_dtype_differs(self):
+        chunks = [pd.DataFrame({"n": pd.array([1, 2], dtype="Int64")})]
+        assert upload_service.conform_to(chunks, [_col("n", "integer")], [_col("n", "integer")]) is chunks
+
+        recast = list(upload_service.conform_to(chunks, [_col("n", "integer")], [_col("n", "float")]))
+        assert recast[0]["n"].dtype == "float64"
+
+
+class TestPostgresUpsert:
+    def test_merge_sql(self):
+        sql = pg_loader.merge_sql("t", ["id", "v"], ["id"])
+        assert 'SELECT DISTINCT ON ("id") "id", "v" FROM "_upsert_stage" ORDER BY "id", ctid DESC' in sql
+        assert 'ON CONFLICT ("id") DO UPDATE SET "v" = EXCLUDED."v"' in sql
+        assert "DO NOTHING" in pg_loader.merge_sql("t", ["id"], ["id"])
+
+    @pytest.mark.asyncio
+    async def test_each_chunk_is_staged_then_merged(self):
+        session = AsyncMock()
+        merged = MagicMock()
+        merged.one.side_effect = [(2, 3), (1, 1)]
+        session.execute.return_value = merged
+        loader = AsyncMock()
+        chunks = [pd.DataFrame({"id": [1, 2, 3]}), pd.DataFrame({"id": [4]})]
+
+        written, updated = await pg_loader.upsert_chunks(session, "t", ["id"], chunks, ["id"], loader)
+
+        assert (written, updated) == (4, 1)
+        assert [c.args[1] for c in loader.await_args_list] == ["_upsert_stage", "_upsert_stage"]
+        statements = [str(c.args[0]) for c in session.execute.await_args_list]
+        assert statements[0].startswith('CREATE TEMP TABLE "_upsert_stage" ON COMMIT DROP')
+        assert statements[1:3] == [pg_loader.merge_sql("t", ["id"], ["id"]), 'TRUNCATE "_upsert_stage"']
+
+
+class FakeBulkCollection:
+    def __init__(self):
+        self.stored: dict = {}
+
+    async def bulk_write(self, ops, ordered=True):
+        assert ordered is False
+        matched = 0
+        for op in ops:
+            key = tuple(op._filter.values())
+            matched += key in self.stored
+            self.stored[key] = op._doc["$set"]
+        return SimpleNamespace(matched_count=matched, upserted_count=len(ops) - matched)
+
+
+class SlowFirstCollection(FakeBulkCollection):
+    """Each write takes less time than the one before, so concurrent batches finish out of order."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def bulk_write(self, ops, ordered=True):
+        self.calls += 1
+        await asyncio.sleep(max(0.05 - 0.01 * self.calls, 0))
+        return await super().bulk_write(ops, ordered)
+
+
+class TestMongoUpsert:
+    @pytest.mark.asyncio
+    async def test_counts_new_and_updated_rows(self, monkeypatch):
+        monkeypatch.setattr(mongo_loader, "INSERT_BATCH_SIZE", 2)
+        collection = FakeBulkCollection()
+        first = [pd.DataFrame({"id": [1, 2, 3], "v": ["a", "b", "c"]})]
+        await mongo_loader.upsert_chunks(collection, first, ["id"], concurrency=2)
+
+        second = [pd.DataFrame({"id": [3, 4], "v": ["C", "d"]})]
+        written, updated = await mongo_loader.upsert_chunks(collection, second, ["id"], concurrency=2)
+
+        assert (written, updated) == (2, 1)
+        assert collection.stored[(3,)] == {"id": 3, "v": "C"}
+
+    @pytest.mark.asyncio
+    async def test_last_row_of_a_repeated_key_wins(self, monkeypatch):
+        monkeypatch.setattr(mongo_loader, "INSERT_BATCH_SIZE", 2)
+        collection = SlowFirstCollection()
+        chunks = [
+            pd.DataFrame({"id": [1, 2, 1, 3], "v": ["a", "b", "a2", "c"]}),
+            pd.DataFrame({"id": [1, 4, 1], "v": ["a3", "d", "a4"]}),
+        ]
+        await mongo_loader.upsert_chunks(collection, chunks, ["id"], concurrency=3)
+        assert collection.stored[(1,)] == {"id": 1, "v": "a4"}
+        assert sorted(collection.stored) == [(1,), (2,), (3,), (4,)]
+
+
+class TestIngestRouting:
+    @pytest.mark.asyncio
+    async def test_append_needs_an_existing_collection(self, monkeypatch):
+        monkeypatch.setattr(job_service.metadata_repo, "get_owned_by_name", AsyncMock(return_value=None))
+        job = {"owner_id": "u1", "collection_name": "sales", "mode": "append"}
+        with pytest.raises(NotFoundError, match="Upload it before appending"):
+            await job_service._ingest(job, job_service._Progress(job))
+
+    @pytest.mark.asyncio
+    async def test_interrupted_mongodb_append_is_not_retried(self, monkeypatch):
+        existing = {"name": "sales", "owner_id": "u1", "db_type": "mongodb", "row_count": 10, "columns": TARGET}
+        monkeypatch.setattr(job_service.metadata_repo, "get_owned_by_name", AsyncMock(return_value=existing))
+        monkeypatch.setattr(upload_service, "mongodb_row_count", AsyncMock(return_value=14))
+        record = AsyncMock()
+        monkeypatch.setattr(upload_service, "record_incremental_load", record)
+        job = {"owner_id": "u1", "collection_name": "sales", "mode": "append", "key_columns": [], "attempts": 2}
+
+        with pytest.raises(job_service.AppError, match="was interrupted"):
+            await job_service._ingest(job, job_service._Progress(job))
+        record.assert_awaited_once_with("u1", "sales", 4, TARGET)
@@ -0,0 +1,119 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pandas as pd
+import pytest
+
+from app.services import index_advisor
+from app.services.index_advisor import IndexPlan
+from app.services.upload_service import sniff_chunks
+
+
+def _col(name: str, dtype: str, distinct: int | None = None, monotonic: bool = False) -> dict:
+    return {"name": name, "dtype": dtype, "distinct_count": distinct, "monotonic": monotonic}
+
+
+COLUMNS = [
+    _col("order_id", "integer", None, monotonic=True),
+    _col("region", "string", 40),
+    _col("status", "string", 3),
+    _col("note", "string", None),
+    _col("amount", "float", None),
+]
+
+SCHEMAS = [
+    {"name": "orders", "owner_id": "u1", "db_type": "postgres", "row_count": 50_000, "columns": COLUMNS},
+    {"name": "events", "owner_id": "u2", "db_type": "mongodb", "row_count": 50_000, "columns": COLUMNS},
+]
+
+
+class TestSniffStatistics:
+    def test_distinct_counts_and_monotonic_columns(self):
+        chunks = [
+            pd.DataFrame({"id": [1, 2, 3], "cat": ["a", "b", "a"], "v": [3.0, 1.0, None]}),
+            pd.DataFrame({"id": [4, 5], "cat": ["c", None], "v": [2.0, 5.0]}),
+        ]
+        columns = {c["name"]: c for c in sniff_chunks(chunks)["columns"]}
+        assert columns["cat"]["distinct_count"] == 3
+        assert columns["id"]["monotonic"] is True
+        assert columns["v"]["monotonic"] is False
+        assert columns["cat"]["monotonic"] is False
+
+    def test_decrease_across_a_chunk_boundary_is_not_monotonic(self):
+        chunks = [pd.DataFrame({"id": [5, 6]}), pd.DataFrame({"id": [1, 2]})]
+        assert sniff_chunks(chunks)["columns"][0]["monotonic"] is False
+
+    def test_high_cardinality_has_no_count(self, monkeypatch):
+        monkeypatch.setattr("app.services.upload_service.DISTINCT_CAP", 5)
+        columns = sniff_chunks([pd.DataFrame({"id": range(20)})])["columns"]
+        assert columns[0]["distinct_count"] is None
+
+
+class TestAdvise:
+    def test_btree_on_selective_categories_and_brin_on_monotonic_ids(self):
+        assert index_advisor.advise(COLUMNS, 50_000) == [
+            IndexPlan("order_id", "brin"),
+            IndexPlan("region", "btree"),
+        ]
+
+    def test_small_collections_get_nothing(self):
+        assert index_advisor.advise(COLUMNS, 500, filtered=["note"]) == []
+
+    def test_learned_filter_columns_come_first(self):
+        plans = index_advisor.advise(COLUMNS, 50_000, filtered=["note", "missing"])
+        assert plans[0] == IndexPlan("note", "btree")
+
+    @pytest.mark.asyncio
+    async def test_index_postgres_skips_columns_already_indexed(self, monkeypatch):
+        monkeypatch.setattr(index_advisor, "learned_columns", AsyncMock(return_value=[]))
+        session = AsyncMock()
+        session.execute.side_effect = [[("order_id",)], MagicMock()]
+
+        created = await index_advisor.index_postgres(session, "orders_stg_1", "u1", "orders", COLUMNS, 50_000)
+
+        assert created == [index_advisor.index_name("orders_stg_1", IndexPlan("region", "btree"))]
+        sql = str(session.execute.await_args_list[1].args[0])
+        assert sql.startswith(f'CREATE INDEX IF NOT EXISTS "{created[0]}" ON "orders_stg_1" USING btree ("region")')
+
+
+class TestLearning:
+    def test_sql_where_columns(self):
+        query = (
+            "SELECT region, count(*) FROM orders WHERE status = 'where note' AND \"amount\" > 5 "
+            "GROUP BY region ORDER BY note"
+        )
+        assert index_advisor.sql_filter_columns(query, SCHEMAS) == {"orders": ["status", "amount"]}
+
+    def test_sql_for_unreferenced_table_learns_nothing(self):
+        assert index_advisor.sql_filter_columns("SELECT 1 FROM other WHERE region = 'x'", SCHEMAS) == {}
+
+    def test_only_leading_match_stages_count(self):
+        pipeline = [
+            {"$match": {"region": "north", "$or": [{"status": "a"}, {"amount": {"$gt": 1}}]}},
+            {"$group": {"_id": "$note"}},
+            {"$match": {"note": "x"}},
+        ]
+        assert index_advisor.match_filter_columns(pipeline, COLUMNS) == ["region", "status", "amount"]
+
+    @pytest.mark.asyncio
+    async def test_index_built_when_threshold_reached(self, monkeypatch):
+        counts = {"status": index_advisor.LEARN_THRESHOLD, "amount": index_advisor.LEARN_THRESHOLD + 4}
+        record = AsyncMock(return_value=counts)
+        monkeypatch.setattr(index_advisor.column_usage_repo, "record_filters", record)
+        index_learned = AsyncMock()
+        monkeypatch.setattr(index_advisor, "_index_learned", index_learned)
+
+        await index_advisor.learn_from_query(
+            '[{"$match": {"status": "a", "amount": 3}}]', "mongodb", "events", SCHEMAS
+        )
+        for task in list(index_advisor._background):
+            await task
+
+        record.assert_awaited_once_with("u2", "mongodb", "events", ["status", "amount"])
+        index_learned.assert_awaited_once_with("mongodb", SCHEMAS[1], ["status"])
+
+    @pytest.mark.asyncio
+    async def test_learning_never_raises(self, monkeypatch):
+        monkeypatch.setattr(
+            index_advisor.column_usage_repo, "record_filters", AsyncMock(side_effect=RuntimeError("down"))
+        )
+        await index_advisor.learn_from_query("SELECT * FROM orders WHERE region = 'x'", "sql", "", SCHEMAS)
@@ -0,0 +1,360 @@
+import asyncio
+import contextlib
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pandas as pd
+import pytest
+
+from app.middleware.error_handler import AppError
+from app.repositories import job_repo
+from app.services import job_service, upload_service
+
+
+class FakeJobRepo:
+    """Records job_repo writes made by a worker."""
+
+    def __init__(self):
+        self.finished: list[tuple[str, str, str, dict]] = []
+        self.requeued: list[str] = []
+        self.cancel_requested = False
+        self.lease_lost = False  # re-queued as stale: writes under the old claim match nothing
+
+    async def finish_job(self, job_id, worker_id, attempt, status, error="", **fields):
+        if not self.lease_lost:
+            self.finished.append((job_id, status, error, fields))
+
+    async def requeue_job(self, job_id, worker_id, attempt):
+        if not self.lease_lost:
+            self.requeued.append(job_id)
+
+    async def heartbeat(self, job_id, worker_id, attempt, **progress):
+        return self.cancel_requested or self.lease_lost
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    fake = FakeJobRepo()
+    for name in ("finish_job", "requeue_job", "heartbeat"):
+        monkeypatch.setattr(job_service.job_repo, name, getattr(fake, name))
+    monkeypatch.setattr(job_service, "HEARTBEAT_SECONDS", 0.01)
+    return fake
+
+
+def _job(**overrides) -> dict:
+    return {"job_id": "j1", "total_rows": 100, "total_bytes": 1000, **overrides}
+
+
+class TestProgress:
+    def test_counts_rows_once_the_next_chunk_is_pulled(self):
+        progress = job_service._Progress(_job())
+        chunks = progress.track(pd.DataFrame({"a": range(n)}) for n in (30, 20))
+        next(chunks)
+        assert progress.rows_written == 0
+        next(chunks)
+        assert progress.rows_written == 30
+        assert progress.bytes_processed == 300
+        list(chunks)
+        assert progress.fields() == {"rows_written": 50, "bytes_processed": 500, "total_rows": 100}
+
+    def test_throughput_and_eta(self):
+        started = datetime.now(timezone.utc) - timedelta(seconds=10)
+        job = {"status": "running", "started_at": started.isoformat(), "rows_written": 100, "total_rows": 300}
+        progress = job_service.job_progress(job)
+        assert progress["rows_per_sec"] == pytest.approx(10, rel=0.05)
+        assert progress["eta_seconds"] == pytest.approx(20, rel=0.05)
+
+    def test_queued_job_has_no_eta(self):
+        assert job_service.job_progress({"status": "queued"}) == {"rows_per_sec": 0.0, "eta_seconds": None}
+
+
+class TestRun:
+    @pytest.mark.asyncio
+    async def test_success_records_result(self, repo, monkeypatch):
+        async def ingest(job, progress):
+            list(progress.track([pd.DataFrame({"a": range(80)})]))
+            return {"row_count": 80}
+
+        monkeypatch.setattr(job_service, "_ingest", ingest)
+        await job_service._run(_job())
+        (job_id, status, error, fields), = repo.finished
+        assert (job_id, status, error) == ("j1", "succeeded", "")
+        assert fields["result"] == {"row_count": 80}
+        assert fields["total_rows"] == 80
+        assert fields["bytes_processed"] == 1000
+
+    @pytest.mark.asyncio
+    async def test_app_error_fails_job_with_its_message(self, repo, monkeypatch):
+        async def ingest(job, progress):
+            raise AppError("Upload expired", status_code=404)
+
+        monkeypatch.setattr(job_service, "_ingest", ingest)
+        await job_service._run(_job())
+        assert repo.finished[0][1:3] == ("failed", "Upload expired")
+
+    @pytest.mark.asyncio
+    async def test_cancel_flag_from_heartbeat_stops_ingest(self, repo, monkeypatch):
+        async def ingest(job, progress):
+            await asyncio.sleep(5)
+
+        monkeypatch.setattr(job_service, "_ingest", ingest)
+        repo.cancel_requested = True
+        await asyncio.wait_for(job_service._run(_job()), 1)
+        assert repo.finished[0][1] == "cancelled"
+        assert job_service._running == {}
+
+    @pytest.mark.asyncio
+    async def test_worker_that_lost_its_claim_stops_without_recording_anything(self, repo, monkeypatch):
+        cancelled = asyncio.Event()
+
+        async def ingest(job, progress):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        monkeypatch.setattr(job_service, "_ingest", ingest)
+        repo.lease_lost = True
+        await asyncio.wait_for(job_service._run(_job()), 1)
+        assert cancelled.is_set()
+        assert repo.finished == []
+
+    @pytest.mark.asyncio
+    async def test_shutdown_requeues_running_job(self, repo, monkeypatch):
+        started = asyncio.Event()
+
+        async def ingest(job, progress):
+            started.set()
+            await asyncio.sleep(5)
+
+        monkeypatch.setattr(job_service, "_ingest", ingest)
+        worker = asyncio.create_task(job_service._run(_job()))
+        await started.wait()
+        worker.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await worker
+        assert repo.requeued == ["j1"]
+        assert repo.finished == []
+
+
+class TestLease:
+    @pytest.fixture
+    def jobs(self, monkeypatch):
+        jobs = MagicMock()
+        jobs.find_one_and_update = AsyncMock(return_value=None)
+        jobs.update_one = AsyncMock()
+        monkeypatch.setattr(job_repo, "get_mongodb", lambda: {job_repo.COLLECTION: jobs})
+        return jobs
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_on_a_requeued_job_tells_the_worker_to_stop(self, jobs):
+        assert await job_repo.heartbeat("j1", "w1", 2) is True
+        query = jobs.find_one_and_update.await_args.args[0]
+        assert query == {"job_id": "j1", "worker_id": "w1", "attempts": 2, "status": "running"}
+
+    @pytest.mark.asyncio
+    async def test_finish_only_touches_the_workers_own_claim(self, jobs):
+        await job_repo.finish_job("j1", "w1", 2, "failed", "boom")
+        query = jobs.update_one.await_args.args[0]
+        assert query == {"job_id": "j1", "worker_id": "w1", "attempts": 2, "status": "running"}
+
+
+class FakeMongo:
+    """Collections by name, with the upload_service calls a full MongoDB load makes."""
+
+    def __init__(self, fail_load: bool = False):
+        self.collections = {"sales": ["old"]}
+        self.fail_load = fail_load
+        self.seen_during_load: list | None = None
+
+    async def ingest_mongodb(self, chunks, name):
+        self.collections[name] = []
+        for df in chunks:
+            self.collections[name].extend(df["a"])
+        self.seen_during_load = list(self.collections.get("sales", []))
+        if self.fail_load:
+            raise RuntimeError("write failed")
+        return upload_service.IngestStats(row_count=len(self.collections[name]), elapsed_s=1, method="insert_many")
+
+    async def swap_in_mongodb(self, staging, name):
+        self.collections[name] = self.collections.pop(staging)
+
+    async def drop_existing_mongodb(self, name):
+        self.collections.pop(name, None)
+
+    async def mongodb_collection_exists(self, name):
+        return name in self.collections
+
+
+class TestOverwrite:
+    @pytest.fixture
+    def mongo(self, monkeypatch):
+        fake = FakeMongo()
+
+        @contextlib.asynccontextmanager
+        async def upload_source(*args, **kwargs):
+            sniff = {"row_count": 2, "columns": [{"name": "a", "dtype": "integer"}], "sample_rows": []}
+            yield upload_service.UploadSource("f.csv", sniff, iter([pd.DataFrame({"a": [1, 2]})]))
+
+        for name in ("ingest_mongodb", "swap_in_mongodb", "drop_existing_mongodb", "mongodb_collection_exists"):
+            monkeypatch.setattr(upload_service, name, getattr(fake, name))
+        monkeypatch.setattr(upload_service, "upload_source", upload_source)
+        monkeypatch.setattr(upload_service, "save_metadata", AsyncMock())
+        monkeypatch.setattr(job_service.job_repo, "has_other_active_for_token", AsyncMock(return_value=True))
+        existing = {"name": "sales", "db_type": "mongodb"}
+        monkeypatch.setattr(job_service.metadata_repo, "get_owned_by_name", AsyncMock(return_value=existing))
+        monkeypatch.setattr(job_service.metadata_repo, "delete_metadata", AsyncMock())
+        return fake
+
+    def _job(self) -> dict:
+        return _job(
+            job_id="abcdef0123", owner_id="u1", owner_username="", upload_token="t", columns=None,
+            collection_name="sales", db_type="mongodb", mode="overwrite", is_public=False, attempts=1,
+        )
+
+    @pytest.mark.asyncio
+    async def test_old_data_stays_live_until_the_swap(self, mongo):
+        job = self._job()
+        result = await job_service._ingest(job, job_service._Progress(job))
+
+        assert mongo.seen_during_load == ["old"]
+        assert mongo.collections == {"sales": [1, 2]}
+        assert result["message"] == "Successfully replaced 2 rows into mongodb:sales"
+
+    @pytest.mark.asyncio
+    async def test_retry_loads_into_its_own_staging_and_drops_earlier_ones(self, mongo):
+        earlier = upload_service.staging_name("sales", "abcdef0123", 1)
+        mongo.collections[earlier] = ["partial"]
+        job = {**self._job(), "attempts": 2}
+        await job_service._ingest(job, job_service._Progress(job))
+
+        assert mongo.collections == {"sales": [1, 2]}
+
+    @pytest.mark.asyncio
+    async def test_failed_load_leaves_old_data_untouched(self, mongo):
+        mongo.fail_load = True
+        job = self._job()
+        with pytest.raises(RuntimeError):
+            await job_service._ingest(job, job_service._Progress(job))
+
+        assert mongo.collections == {"sales": ["old"]}
+        job_service.metadata_repo.delete_metadata.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_another_users_collection_of_that_name_is_not_replaced(self, mongo, monkeypatch):
+        monkeypatch.setattr(job_service.metadata_repo, "get_owned_by_name", AsyncMock(return_value=None))
+        job = {**self._job(), "mode": "create"}
+        with pytest.raises(AppError) as exc:
+            await job_service._ingest(job, job_service._Progress(job))
+
+        assert exc.value.status_code == 409
+        assert mongo.collections == {"sales": ["old"]}
+
+
+class TestDeduplication:
+    SOURCE = {
+        "name": "sales_2024", "owner_id": "u2", "db_type": "mongodb", "row_count": 2,
+        "columns": [{"name": "a", "dtype": "integer", "profile": {"rows": 2, "null_fraction": 0.0}}],
+        "sample_rows": [{"a": 1}],
+    }
+
+    @pytest.fixture
+    def mongo(self, monkeypatch):
+        fake = FakeMongo()
+
+        async def copy_mongodb(source, name):
+            fake.collections[name] = list(fake.collections[source])
+            return upload_service.IngestStats(row_count=len(fake.collections[name]), elapsed_s=0.1, method="copy")
+
+        fake.collections = {"sales_2024": [1, 2]}
+        for name in ("swap_in_mongodb", "drop_existing_mongodb", "mongodb_collection_exists"):
+            monkeypatch.setattr(upload_service, name, getattr(fake, name))
+        monkeypatch.setattr(upload_service, "copy_mongodb", copy_mongodb)
+        monkeypatch.setattr(upload_service, "upload_source", MagicMock(side_effect=AssertionError("parsed")))
+        monkeypatch.setattr(upload_service, "save_metadata", AsyncMock())
+        monkeypatch.setattr(job_service.job_repo, "has_other_active_for_token", AsyncMock(return_value=True))
+        monkeypatch.setattr(job_service.metadata_repo, "get_owned_by_name", AsyncMock(return_value=None))
+        monkeypatch.setattr(job_service.metadata_repo, "find_by_content_hash", AsyncMock(return_value=self.SOURCE))
+        return fake
+
+    def _job(self, name: str = "sales") -> dict:
+        return _job(
+            job_id="abcdef0123", owner_id="u1", owner_username="", upload_token="t", columns=None,
+            collection_name=name, db_type="mongodb", mode="create", is_public=False, attempts=1,
+            content_hash="f" * 64, filename="sales.csv",
+        )
+
+    @pytest.mark.asyncio
+    async def test_identical_data_is_copied_without_parsing(self, mongo):
+        job = self._job()
+        result = await job_service._ingest(job, job_service._Progress(job))
+
+        assert mongo.collections["sales"] == [1, 2]
+        assert result["message"] == "Copied 2 rows into mongodb:sales from 'sales_2024', which holds the same data"
+        key = upload_service.dataset_hash("f" * 64, None, None)
+        job_service.metadata_repo.find_by_content_hash.assert_awaited_once_with("u1", key, "mongodb")
+        saved = upload_service.save_metadata.await_args.kwargs
+        assert saved["content_hash"] == key
+        assert saved["sniff_result"]["columns"][0]["profile"] == {"rows": 2, "null_fraction": 0.0}
+
+    @pytest.mark.asyncio
+    async def test_reupload_into_the_holding_collection_changes_nothing(self, mongo, monkeypatch):
+        monkeypatch.setitem(self.SOURCE, "owner_id", "u1")
+        monkeypatch.setattr(job_service.metadata_repo, "get_owned_by_name", AsyncMock(return_value=self.SOURCE))
+        job = {**self._job("sales_2024"), "mode": "overwrite"}
+        result = await job_service._ingest(job, job_service._Progress(job))
+
+        assert result["message"] == "mongodb:sales_2024 already holds this data"
+        assert mongo.collections["sales_2024"] == [1, 2]
+        upload_service.save_metadata.assert_not_awaited()
+
+    def test_sheet_and_columns_are_part_of_the_identity(self):
+        keys = {
+            upload_service.dataset_hash("f" * 64, None, None),
+            upload_service.dataset_hash("f" * 64, "Q2", None),
+            upload_service.dataset_hash("f" * 64, None, ["a"]),
+        }
+        assert len(keys) == 3
+
+    @pytest.mark.asyncio
+    async def test_postgres_copy_gets_its_own_enum_types(self):
+        session = AsyncMock()
+        session.execute.return_value = MagicMock(rowcount=7)
+        columns = [
+            {"name": "n", "dtype": "integer"},
+            {"name": "region", "dtype": "string", "sql_type": "ENUM", "enum_values": ["north", "south"]},
+        ]
+        stats = await upload_service.copy_postgres(session, "sales_2024", "sales_stg_1", columns)
+
+        type_name = upload_service._enum_type_name("sales_stg_1", "region")
+        assert str(session.execute.await_args_list[-1].args[0]) == (
+            f'INSERT INTO "sales_stg_1" ("n", "region", "_row_hash") '
+            f'SELECT "n", "region"::text::"{type_name}", "_row_hash" FROM "sales_2024"'
+        )
+        assert stats.row_count == 7
+
+
+@pytest.mark.asyncio
+async def test_queued_job_keeps_its_upload_past_the_ttl(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_service.settings, "upload_store_dir", str(tmp_path))
+    monkeypatch.setattr(job_service.settings, "upload_token_ttl_minutes", 30)
+    monkeypatch.setattr(job_service.settings, "ingest_job_stale_seconds", 60)
+    monkeypatch.setattr(job_service, "_wake", None)
+    monkeypatch.setattr(job_service.job_repo, "create_job", AsyncMock(side_effect=lambda job: job.model_dump()))
+    (tmp_path / "data.csv").write_bytes(b"a\n1\n")
+    token = job_service.upload_store.save_raw("u1", "data.csv", "csv", {"columns": []}, str(tmp_path / "data.csv"))
+    job = job_service.IngestJob(owner_id="u1", upload_token=token, collection_name="t", db_type="postgres")
+    await job_service.enqueue(job)
+
+    clock = [job_service.upload_store.time.time()]
+    monkeypatch.setattr(job_service.upload_store.time, "time", lambda: clock[0])
+    monkeypatch.setattr(job_service.job_repo, "active_upload_tokens", AsyncMock(return_value=[token]))
+    monkeypatch.setattr(job_service.job_repo, "requeue_stale", AsyncMock(return_value=0))
+    for _ in range(70):  # an hour of sweeps while the job waits behind the memory budget
+        clock[0] += 55
+        sweeper = asyncio.create_task(job_service._sweeper())
+        await asyncio.sleep(0)
+        sweeper.cancel()
+        job_service.upload_store.evict()
+    assert job_service.upload_store.get(token, "u1") is not None
@@ -0,0 +1,90 @@
+import io
+import json
+
+import pytest
+from fastapi import UploadFile
+
+from app.middleware.error_handler import ValidationError
+from app.services.json_stream import JsonRecordStream
+from app.services.upload_service import iter_chunks, sniff_upload, spooled_upload
+
+
+def _records(payload, block_size: int = 7) -> list:
+    """Stream a document with a tiny read block so values straddle block boundaries."""
+    raw = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    return list(JsonRecordStream(io.BytesIO(raw), block_size=block_size))
+
+
+class TestJsonRecordStream:
+    def test_top_level_array(self):
+        data = [{"a": i, "s": "x" * i, "f": i / 3} for i in range(40)]
+        assert _records(data) == data
+
+    def test_numbers_and_literals_cut_by_block_end(self):
+        raw = b"[12345678901234, 2.5e10, true, null, false]"
+        for block_size in range(1, 12):
+            assert _records(raw, block_size) == [12345678901234, 2.5e10, True, None, False]
+
+    def test_multibyte_characters_split_across_blocks(self):
+        data = [{"name": "Zürich ☃ 東京"}, {"name": "naïve"}]
+        for block_size in (1, 2, 3):
+            assert _records(json.dumps(data, ensure_ascii=False).encode(), block_size) == data
+
+    def test_wrapper_object_prefers_well_known_key(self):
+        data = {
+            "meta": {"note": 'brackets ] and } and " quotes [in strings \\'},
+            "other": [{"x": 1}],
+            "results": [{"id": 1}, {"id": 2}],
+            "data": [{"id": 3}],
+        }
+        assert _records(data) == [{"id": 3}]
+
+    def test_wrapper_object_single_array_of_objects(self):
+        data = {"version": "1.0", "items_list": [], "myCustomData": [{"a": 1}, {"a": 2}]}
+        assert _records(data) == [{"a": 1}, {"a": 2}]
+
+    def test_wrapper_object_without_records_is_one_record(self):
+        data = {"arr1": [{"a": 1}], "arr2": [{"b": 2}]}
+        assert _records(data) == [data]
+
+    def test_geojson_features_flattened_and_head_kept_raw(self):
+        features = [
+            {
+                "type": "Feature",
+                "properties": {"name": f"p{i}"},
+                "geometry": {"type": "Point", "coordinates": [i, i]},
+            }
+            for i in range(8)
+        ]
+        stream = JsonRecordStream(io.BytesIO(json.dumps({"type": "FeatureCollection", "features": features}).encode()))
+        rows = list(stream)
+        assert rows[0] == {"name": "p0", "geometry_type": "Point", "geometry_coordinates": "[0, 0]"}
+        assert len(rows) == 8
+        assert stream.head == features[:5]
+
+    def test_empty_array_raises(self):
+        with pytest.raises(ValidationError, match="no records"):
+            _records(b"  [ ]  ")
+
+    def test_scalar_raises(self):
+        with pytest.raises(ValidationError, match="object or array"):
+            _records(b"42")
+
+    @pytest.mark.parametrize("raw", [b'[{"a": 1}, {"a": 2}', b'[{"a": 1} {"a": 2}]', b'{"data": [{"a": '])
+    def test_malformed_raises(self, raw):
+        with pytest.raises(ValidationError, match="Invalid JSON"):
+            _records(raw)
+
+
+class TestJsonUploadChunks:
+    @pytest.mark.asyncio
+    async def test_chunks_and_sniff_from_one_pass(self):
+        data = {"results": [{"id": i, "tags": {"k": i}} for i in range(25)]}
+        upload = UploadFile(file=io.BytesIO(json.dumps(data).encode()), filename="wrapped.json")
+        async with spooled_upload(upload) as spool:
+            chunks = list(iter_chunks(spool, chunk_rows=10))
+            result = sniff_upload(spool)
+        assert [len(c) for c in chunks] == [10, 10, 5]
+        assert list(chunks[0].columns) == ["id", "tags.k"]
+        assert result["row_count"] == 25
+        assert result["recommended_db"] == "mongodb"
@@ -0,0 +1,110 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pandas as pd
+import pytest
+
+from app.services import index_advisor, upload_service
+from app.services.index_advisor import IndexPlan
+from app.services.llm_service import _format_column
+
+RECORDS = [
+    {"id": i, "city": f"c{i % 3}", "score": i / 2, "user": {"name": f"u{i}", "address": {"zip": str(i)}}}
+    for i in range(20)
+]
+
+
+def _spool(tmp_path, records: list, ext: str) -> upload_service.SpooledUpload:
+    if ext == "json":
+        payload = json.dumps({"data": records}).encode()
+    else:
+        payload = b"".join(json.dumps(r).encode() + b"\n" for r in records)
+    path = tmp_path / f"data.{ext}"
+    path.write_bytes(payload)
+    return upload_service.SpooledUpload(path=str(path), filename=path.name, ext=ext, size=len(payload))
+
+
+class TestJsonbFields:
+    def test_mostly_tabular_records_keep_their_nested_fields(self):
+        assert upload_service._jsonb_fields(RECORDS) == ["user"]
+        assert upload_service._jsonb_fields([{"a": 1, "B": [1], "c": {}, "d": 2, "e": 3}]) == ["b", "c"]
+
+    def test_mostly_nested_or_geojson_records_do_not(self):
+        assert upload_service._jsonb_fields([{"a": 1, "b": {}, "c": {}, "d": []}]) == []
+        assert upload_service._jsonb_fields([{"a": 1, "b": {}}]) == []
+        feature = {"type": "Feature", "properties": {}, "geometry": {}, "a": 1, "b": 2}
+        assert upload_service._jsonb_fields([feature]) == []
+        assert upload_service._jsonb_fields(None) == []
+
+
+class TestSniff:
+    @pytest.mark.parametrize("ext", ["json", "jsonl"])
+    @pytest.mark.parametrize("sniff", [upload_service.sniff_upload, upload_service.sniff_sample])
+    def test_nested_field_becomes_one_jsonb_column(self, tmp_path, ext, sniff):
+        result = sniff(_spool(tmp_path, RECORDS, ext))
+
+        columns = {c["name"]: c for c in result["columns"]}
+        assert list(columns) == ["id", "city", "score", "user"]
+        assert (columns["user"]["dtype"], columns["user"]["sql_type"]) == ("object", "JSONB")
+        assert columns["user"]["json_paths"] == ["address.zip", "name"]
+        assert columns["id"]["dtype"] == "integer"
+        assert result["recommended_db"] == "postgres"
+        assert "JSONB" in result["recommendation_reason"]
+
+    def test_mostly_nested_records_are_still_flattened(self, tmp_path):
+        records = [{"id": i, "a": {"x": i}, "b": {"y": i}, "c": {"z": i}} for i in range(3)]
+        result = upload_service.sniff_upload(_spool(tmp_path, records, "json"))
+        assert [c["name"] for c in result["columns"]] == ["id", "a_x", "b_y", "c_z"]
+        assert result["recommended_db"] == "mongodb"
+
+
+class TestLoad:
+    def test_conformed_chunks_carry_json_text(self, tmp_path):
+        spool = _spool(tmp_path, [RECORDS[0], {**RECORDS[1], "user": "anonymous"}, *RECORDS[2:]], "json")
+        columns = upload_service.sniff_upload(spool)["columns"]
+        (chunk,) = upload_service.iter_conformed(spool, columns)
+        assert chunk["user"][0] == {"name": "u0", "address": {"zip": "0"}}
+
+        (encoded,) = upload_service._json_encoded([chunk], columns)
+        assert json.loads(encoded["user"][0]) == {"name": "u0", "address": {"zip": "0"}}
+        assert encoded["user"][1] == '"anonymous"'
+
+    def test_table_declares_jsonb(self):
+        columns = [{"name": "user", "dtype": "object", "sql_type": "JSONB"}]
+        create = upload_service._create_table_statements("t", columns)[-1]
+        assert '"user" JSONB NULL' in create
+
+    def test_append_writes_json_into_a_jsonb_column(self):
+        target = [{"name": "user", "dtype": "object", "sql_type": "JSONB"}]
+        upload = [{"name": "user", "dtype": "string", "sql_type": "ENUM", "enum_values": ["alpha", "bravo"]}]
+        write_columns, merged = upload_service.merge_schema("t", target, upload, "postgres")
+        assert write_columns[0]["sql_type"] == "JSONB"
+        assert merged[0]["sql_type"] == "JSONB"
+        df = pd.DataFrame({"user": ["alpha", None]})
+        (encoded,) = upload_service._json_encoded([df], write_columns)
+        assert list(encoded["user"]) == ['"alpha"', None]
+
+
+class TestIndexes:
+    def test_jsonb_columns_get_a_gin_index_in_postgres_only(self):
+        columns = [{"name": "user", "dtype": "object", "sql_type": "JSONB"}]
+        plans = index_advisor.advise(columns, 50_000)
+        assert plans == [IndexPlan("user", "gin")]
+        sql = index_advisor._create_index_sql("t", plans[0])
+        assert sql.endswith('ON "t" USING gin ("user" jsonb_path_ops)')
+
+    @pytest.mark.asyncio
+    async def test_mongodb_skips_gin(self, monkeypatch):
+        db = MagicMock()
+        monkeypatch.setattr(index_advisor, "learned_columns", AsyncMock(return_value=[]))
+        monkeypatch.setattr(index_advisor, "get_mongodb", lambda: db)
+        columns = [{"name": "user", "dtype": "object", "sql_type": "JSONB"}]
+        assert await index_advisor.index_mongodb("t", "u1", "t", columns, 50_000) == []
+        db.__getitem__.assert_not_called()
+
+
+def test_prompt_describes_json_paths():
+    col = {"name": "user", "dtype": "object", "sql_type": "JSONB", "json_paths": ["address.zip", "name"]}
+    line = _format_column(col, postgres=True)
+    assert "@>" in line
+    assert "JSON paths: address.zip, name" in line
@@ -0,0 +1,69 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import mongo_loader
+
+
+class FakeCollection:
+    """Records insert_many calls and the peak number running at once."""
+
+    def __init__(self, fail_on: int | None = None):
+        self.batches: list[list[dict]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail_on = fail_on
+
+    async def insert_many(self, docs, ordered=True):
+        assert ordered is False
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.fail_on is not None and len(self.batches) == self.fail_on:
+                raise RuntimeError("write failed")
+            self.batches.append(docs)
+            return SimpleNamespace(inserted_ids=list(range(len(docs))))
+        finally:
+            self.in_flight -= 1
+
+
+class TestChunkDocuments:
+    def test_plain_python_values(self):
+        df = pd.DataFrame({
+            "i": pd.array([1, None], dtype="Int64"),
+            "f": [0.5, np.nan],
+            "when": pd.to_datetime(["2024-01-02", None]),
+            "tags": [["a"], None],
+        })
+        docs = mongo_loader.chunk_documents(df)
+        assert docs[0]["i"] == 1 and type(docs[0]["i"]) is int
+        assert isinstance(docs[0]["when"], datetime.datetime)
+        assert docs[0]["tags"] == ["a"]
+        assert docs[1] == {"i": None, "f": None, "when": None, "tags": None}
+
+
+class TestInsertChunks:
+    @pytest.mark.asyncio
+    async def test_inserts_all_rows_with_bounded_concurrency(self, monkeypatch):
+        monkeypatch.setattr(mongo_loader, "INSERT_BATCH_SIZE", 10)
+        collection = FakeCollection()
+        chunks = [pd.DataFrame({"a": range(35)}), pd.DataFrame({"a": range(25)})]
+
+        total = await mongo_loader.insert_chunks(collection, chunks, concurrency=2)
+
+        assert total == 60
+        assert sum(len(b) for b in collection.batches) == 60
+        assert collection.max_in_flight == 2
+
+    @pytest.mark.asyncio
+    async def test_failure_propagates(self, monkeypatch):
+        monkeypatch.setattr(mongo_loader, "INSERT_BATCH_SIZE", 10)
+        collection = FakeCollection(fail_on=1)
+        with pytest.raises(RuntimeError, match="write failed"):
+            await mongo_loader.insert_chunks(collection, [pd.DataFrame({"a": range(100)})], concurrency=3)
+        assert collection.in_flight == 0
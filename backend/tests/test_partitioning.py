@@ -0,0 +1,130 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pandas as pd
+import pytest
+
+from app.middleware.error_handler import ValidationError
+from app.services import partitioning, upload_service
+from app.services.llm_service import _format_schemas
+from app.services.partitioning import PartitionPlan
+from app.services.upload_service import sniff_chunks
+
+
+def _col(name: str, low: str, high: str, monotonic: bool = False, nullable: bool = True) -> dict:
+    return {
+        "name": name,
+        "dtype": "datetime",
+        "nullable": nullable,
+        "monotonic": monotonic,
+        "time_range": [low, high],
+    }
+
+
+@pytest.fixture(autouse=True)
+def _partition_large_loads(monkeypatch):
+    monkeypatch.setattr(partitioning.settings, "pg_partition_min_rows", 1000)
+
+
+class TestPlan:
+    def test_interval_from_the_span(self):
+        assert partitioning.plan([_col("ts", "2023-01-15", "2024-06-30")], 5000) == PartitionPlan("ts", "month")
+        assert partitioning.plan([_col("ts", "2024-01-01", "2024-03-01")], 5000) == PartitionPlan("ts", "week")
+
+    def test_small_or_narrow_loads_are_not_partitioned(self):
+        assert partitioning.plan([_col("ts", "2023-01-01", "2024-01-01")], 999) is None
+        assert partitioning.plan([_col("ts", "2024-01-02", "2024-01-05")], 5000) is None  # one week
+        assert partitioning.plan([{"name": "n", "dtype": "integer"}], 5000) is None
+
+    def test_prefers_an_event_time_without_gaps(self):
+        columns = [
+            _col("birthday", "1950-01-01", "2005-01-01", nullable=False),
+            _col("created", "2023-01-01", "2024-01-01", monotonic=True),
+            _col("updated", "2023-01-01", "2024-01-01", monotonic=True, nullable=False),
+        ]
+        assert partitioning.plan(columns, 5000).column == "updated"
+
+    def test_sniff_records_the_time_range_in_utc(self):
+        times = pd.to_datetime(["2024-03-01 10:00", "2024-01-01 01:00"]).tz_localize("Europe/Berlin")
+        column = sniff_chunks([pd.DataFrame({"ts": times})])["columns"][0]
+        assert [str(t) for t in column["time_range"]] == ["2024-01-01 00:00:00", "2024-03-01 09:00:00"]
+
+
+class TestDDL:
+    def test_partitioned_table_with_covering_and_default_partitions(self):
+        columns = [_col("ts", "2024-01-31 23:00", "2024-03-02"), {"name": "v", "dtype": "float"}]
+        statements = upload_service._create_table_statements("events", columns, PartitionPlan("ts", "month"))
+
+        assert "id BIGSERIAL NOT NULL," in statements[0]
+        assert statements[0].endswith('PARTITION BY RANGE ("ts")')
+        assert statements[1:] == [
+            'CREATE TABLE IF NOT EXISTS "events_p20240101" PARTITION OF "events" '
+            "FOR VALUES FROM ('2024-01-01') TO ('2024-02-01')",
+            'CREATE TABLE IF NOT EXISTS "events_p20240201" PARTITION OF "events" '
+            "FOR VALUES FROM ('2024-02-01') TO ('2024-03-01')",
+            'CREATE TABLE IF NOT EXISTS "events_p20240301" PARTITION OF "events" '
+            "FOR VALUES FROM ('2024-03-01') TO ('2024-04-01')",
+            'CREATE TABLE IF NOT EXISTS "events_default" PARTITION OF "events" DEFAULT',
+        ]
+
+    def test_weeks_start_on_monday(self):
+        statements = partitioning.partition_statements(
+            "t", PartitionPlan("ts", "week"), ["2024-01-03", "2024-01-08"]
+        )
+        assert [s.split("FOR VALUES ")[1] for s in statements] == [
+            "FROM ('2024-01-01') TO ('2024-01-08')",
+            "FROM ('2024-01-08') TO ('2024-01-15')",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_swap_renames_partitions_after_the_table(self):
+        session = AsyncMock()
+        session.execute.side_effect = [
+            [], MagicMock(), MagicMock(), MagicMock(), MagicMock(), MagicMock(),  # analyze, drop, renames
+            [("ev_stg_1_p20240101",), ("ev_stg_1_default",)],
+            MagicMock(), MagicMock(),
+        ]
+        await upload_service.swap_in_postgres(session, "ev_stg_1", "ev")
+        statements = [str(c.args[0]) for c in session.execute.await_args_list[-2:]]
+        assert statements == [
+            'ALTER TABLE "ev_stg_1_p20240101" RENAME TO "ev_p20240101"',
+            'ALTER TABLE "ev_stg_1_default" RENAME TO "ev_default"',
+        ]
+
+
+class TestAppend:
+    TARGET = [
+        {"name": "ts", "dtype": "datetime", "nullable": False, "sql_type": "DATE"},
+        {"name": "k", "dtype": "integer"},
+    ]
+
+    def test_upsert_keys_must_include_the_partition_column(self):
+        incoming = [
+            {"name": "ts", "dtype": "datetime", "nullable": False, "sql_type": "DATE"},
+            {"name": "k", "dtype": "integer", "nullable": False},
+        ]
+        with pytest.raises(ValidationError, match="must include 'ts'"):
+            upload_service.merge_schema("t", self.TARGET, incoming, "postgres", ["k"], "ts")
+        upload_service.merge_schema("t", self.TARGET, incoming, "postgres", ["k", "ts"], "ts")
+
+    def test_partition_column_cannot_widen(self):
+        incoming = [{"name": "ts", "dtype": "datetime", "nullable": False, "sql_type": None}]
+        with pytest.raises(ValidationError, match="cannot be widened from DATE to TIMESTAMP"):
+            upload_service.merge_schema("t", self.TARGET, incoming, "postgres", None, "ts")
+
+    @pytest.mark.asyncio
+    async def test_append_creates_the_partitions_it_needs(self, monkeypatch):
+        monkeypatch.setattr(upload_service, "_pg_load_method", AsyncMock(return_value=("copy", AsyncMock(return_value=0))))
+        session = AsyncMock()
+        columns = [_col("ts", "2024-05-10", "2024-05-20")]
+
+        await upload_service.append_postgres(session, [], "t", columns, partition=PartitionPlan("ts", "month"))
+
+        assert [str(c.args[0]) for c in session.execute.await_args_list] == [
+            'ALTER TABLE "t" ADD COLUMN IF NOT EXISTS "_row_hash" BIGINT NULL',
+            'CREATE TABLE IF NOT EXISTS "t_p20240501" PARTITION OF "t" '
+            "FOR VALUES FROM ('2024-05-01') TO ('2024-06-01')"
+        ]
+
+    def test_partitioning_reaches_the_llm_schema(self):
+        schema = {"name": "t", "db_type": "postgres", "columns": [], "partition": {"column": "ts", "interval": "month"}}
+        assert 'Partitioned by month on "ts"' in _format_schemas([schema])
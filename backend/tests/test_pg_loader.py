@@ -0,0 +1,149 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import pg_loader, upload_service
+
+
+def _session_with_driver(driver):
+    """Mock AsyncSession whose connection() exposes the given driver connection."""
+    raw = MagicMock()
+    raw.driver_connection = driver
+    conn = MagicMock()
+    conn.get_raw_connection = AsyncMock(return_value=raw)
+    session = AsyncMock()
+    session.connection = AsyncMock(return_value=conn)
+    return session
+
+
+def _writer_pool(monkeypatch, fail_on: int | None = None) -> list:
+    """Patch the writers' session factory; returns the sessions it hands out, in order.
+
+    Each COPY yields to the event loop, so a writer stays busy while more chunks queue.
+    """
+    sessions = []
+
+    async def copy(table, records, columns):
+        await asyncio.sleep(0.01)
+        if records[0][0] == fail_on:
+            raise RuntimeError("copy failed")
+
+    def factory():
+        driver = MagicMock()
+        driver.copy_records_to_table = AsyncMock(side_effect=copy)
+        session = _session_with_driver(driver)
+        session.__aenter__.return_value = session
+        session.driver = driver
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(pg_loader, "async_session", factory)
+    return sessions
+
+
+class TestChunkRecords:
+    def test_boxes_numpy_scalars_and_nulls(self):
+        df = pd.DataFrame({
+            "i": pd.array([1, None], dtype="Int64"),
+            "f": [1.5, np.nan],
+            "b": pd.array([True, None], dtype="boolean"),
+        })
+        records = pg_loader.chunk_records(df)
+        assert records == [(1, 1.5, True), (None, None, None)]
+        assert type(records[0][0]) is int
+        assert type(records[0][1]) is float
+
+    def test_stringifies_text_columns(self):
+        df = pd.DataFrame({"t": ["a", 5, {"k": 1}, None]})
+        records = pg_loader.chunk_records(df, text_columns=["t"])
+        assert [r[0] for r in records] == ["a", "5", '{"k": 1}', None]
+
+
+class TestLoaders:
+    @pytest.mark.asyncio
+    async def test_copy_streams_each_chunk(self):
+        driver = MagicMock()
+        driver.copy_records_to_table = AsyncMock()
+        session = _session_with_driver(driver)
+        chunks = [pd.DataFrame({"a": [1, 2]}), pd.DataFrame({"a": [3]})]
+
+        total = await pg_loader.copy_chunks(session, "t", ["a"], chunks)
+
+        assert total == 3
+        assert driver.copy_records_to_table.await_count == 2
+        call = driver.copy_records_to_table.await_args_list[1]
+        assert call.args == ("t",)
+        assert call.kwargs == {"records": [(3,)], "columns": ["a"]}
+
+    @pytest.mark.asyncio
+    async def test_supports_copy_false_without_asyncpg(self):
+        session = _session_with_driver(object())
+        assert await pg_loader.supports_copy(session) is False
+
+    @pytest.mark.asyncio
+    async def test_insert_fallback_batches(self, monkeypatch):
+        monkeypatch.setattr(pg_loader, "INSERT_BATCH_SIZE", 2)
+        session = AsyncMock()
+        chunks = [pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})]
+
+        total = await pg_loader.insert_chunks(session, "t", ["a", "b"], chunks)
+
+        assert total == 3
+        batches = [c.args[1] for c in session.execute.await_args_list]
+        assert batches == [
+            [{"p0": 1, "p1": "x"}, {"p0": 2, "p1": "y"}],
+            [{"p0": 3, "p1": "z"}],
+        ]
+
+
+class TestParallelCopy:
+    @pytest.mark.asyncio
+    async def test_busy_writers_open_more_connections_and_commit_together(self, monkeypatch):
+        sessions = _writer_pool(monkeypatch)
+        chunks = [pd.DataFrame({"a": [i, i]}) for i in range(8)]
+
+        total = await pg_loader.parallel_copy_chunks("t", ["a"], chunks, writers=3)
+
+        assert total == 16
+        assert len(sessions) == 3
+        copied = [c.kwargs["records"][0][0] for s in sessions for c in s.driver.copy_records_to_table.await_args_list]
+        assert sorted(copied) == list(range(8))
+        assert all(s.commit.await_count == 1 for s in sessions)
+
+    @pytest.mark.asyncio
+    async def test_small_load_stays_on_one_connection(self, monkeypatch):
+        sessions = _writer_pool(monkeypatch)
+        total = await pg_loader.parallel_copy_chunks("t", ["a"], [pd.DataFrame({"a": [1]})], writers=4)
+        assert total == 1
+        assert len(sessions) == 1
+
+    @pytest.mark.asyncio
+    async def test_one_failed_writer_rolls_back_all(self, monkeypatch):
+        sessions = _writer_pool(monkeypatch, fail_on=2)
+        chunks = [pd.DataFrame({"a": [i]}) for i in range(8)]
+
+        with pytest.raises(RuntimeError, match="copy failed"):
+            await pg_loader.parallel_copy_chunks("t", ["a"], chunks, writers=2)
+
+        assert len(sessions) == 2
+        assert not any(s.commit.await_count for s in sessions)
+        assert all(s.__aexit__.await_count == 1 for s in sessions)
+
+
+    @pytest.mark.asyncio
+    async def test_ingest_drops_the_table_when_a_writer_fails(self, monkeypatch):
+        monkeypatch.setattr(upload_service.settings, "pg_copy_writers", 4)
+        monkeypatch.setattr(upload_service, "_pg_load_method", AsyncMock(return_value=("copy", AsyncMock())))
+        monkeypatch.setattr(pg_loader, "parallel_copy_chunks", AsyncMock(side_effect=RuntimeError("copy failed")))
+        monkeypatch.setattr(upload_service, "_enum_types", AsyncMock(return_value={}))
+        session = AsyncMock()
+
+        with pytest.raises(RuntimeError):
+            await upload_service.ingest_postgres(session, [], "t", [{"name": "a", "dtype": "integer"}])
+
+        statements = [str(c.args[0]) for c in session.execute.await_args_list]
+        assert statements[-1] == 'DROP TABLE IF EXISTS "t" CASCADE'
+        assert session.commit.await_count == 2  # the table before the writers start, then its drop
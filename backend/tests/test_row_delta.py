@@ -0,0 +1,128 @@
+from collections import Counter
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pandas as pd
+import pytest
+
+from app.repositories import query_repo
+from app.services import row_delta, upload_service
+from app.services.row_delta import ROW_HASH_COLUMN
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def limit(self, n):
+        return _Cursor(self.docs[:n])
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeCollection:
+    """In-memory documents, with the calls a MongoDB load and delta make."""
+
+    def __init__(self):
+        self.docs: list[dict] = []
+        self.next_id = 0
+        self.indexes: list = []
+
+    async def create_index(self, keys, **kwargs):
+        self.indexes.append(keys)
+
+    async def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            self.next_id += 1
+            self.docs.append({"_id": self.next_id, **doc})
+        return SimpleNamespace(inserted_ids=[d["_id"] for d in self.docs[-len(docs):]])
+
+    def aggregate(self, pipeline, **kwargs):
+        counts = Counter(doc.get(ROW_HASH_COLUMN) for doc in self.docs)
+        return _Cursor([{"_id": h, "n": n} for h, n in counts.items()])
+
+    def _matches(self, doc, match):
+        (field, cond), = match.items()
+        return doc.get(field) in cond["$in"] if isinstance(cond, dict) else doc.get(field) == cond
+
+    def find(self, match, projection=None):
+        return _Cursor([doc for doc in self.docs if self._matches(doc, match)])
+
+    async def delete_many(self, match):
+        before = len(self.docs)
+        self.docs = [doc for doc in self.docs if not self._matches(doc, match)]
+        return SimpleNamespace(deleted_count=before - len(self.docs))
+
+    def rows(self) -> Counter:
+        return Counter((doc["k"], doc["v"]) for doc in self.docs)
+
+
+class TestRowHashes:
+    def test_stable_across_column_order_and_sensitive_to_values(self):
+        df = pd.DataFrame({"a": pd.array([1, 2], dtype="Int64"), "b": ["x", None]})
+        hashes = row_delta.row_hashes(df)
+        assert hashes.dtype == "int64"
+        assert list(row_delta.row_hashes(df[["b", "a"]])) == list(hashes)
+        assert row_delta.row_hashes(df.assign(b=["x", "y"]))[1] != hashes[1]
+
+    def test_user_column_cannot_take_the_hidden_name(self):
+        assert upload_service._sanitize_column_name("_row_hash") == "_row_hash_"
+
+
+class TestMongoDelta:
+    @pytest.fixture
+    def collection(self, monkeypatch):
+        fake = FakeCollection()
+        monkeypatch.setattr(upload_service, "get_mongodb", lambda: {"t": fake})
+        return fake
+
+    @pytest.mark.asyncio
+    async def test_only_changed_rows_are_written(self, collection):
+        old = pd.DataFrame({"k": [1, 2, 3, 3, 3], "v": ["a", "b", "c", "c", "c"]})
+        new = pd.DataFrame({"k": [1, 3, 4, 2, 3], "v": ["a", "c", "d", "B", "c"]})
+        await upload_service.ingest_mongodb([old], "t")
+
+        stats = await upload_service.delta_mongodb([new.iloc[:2], new.iloc[2:]], "t")
+
+        assert collection.rows() == Counter(zip(new["k"], new["v"]))
+        assert (stats.row_count, stats.rows_deleted, stats.rows_unchanged) == (2, 2, 3)
+        assert collection.indexes == [ROW_HASH_COLUMN]
+
+    @pytest.mark.asyncio
+    async def test_documents_without_hashes_are_replaced(self, collection):
+        collection.docs = [{"_id": 0, "k": 1, "v": "a"}]
+        stats = await upload_service.delta_mongodb([pd.DataFrame({"k": [1], "v": ["a"]})], "t")
+        assert (stats.row_count, stats.rows_deleted) == (1, 1)
+        assert all(ROW_HASH_COLUMN in doc for doc in collection.docs)
+
+
+class TestPostgresDelta:
+    @pytest.mark.asyncio
+    async def test_stages_then_deletes_and_inserts_in_one_transaction(self, monkeypatch):
+        loader = AsyncMock(return_value=10)
+        monkeypatch.setattr(upload_service, "_pg_load_method", AsyncMock(return_value=("copy", loader)))
+        session = AsyncMock()
+        session.execute.side_effect = [MagicMock(), MagicMock(), MagicMock(rowcount=3), MagicMock(rowcount=4)]
+        columns = [{"name": "k", "dtype": "integer"}]
+
+        stats = await upload_service.delta_postgres(session, [], "t", columns)
+
+        statements = [str(c.args[0]) for c in session.execute.await_args_list]
+        assert statements[1] == row_delta.stage_sql("t", ["k"])
+        assert statements[2:] == [row_delta.delete_sql("t"), row_delta.insert_sql("t", ["k"])]
+        assert loader.await_args.args[1:3] == (row_delta.DELTA_STAGE_TABLE, ["k", ROW_HASH_COLUMN])
+        assert (stats.row_count, stats.rows_deleted, stats.rows_unchanged) == (4, 3, 6)
+        session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_query_results_hide_the_row_hash(monkeypatch):
+    collection = MagicMock()
+    collection.aggregate.return_value.to_list = AsyncMock(return_value=[{"_id": 1, "k": 1, ROW_HASH_COLUMN: 5}])
+    monkeypatch.setattr(query_repo, "get_mongodb", lambda: {"t": collection})
+    assert await query_repo.execute_mongodb("t", []) == [{"_id": "1", "k": 1}]
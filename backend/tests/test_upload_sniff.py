@@ -1,30 +1,32 @@
+import datetime
+import io
 import json
 
 import pandas as pd
 import pytest
 
 from app.middleware.error_handler import ValidationError
+from app.services import json_stream
 from app.services.upload_service import (
-    _parse_json,
-    _unwrap_json_object,
-    _flatten_geojson,
-    sniff_data,
+    sniff_chunks,
     _sanitize_column_name,
     _clean_dataframe,
+    _conform_chunk,
 )
+from app.services.mongo_loader import chunk_documents
 
 
 # --- CSV-style sniff ---
 
-class TestSniffData:
+class TestSniffChunks:
     def test_basic_sniff(self):
-        """sniff_data produces correct schema for a simple DataFrame."""
+        """sniff_chunks produces correct schema for a simple DataFrame."""
         df = pd.DataFrame({
             "Name": ["Alice", "Bob", "Carol"],
             "Age": [30, 25, 35],
             "Score": [9.5, 8.0, 7.5],
         })
-        result = sniff_data(df)
+        result = sniff_chunks([df])
 
         assert result["row_count"] == 3
         assert result["recommended_db"] == "postgres"
@@ -36,25 +38,25 @@ class TestSniffData:
         assert "score" in col_names
 
     def test_sniff_detects_types(self):
-        """sniff_data detects integer, float, string types."""
+        """sniff_chunks detects integer, float, string types."""
         df = pd.DataFrame({"count": [1, 2], "price": [1.5, 2.5], "label": ["a", "b"]})
-        result = sniff_data(df)
+        result = sniff_chunks([df])
         types = {c["name"]: c["dtype"] for c in result["columns"]}
         assert types["count"] == "integer"
         assert types["price"] == "float"
         assert types["label"] == "string"
 
     def test_sniff_sample_rows(self):
-        """sniff_data returns sample rows capped at SNIFF_ROWS."""
+        """sniff_chunks returns sample rows capped at SNIFF_ROWS."""
         df = pd.DataFrame({"x": list(range(100))})
-        result = sniff_data(df)
+        result = sniff_chunks([df])
         assert len(result["sample_rows"]) == 5  # SNIFF_ROWS = 5
         assert result["row_count"] == 100
 
     def test_sniff_nullable(self):
-        """sniff_data detects nullable columns."""
+        """sniff_chunks detects nullable columns."""
         df = pd.DataFrame({"a": [1, None, 3], "b": [1, 2, 3]})
-        result = sniff_data(df)
+        result = sniff_chunks([df])
         cols = {c["name"]: c["nullable"] for c in result["columns"]}
         assert cols["a"] is True
         assert cols["b"] is False
@@ -62,23 +64,93 @@ class TestSniffData:
 
 # --- JSON parsing ---
 
+class TestDatetimeDetection:
+    def _columns(self, *chunks: pd.DataFrame) -> dict:
+        return {c["name"]: c for c in sniff_chunks(list(chunks))["columns"]}
+
+    def test_text_dates_become_datetimes(self):
+        columns = self._columns(pd.DataFrame({
+            "iso": ["2024-01-01T10:00:00Z", "2024-01-02 09:30:00.5+02:00", "2024-01-03"],
+            "day_first": ["31/01/2024", "01/02/2024", None],
+            "month_first": ["01/02/2024", "12/31/2024", "3/4/2024"],
+            "words": ["Mar", "Apr", "May"],  # a month name alone is not a date
+        }))
+        assert {name: (c["dtype"], c["datetime_format"]) for name, c in columns.items()} == {
+            "iso": ("datetime", "ISO8601"),
+            "day_first": ("datetime", "%d/%m/%Y"),
+            "month_first": ("datetime", "%m/%d/%Y"),
+            "words": ("string", None),
+        }
+        assert columns["iso"]["sample_values"][1] == pd.Timestamp("2024-01-02 07:30:00.5")  # offsets -> UTC
+        assert columns["day_first"]["sql_type"] == "DATE"
+
+    def test_later_chunks_use_the_first_format(self):
+        columns = self._columns(
+            pd.DataFrame({"d": ["01/02/2024", "03/04/2024"], "e": ["2024-01-01", "2024-01-02"]}),
+            pd.DataFrame({"d": ["13/02/2024", "14/04/2024"], "e": [None, None]}),
+        )
+        assert columns["d"]["dtype"] == "string"  # day 13 cannot be a month
+        assert (columns["e"]["dtype"], columns["e"]["datetime_format"]) == ("datetime", "ISO8601")
+
+    def test_mostly_unparseable_column_stays_text(self):
+        values = ["2024-01-01"] * 18 + ["unknown", "n/a"]
+        assert self._columns(pd.DataFrame({"d": values}))["d"]["dtype"] == "string"
+
+    def test_a_single_bad_or_out_of_range_date_keeps_every_value(self):
+        raw = pd.DataFrame({
+            "born": ["1873-03-14"] * 98 + ["1873-00-00", None],
+            "ruled": ["14/03/1873"] * 99 + ["01/01/1500"],  # beyond datetime64[ns]
+        })
+        columns = sniff_chunks([raw.copy()])["columns"]
+        assert [(c["dtype"], c["datetime_format"]) for c in columns] == [("string", None), ("string", None)]
+        df = _conform_chunk(raw.copy(), columns)
+        assert df["born"].tolist() == raw["born"].tolist()
+        assert df["ruled"].tolist() == raw["ruled"].tolist()
+
+    def test_conform_parses_with_the_sniffed_format(self):
+        raw = pd.DataFrame({"d": ["31/01/2024", "bad", None], "y": ["01/01/3000", "01/01/2000", None]})
+        columns = [
+            {"name": "d", "dtype": "datetime", "datetime_format": "%d/%m/%Y"},
+            {"name": "y", "dtype": "datetime", "datetime_format": "%d/%m/%Y"},
+        ]
+        df = _conform_chunk(raw.copy(), columns)
+        assert df["d"].tolist()[0] == pd.Timestamp("2024-01-31")
+        assert df["d"].isna().tolist() == [False, True, True]
+        assert df["y"].isna().tolist() == [True, False, True]  # beyond datetime64[ns] is null, not wrapped
+
+    def test_dates_written_to_a_text_column_keep_their_format(self):
+        conformed = pd.DataFrame({"d": pd.to_datetime(["2024-01-31", None])})
+        df = _conform_chunk(conformed, [{"name": "d", "dtype": "string", "datetime_format": "%d/%m/%Y"}])
+        assert df["d"].tolist() == ["31/01/2024", None]
+
+    def test_mongodb_gets_dates_not_strings(self):
+        columns = [{"name": "d", "dtype": "datetime", "datetime_format": "ISO8601"}]
+        df = _conform_chunk(pd.DataFrame({"d": ["2024-01-31"]}), columns)
+        assert isinstance(chunk_documents(df)[0]["d"], datetime.datetime)
+
+
+def _records(data) -> list:
+    raw = data if isinstance(data, bytes) else json.dumps(data).encode()
+    return list(json_stream.JsonRecordStream(io.BytesIO(raw)))
+
+
 class TestParseJson:
     def test_plain_array(self):
         """A top-level array of objects is parsed directly."""
         data = [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}]
-        df = _parse_json(json.dumps(data).encode())
+        df = pd.json_normalize(_records(data))
         assert len(df) == 2
         assert list(df.columns) == ["a", "b"]
 
     def test_empty_array_raises(self):
         """An empty array raises ValidationError."""
         with pytest.raises(ValidationError, match="no records"):
-            _parse_json(b"[]")
+            _records(b"[]")
 
     def test_scalar_raises(self):
         """A bare scalar JSON value raises ValidationError."""
         with pytest.raises(ValidationError):
-            _parse_json(b'"just a string"')
+            _records(b'"just a string"')
 
 
 # --- Unwrap JSON object ---
@@ -87,33 +159,31 @@ class TestUnwrapJsonObject:
     def test_well_known_key_data(self):
         """Unwraps via well-known 'data' key."""
         obj = {"data": [{"id": 1}, {"id": 2}], "meta": "ignored"}
-        assert _unwrap_json_object(obj) == [{"id": 1}, {"id": 2}]
+        assert _records(obj) == [{"id": 1}, {"id": 2}]
 
     def test_well_known_key_results(self):
         """Unwraps via well-known 'results' key."""
         obj = {"results": [{"x": 10}]}
-        assert _unwrap_json_object(obj) == [{"x": 10}]
+        assert _records(obj) == [{"x": 10}]
 
     def test_well_known_key_features(self):
-        """Unwraps via well-known 'features' key (GeoJSON)."""
-        obj = {"type": "FeatureCollection", "features": [{"type": "Feature"}]}
-        assert _unwrap_json_object(obj) == [{"type": "Feature"}]
+        """Picks the 'features' key of a FeatureCollection."""
+        assert json_stream.records_key({"type": (False, False), "features": (True, True)}) == "features"
 
     def test_auto_detect_single_array(self):
         """When no well-known key matches, detects the single array-of-dicts field."""
         obj = {"myCustomData": [{"a": 1}, {"a": 2}], "version": "1.0"}
-        assert _unwrap_json_object(obj) == [{"a": 1}, {"a": 2}]
+        assert _records(obj) == [{"a": 1}, {"a": 2}]
 
     def test_fallback_single_record(self):
         """When no array field found, wraps the whole object as one record."""
         obj = {"name": "solo", "value": 42}
-        assert _unwrap_json_object(obj) == [{"name": "solo", "value": 42}]
+        assert _records(obj) == [{"name": "solo", "value": 42}]
 
     def test_ambiguous_multiple_arrays(self):
         """When multiple array fields exist and none are well-known, fallback to single record."""
         obj = {"arr1": [{"a": 1}], "arr2": [{"b": 2}]}
-        result = _unwrap_json_object(obj)
-        assert result == [obj]
+        assert _records(obj) == [obj]
 
 
 # --- GeoJSON flattening ---
@@ -133,7 +203,7 @@ class TestFlattenGeojson:
                 "geometry": {"type": "Point", "coordinates": [3.0, 4.0]},
             },
         ]
-        result = _flatten_geojson(features)
+        result = _records({"type": "FeatureCollection", "features": features})
         assert len(result) == 2
         assert result[0]["name"] == "Point A"
         assert result[0]["geometry_type"] == "Point"
@@ -146,11 +216,8 @@ class TestFlattenGeojson:
     def test_non_geojson_passthrough(self):
         """Non-GeoJSON items are returned unchanged."""
         items = [{"a": 1}, {"a": 2}]
-        assert _flatten_geojson(items) is items
-
-    def test_empty_list(self):
-        """Empty list passes through."""
-        assert _flatten_geojson([]) == []
+        assert not json_stream.is_geojson_feature(items[0])
+        assert _records(items) == items
 
 
 # --- Helpers ---
@@ -181,3 +248,31 @@ class TestCleanDataframe:
         df = pd.DataFrame({"text": ["abc", "def", "ghi"]})
         cleaned = _clean_dataframe(df.copy())
         assert cleaned["text"].dtype == object
+
+    def test_strip_leaves_non_strings_untouched(self):
+        df = pd.DataFrame({"mixed": [" a ", 5, None, [1, 2]]})
+        cleaned = _clean_dataframe(df.copy())
+        assert cleaned["mixed"].tolist()[:2] == ["a", 5]
+        assert cleaned["mixed"].iloc[3] == [1, 2]
+
+    def test_mostly_text_column_not_coerced(self):
+        df = pd.DataFrame({"code": ["A1", "B2", "7", "C3", "D4"]})
+        cleaned = _clean_dataframe(df.copy())
+        assert cleaned["code"].tolist() == ["A1", "B2", "7", "C3", "D4"]
+
+    def test_numeric_strings_with_nulls_become_float(self):
+        df = pd.DataFrame({"n": ["1", None, "3"]})
+        cleaned = _clean_dataframe(df.copy())
+        assert cleaned["n"].dtype.kind == "f"
+        assert cleaned["n"].iloc[2] == 3.0
+
+    def test_sample_decides_before_full_conversion(self, monkeypatch):
+        """A text column is rejected from the sample without converting the whole column."""
+        from app.services import upload_service
+
+        calls = []
+        real = upload_service._to_numeric
+        monkeypatch.setattr(upload_service, "_to_numeric", lambda s: calls.append(len(s)) or real(s))
+        df = pd.DataFrame({"word": ["alpha", "beta"] * 5000})
+        _clean_dataframe(df)
+        assert calls == []
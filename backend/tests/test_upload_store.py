@@ -0,0 +1,96 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from app.config import settings
+from app.services import upload_store
+from app.services.upload_service import _conform_chunk, sniff_chunks
+
+
+@pytest.fixture(autouse=True)
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "upload_store_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "upload_token_ttl_minutes", 30)
+    monkeypatch.setattr(settings, "upload_store_max_mb", 100)
+    return tmp_path
+
+
+def _save(df: pd.DataFrame, owner: str = "u1") -> str:
+    sniff = sniff_chunks([df.copy()])
+    chunk = _conform_chunk(df.copy(), sniff["columns"])
+    return upload_store.save(owner, "data.csv", sniff, [chunk])
+
+
+class TestRoundTrip:
+    def test_data_and_types_survive(self):
+        df = pd.DataFrame({
+            "n": [1, 2, None],
+            "i": [1, 2, 3],
+            "s": ["a", None, "c"],
+            "when": pd.to_datetime(["2024-01-01", "2024-02-01", None]),
+            "tags": [["x", "y"], None, {"k": 1}],
+        })
+        token = _save(df)
+        stored = upload_store.get(token, "u1")
+        assert stored.filename == "data.csv"
+        types = {c["name"]: c["dtype"] for c in stored.sniff_result["columns"]}
+        assert types["tags"] == "object"
+
+        out = pd.concat(list(upload_store.iter_chunks(stored)), ignore_index=True)
+        assert out["i"].tolist() == [1, 2, 3]
+        assert out["n"].isna().tolist() == [False, False, True]
+        assert out["s"].tolist() == ["a", None, "c"]
+        assert out["when"].iloc[1] == pd.Timestamp("2024-02-01")
+        assert out["tags"].tolist() == [["x", "y"], None, {"k": 1}]
+
+    def test_chunks_come_back_as_written(self):
+        df = pd.DataFrame({"a": range(10)})
+        sniff = sniff_chunks([df.copy()])
+        chunks = [_conform_chunk(df.iloc[i : i + 4].copy(), sniff["columns"]) for i in (0, 4, 8)]
+        token = upload_store.save("u1", "a.csv", sniff, chunks)
+        sizes = [len(c) for c in upload_store.iter_chunks(upload_store.get(token, "u1"))]
+        assert sizes == [4, 4, 2]
+
+
+class TestAccess:
+    def test_other_owner_cannot_read(self):
+        token = _save(pd.DataFrame({"a": [1]}))
+        assert upload_store.get(token, "someone-else") is None
+
+    def test_malformed_token_rejected(self):
+        assert upload_store.get("../../etc/passwd", "u1") is None
+
+    def test_discard(self):
+        token = _save(pd.DataFrame({"a": [1]}))
+        upload_store.discard(token)
+        assert upload_store.get(token, "u1") is None
+
+
+class TestEviction:
+    def test_expired_entries_are_not_served(self, monkeypatch):
+        token = _save(pd.DataFrame({"a": [1]}))
+        future = time.time() + 31 * 60
+        monkeypatch.setattr(upload_store.time, "time", lambda: future)
+        assert upload_store.get(token, "u1") is None
+        upload_store.evict()
+        assert not os.path.exists(upload_store._data_path(token))
+
+    def test_oldest_evicted_over_budget(self, monkeypatch):
+        monkeypatch.setattr(settings, "upload_store_max_mb", 0)
+        first = _save(pd.DataFrame({"a": [1]}))
+        second = _save(pd.DataFrame({"a": [2]}))
+        assert upload_store.get(first, "u1") is None
+        assert upload_store.get(second, "u1") is not None
+
+    def test_pinned_entries_outlive_the_ttl_and_the_budget(self, monkeypatch):
+        monkeypatch.setattr(settings, "upload_store_max_mb", 0)
+        pinned = _save(pd.DataFrame({"a": [1]}))
+        upload_store.pin([pinned], 60)
+        _save(pd.DataFrame({"a": [2]}))
+        assert upload_store.get(pinned, "u1") is not None
+
+        later = time.time() + 31 * 60
+        monkeypatch.setattr(upload_store.time, "time", lambda: later)
+        assert upload_store.get(pinned, "u1") is None  # the pin lapsed without a renewal
@@ -0,0 +1,219 @@
+import datetime
+import io
+import os
+
+import pandas as pd
+import pytest
+from fastapi import UploadFile
+
+from app.middleware.error_handler import ValidationError
+from app.services import upload_service
+from app.services.upload_service import (
+    _conform_chunk,
+    iter_chunks,
+    sniff_chunks,
+    sniff_upload,
+    spooled_upload,
+)
+
+
+def _upload(content: bytes, filename: str) -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+
+CSV = b"name,age,score\nAlice,30,9.5\nBob,25,\nCarol,35,7.5\nDan,41,6.0\nEve,22,8.0\n"
+
+
+# --- Spooling ---
+
+class TestSpooledUpload:
+    @pytest.mark.asyncio
+    async def test_spools_to_disk_and_cleans_up(self):
+        """The upload is copied to a temp file that is removed on exit."""
+        async with spooled_upload(_upload(CSV, "people.csv")) as spool:
+            assert spool.ext == "csv"
+            assert spool.size == len(CSV)
+            with open(spool.path, "rb") as f:
+                assert f.read() == CSV
+            path = spool.path
+        assert not os.path.exists(path)
+
+    @pytest.mark.asyncio
+    async def test_content_hash_survives_into_the_upload_store(self, tmp_path, monkeypatch):
+        """The bytes are hashed while spooled, so identical files get the same hash without a re-read."""
+        import hashlib
+
+        from app.config import settings
+        from app.services import upload_store
+
+        monkeypatch.setattr(settings, "upload_store_dir", str(tmp_path))
+        monkeypatch.setattr(upload_service, "SPOOL_READ_BYTES", 16)
+        async with spooled_upload(_upload(CSV, "people.csv")) as spool:
+            assert spool.content_hash == hashlib.sha256(CSV).hexdigest()
+            token = upload_service.sniff_and_store(spool, "u1", sample=True)["upload_token"]
+        assert upload_store.get(token, "u1").content_hash == hashlib.sha256(CSV).hexdigest()
+
+    @pytest.mark.asyncio
+    async def test_size_limit_enforced_while_streaming(self, monkeypatch):
+        """Files over the cap are rejected and the partial spool is removed."""
+        monkeypatch.setattr(upload_service, "MAX_FILE_SIZE_MB", 1)
+        monkeypatch.setattr(upload_service, "SPOOL_READ_BYTES", 64 * 1024)
+        content = b"x" * (1024 * 1024 + 1)
+        with pytest.raises(ValidationError, match="exceeds"):
+            async with spooled_upload(_upload(content, "big.csv")):
+                pass
+
+    @pytest.mark.asyncio
+    async def test_unsupported_extension(self):
+        with pytest.raises(ValidationError, match="Unsupported"):
+            async with spooled_upload(_upload(b"abc", "notes.txt")):
+                pass
+
+
+# --- Chunked parse + sniff ---
+
+class TestChunkedSniff:
+    @pytest.mark.asyncio
+    async def test_csv_read_in_chunks(self):
+        """CSV is yielded as DataFrames of at most chunk_rows rows."""
+        async with spooled_upload(_upload(CSV, "people.csv")) as spool:
+            sizes = [len(c) for c in iter_chunks(spool, chunk_rows=2)]
+        assert sizes == [2, 2, 1]
+
+    @pytest.mark.asyncio
+    async def test_sniff_upload_matches_whole_file(self):
+        """Chunked sniff reports the full row count and schema."""
+        async with spooled_upload(_upload(CSV, "people.csv")) as spool:
+            result = sniff_upload(spool)
+        types = {c["name"]: c["dtype"] for c in result["columns"]}
+        nulls = {c["name"]: c["nullable"] for c in result["columns"]}
+        assert result["row_count"] == 5
+        assert types == {"name": "string", "age": "integer", "score": "float"}
+        assert nulls["score"] is True
+        assert nulls["age"] is False
+        assert len(result["sample_rows"]) == 5
+
+    @pytest.mark.asyncio
+    async def test_confirm_parses_a_raw_upload_once(self, tmp_path, monkeypatch):
+        """The exact pass spills its chunks, and the load conforms those instead of parsing again."""
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "upload_store_dir", str(tmp_path))
+        monkeypatch.setattr(settings, "cpu_pool_kind", "thread")
+        parses = []
+        read = upload_service.iter_chunks
+
+        def counted(spool, chunk_rows=2, **kwargs):
+            parses.append(spool.path)
+            return read(spool, 2, **kwargs)
+
+        content = b"n,when\n1,31/01/2024\n2,01/02/2024\n3,02/02/2024\n4.5,someday\n5,\n"
+        async with spooled_upload(_upload(content, "t.csv")) as spool:
+            token = upload_service.sniff_and_store(spool, "u1", sample=True)["upload_token"]
+        monkeypatch.setattr(upload_service, "iter_chunks", counted)
+        async with upload_service.upload_source("u1", upload_token=token, discard=False) as source:
+            df = pd.concat(list(source.chunks), ignore_index=True)
+
+        assert len(parses) == 1
+        assert [(c["name"], c["dtype"]) for c in source.sniff_result["columns"]] == [
+            ("n", "float"), ("when", "string")
+        ]
+        assert df["n"].tolist() == [1, 2, 3, 4.5, 5]
+        assert df["when"].tolist() == ["31/01/2024", "01/02/2024", "02/02/2024", "someday", None]
+
+    def test_spill_reads_back_chunks_as_parsed(self, tmp_path):
+        """Chunks of different shapes come back from the spill with the same values and dtypes."""
+        chunks = [
+            pd.DataFrame({
+                "n": pd.Series([1, None], dtype=object),
+                "mixed": pd.Series([1, "x"], dtype=object),
+                "nested": pd.Series([{"a": 1}, [1, 2]], dtype=object),
+                "when": pd.Series([datetime.datetime(2024, 1, 31), None], dtype=object),
+                "count": pd.array([1, None], dtype="Int64"),
+            }),
+            pd.DataFrame({"late": ["a", None, "c"]}),
+        ]
+        spill = str(tmp_path / "spill")
+        list(upload_service._spilled(chunks, spill))
+
+        for original, spilled in zip(chunks, upload_service._iter_spilled(spill), strict=True):
+            pd.testing.assert_frame_equal(spilled, original)
+
+    def test_dtypes_widen_across_chunks(self):
+        """integer + float widens to float; a numeric + string mix widens to string."""
+        chunks = [
+            pd.DataFrame({"a": [1, 2], "b": [1, 2]}),
+            pd.DataFrame({"a": [1.5, 2.5], "b": ["x", "y"]}),
+        ]
+        types = {c["name"]: c["dtype"] for c in sniff_chunks(chunks)["columns"]}
+        assert types == {"a": "float", "b": "string"}
+
+    def test_column_missing_from_a_chunk_is_nullable(self):
+        chunks = [
+            pd.DataFrame({"a": [1], "b": [2]}),
+            pd.DataFrame({"a": [3]}),
+            pd.DataFrame({"a": [4], "c": ["late"]}),
+        ]
+        nulls = {c["name"]: c["nullable"] for c in sniff_chunks(chunks)["columns"]}
+        assert nulls == {"a": False, "b": True, "c": True}
+
+
+# --- Conforming chunks to the schema ---
+
+class TestConformChunk:
+    def test_casts_to_schema_and_fills_missing_columns(self):
+        columns = [
+            {"name": "a", "dtype": "integer"},
+            {"name": "b", "dtype": "string"},
+            {"name": "c", "dtype": "float"},
+        ]
+        df = _conform_chunk(pd.DataFrame({"A": [" 1 ", "2"], "b": [10, 20]}), columns)
+        assert list(df.columns) == ["a", "b", "c"]
+        assert df["a"].tolist() == [1, 2]
+        assert df["b"].tolist() == ["10", "20"]
+        assert df["c"].isna().all()
+
+
+# --- Sampled (fast) sniff ---
+
+class TestSniffSample:
+    @pytest.mark.asyncio
+    async def test_small_file_is_exact(self):
+        async with spooled_upload(_upload(CSV, "people.csv")) as spool:
+            result = upload_service.sniff_sample(spool, rows=100)
+        assert result["row_count"] == 5
+        assert result["confidence"] == "exact"
+
+    @pytest.mark.asyncio
+    async def test_large_csv_row_count_estimated(self):
+        body = b"".join(b"%05d,name%d,%05d.5\n" % (i, i % 7, i) for i in range(20_000))
+        content = b"id,label,value\n" + body
+        async with spooled_upload(_upload(content, "big.csv")) as spool:
+            result = upload_service.sniff_sample(spool, rows=500)
+        assert result["confidence"] == "sampled"
+        assert 18_000 <= result["row_count"] <= 22_000
+        types = {c["name"]: c["dtype"] for c in result["columns"]}
+        assert types == {"id": "integer", "label": "string", "value": "float"}
+
+    @pytest.mark.asyncio
+    async def test_json_sample_normalizes_only_prefix(self):
+        records = b"[" + b",".join(b'{"a": %d, "b": {"c": 1}}' % i for i in range(50)) + b"]"
+        async with spooled_upload(_upload(records, "data.json")) as spool:
+            result = upload_service.sniff_sample(spool, rows=10)
+        assert 45 <= result["row_count"] <= 55  # extrapolated from the bytes the prefix took up
+        assert result["confidence"] == "sampled"
+        assert result["recommended_db"] == "mongodb"
+
+    @pytest.mark.asyncio
+    async def test_fast_sniff_keeps_raw_file_for_confirm(self, tmp_path, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "upload_store_dir", str(tmp_path))
+        async with spooled_upload(_upload(CSV, "people.csv")) as spool:
+            result = upload_service.sniff_and_store(spool, "u1", sample=True)
+
+        async with upload_service.upload_source("u1", upload_token=result["upload_token"]) as source:
+            rows = sum(len(c) for c in source.chunks)
+        assert rows == 5
+        assert source.sniff_result["confidence"] == "exact"
+        assert list(tmp_path.iterdir()) == []
@@ -35,11 +35,26 @@ export interface InviteCodeDetail {
 }
 
 // Upload
+export interface ColumnProfile {
+  rows: number;
+  null_fraction: number;
+  distinct_estimate: number | null;
+  min: unknown;
+  max: unknown;
+  quantiles: Record<string, unknown>;
+  top_values: { value: unknown; count: number }[];
+}
+
 export interface ColumnInfo {
   name: string;
   dtype: string;
   nullable: boolean;
   sample_values: unknown[];
+  time_range?: [string, string] | null;
+  sql_type?: string | null;
+  enum_values?: string[] | null;
+  json_paths?: string[] | null;
+  profile?: ColumnProfile | null;
 }
 
 export interface SniffResult {
@@ -48,6 +63,9 @@ export interface SniffResult {
   row_count: number;
   recommended_db: 'postgres' | 'mongodb';
   recommendation_reason: string;
+  confidence: 'exact' | 'sampled';
+  upload_token?: string | null;
+  sheets: string[];
 }
 
 export interface UploadResponse {
@@ -56,6 +74,50 @@ export interface UploadResponse {
   row_count: number;
   column_count: number;
   message: string;
+  rows_updated: number;
+  rows_deleted: number;
+  rows_unchanged: number;
+  load_method: string;
+  rows_per_sec: number;
+  peak_memory_mb: number;
+  storage_saved_mb: number;
+}
+
+export interface IngestJob {
+  job_id: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled';
+  collection_name: string;
+  db_type: string;
+  filename: string;
+  sheet: string | null;
+  batch_id?: string | null;
+  mode: 'create' | 'overwrite' | 'append' | 'upsert' | 'delta';
+  rows_written: number;
+  total_rows: number;
+  bytes_processed: number;
+  total_bytes: number;
+  rows_per_sec: number;
+  eta_seconds: number | null;
+  attempts: number;
+  error: string;
+  result: UploadResponse | null;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+}
+
+export interface ConfirmResponse {
+  jobs: IngestJob[];
+}
+
+export interface BatchResponse {
+  batch_id: string;
+  status: 'running' | 'succeeded' | 'partial' | 'failed';
+  files: number;
+  succeeded: number;
+  rows_written: number;
+  total_rows: number;
+  jobs: IngestJob[];
 }
 
 // Collections
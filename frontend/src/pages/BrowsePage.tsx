@@ -1,10 +1,19 @@
 import { useState, useEffect } from 'react';
 import { api } from '../api/client';
 import { ApiError } from '../api/client';
-import type { CollectionSummary, CollectionDetail } from '../api/types';
+import type { CollectionSummary, CollectionDetail, ColumnProfile } from '../api/types';
 import TrashIcon from '../components/icons/TrashIcon';
 import './BrowsePage.css';
 
+function formatProfile(profile: ColumnProfile): string {
+  const parts = [];
+  if (profile.distinct_estimate !== null) parts.push(`~${profile.distinct_estimate.toLocaleString()} distinct`);
+  parts.push(`${(profile.null_fraction * 100).toFixed(1)}% null`);
+  if (profile.min !== null) parts.push(`${String(profile.min)} – ${String(profile.max)}`);
+  if (profile.top_values.length) parts.push(`top: ${profile.top_values.map((t) => String(t.value)).join(', ')}`);
+  return parts.join(' · ');
+}
+
 export default function BrowsePage() {
   const [collections, setCollections] = useState<CollectionSummary[]>([]);
   const [loading, setLoading] = useState(true);
@@ -198,6 +207,7 @@ export default function BrowsePage() {
                                 <th>Type</th>
                                 <th>Nullable</th>
                                 <th>Sample Values</th>
+                                <th>Profile</th>
                               </tr>
                             </thead>
                             <tbody>
@@ -207,6 +217,7 @@ export default function BrowsePage() {
                                   <td><span className="type-badge">{col.dtype}</span></td>
                                   <td>{col.nullable ? 'Yes' : 'No'}</td>
                                   <td className="col-samples">{col.sample_values.map(String).join(', ')}</td>
+                                  <td className="col-samples">{col.profile ? formatProfile(col.profile) : ''}</td>
                                 </tr>
                               ))}
                             </tbody>
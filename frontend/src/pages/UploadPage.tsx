@@ -1,23 +1,45 @@
 import { useState, useCallback, useRef, useEffect, type DragEvent, type ChangeEvent } from 'react';
 import { api } from '../api/client';
 import { ApiError } from '../api/client';
-import type { SniffResult, UploadResponse, CollectionSummary } from '../api/types';
+import type { SniffResult, UploadResponse, IngestJob, ConfirmResponse, CollectionSummary } from '../api/types';
 import './UploadPage.css';
 
-const ACCEPTED_EXTENSIONS = ['.csv', '.tsv', '.xlsx', '.xls', '.json'];
+const ACCEPTED_EXTENSIONS = [
+  '.csv', '.tsv', '.xlsx', '.xls', '.json', '.jsonl', '.ndjson', '.parquet', '.arrow', '.feather', '.ipc',
+];
 
 type Step = 'idle' | 'sniffing' | 'preview' | 'uploading' | 'done';
 
+// What to do when the collection already exists
+type WriteMode = 'create' | 'overwrite' | 'append' | 'upsert' | 'delta';
+
+const WRITE_MODE_LABELS: Record<WriteMode, string> = {
+  create: 'Upload to',
+  overwrite: 'Replace',
+  append: 'Append to',
+  upsert: 'Upsert into',
+  delta: 'Sync changes into',
+};
+
+const JOB_POLL_MS = 1000;
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const isActive = (job: IngestJob) => job.status === 'queued' || job.status === 'running';
+
 export default function UploadPage() {
   const [step, setStep] = useState<Step>('idle');
   const [file, setFile] = useState<File | null>(null);
   const [sniffResult, setSniffResult] = useState<SniffResult | null>(null);
   const [dbType, setDbType] = useState<'postgres' | 'mongodb'>('postgres');
   const [collectionName, setCollectionName] = useState('');
-  const [overwrite, setOverwrite] = useState(false);
+  const [writeMode, setWriteMode] = useState<WriteMode>('create');
+  const [keyColumns, setKeyColumns] = useState<string[]>([]);
   const [isPublic, setIsPublic] = useState(false);
   const [existingCollections, setExistingCollections] = useState<string[]>([]);
-  const [uploadResult, setUploadResult] = useState<UploadResponse | null>(null);
+  const [selectedSheets, setSelectedSheets] = useState<string[]>([]);
+  const [uploadResults, setUploadResults] = useState<UploadResponse[]>([]);
+  const [jobs, setJobs] = useState<IngestJob[]>([]);
   const [error, setError] = useState('');
   const [dragOver, setDragOver] = useState(false);
   const fileInputRef = useRef<HTMLInputElement>(null);
@@ -29,6 +51,7 @@ export default function UploadPage() {
   }, []);
 
   const nameConflict = existingCollections.includes(collectionName);
+  const mode: WriteMode = nameConflict ? writeMode : 'create';
 
   const reset = () => {
     setStep('idle');
@@ -36,9 +59,12 @@ export default function UploadPage() {
     setSniffResult(null);
     setDbType('postgres');
     setCollectionName('');
-    setOverwrite(false);
+    setWriteMode('create');
+    setKeyColumns([]);
     setIsPublic(false);
-    setUploadResult(null);
+    setSelectedSheets([]);
+    setUploadResults([]);
+    setJobs([]);
     setError('');
     // Refresh collections list for next upload
     api.get<CollectionSummary[]>('/api/collections/').then(
@@ -69,6 +95,7 @@ export default function UploadPage() {
       const result = await api.postForm<SniffResult>('/api/upload/sniff', formData);
       setSniffResult(result);
       setDbType(result.recommended_db);
+      setSelectedSheets(result.sheets.slice(0, 1));
       // Auto-generate collection name from filename
       const baseName = f.name.replace(/\.[^.]+$/, '').toLowerCase().replace(/[^a-z0-9]/g, '_');
       setCollectionName(baseName.startsWith('_') ? `data${baseName}` : baseName);
@@ -97,22 +124,57 @@ export default function UploadPage() {
     setStep('uploading');
 
     const formData = new FormData();
-    formData.append('file', file);
+    // The sniff already parsed and stored the file; only fall back to re-sending it
+    if (sniffResult.upload_token) {
+      formData.append('upload_token', sniffResult.upload_token);
+    } else {
+      formData.append('file', file);
+    }
     formData.append('collection_name', collectionName);
     formData.append('db_type', dbType);
-    formData.append('overwrite', overwrite ? 'true' : 'false');
+    formData.append('mode', mode);
+    if (mode === 'upsert') formData.append('key_columns', keyColumns.join(','));
     formData.append('is_public', isPublic ? 'true' : 'false');
+    // Several sheets become one collection each, named <collection>_<sheet>
+    selectedSheets.forEach((sheet) => formData.append('sheets', sheet));
 
     try {
-      const result = await api.postForm<UploadResponse>('/api/upload/confirm', formData);
-      setUploadResult(result);
-      setStep('done');
+      let current = (await api.postForm<ConfirmResponse>('/api/upload/confirm', formData)).jobs;
+      setJobs(current);
+      while (current.some(isActive)) {
+        await sleep(JOB_POLL_MS);
+        current = await Promise.all(
+          current.map((j) => (isActive(j) ? api.get<IngestJob>(`/api/upload/jobs/${j.job_id}`) : j))
+        );
+        setJobs(current);
+      }
+      const failed = current.find((j) => j.status !== 'succeeded' || !j.result);
+      if (!failed) {
+        setUploadResults(current.map((j) => j.result!));
+        setStep('done');
+      } else {
+        setError(failed.status === 'cancelled' ? 'Upload cancelled' : failed.error || 'Upload failed');
+        setStep('preview');
+      }
     } catch (err) {
       setError(err instanceof ApiError ? err.message : 'Upload failed');
       setStep('preview');
     }
   };
 
+  const handleCancelJobs = async () => {
+    // The poll loop reports the final states
+    await Promise.allSettled(
+      jobs.filter(isActive).map((j) => api.post<IngestJob>(`/api/upload/jobs/${j.job_id}/cancel`, {}))
+    );
+  };
+
+  const toggleSheet = (sheet: string, checked: boolean) => {
+    setSelectedSheets((prev) =>
+      sniffResult!.sheets.filter((s) => (s === sheet ? checked : prev.includes(s)))
+    );
+  };
+
   return (
     <div className="upload-page">
       <h2 className="upload-title">Upload Data</h2>
@@ -152,7 +214,7 @@ export default function UploadPage() {
           <div className="preview-header">
             <h3>{file?.name}</h3>
             <span className="preview-meta">
-              {sniffResult.row_count} rows, {sniffResult.columns.length} columns
+              {sniffResult.confidence === 'sampled' ? '~' : ''}{sniffResult.row_count} rows, {sniffResult.columns.length} columns
             </span>
           </div>
 
@@ -211,6 +273,27 @@ export default function UploadPage() {
           </div>
 
           <div className="upload-config">
+            {sniffResult.sheets.length > 1 && (
+              <div className="config-field">
+                <span>Sheets</span>
+                <div className="sheet-list">
+                  {sniffResult.sheets.map((sheet) => (
+                    <label key={sheet} className="public-toggle">
+                      <input
+                        type="checkbox"
+                        checked={selectedSheets.includes(sheet)}
+                        onChange={(e) => toggleSheet(sheet, e.target.checked)}
+                      />
+                      <span>{sheet}</span>
+                    </label>
+                  ))}
+                </div>
+                <span className="config-hint">
+                  Preview shows the first sheet; several sheets load in parallel into collection_sheet
+                </span>
+              </div>
+            )}
+
             <label className="config-field">
               <span>Collection Name</span>
               <input
@@ -262,13 +345,34 @@ export default function UploadPage() {
                 Collection <strong>{collectionName}</strong> already exists.
               </div>
               <label className="overwrite-toggle">
-                <input
-                  type="checkbox"
-                  checked={overwrite}
-                  onChange={(e) => setOverwrite(e.target.checked)}
-                />
-                <span>Overwrite existing data</span>
+                <span>Existing data:</span>
+                <select
+                  className="config-input"
+                  value={writeMode}
+                  onChange={(e) => setWriteMode(e.target.value as WriteMode)}
+                >
+                  <option value="create">Keep (choose a new name)</option>
+                  <option value="overwrite">Overwrite it</option>
+                  <option value="append">Append these rows</option>
+                  <option value="upsert">Upsert rows by key</option>
+                  <option value="delta">Replace it, writing only changed rows</option>
+                </select>
               </label>
+              {writeMode === 'upsert' && (
+                <label className="overwrite-toggle">
+                  <span>Key columns:</span>
+                  <select
+                    multiple
+                    className="config-input"
+                    value={keyColumns}
+                    onChange={(e) => setKeyColumns(Array.from(e.target.selectedOptions, (o) => o.value))}
+                  >
+                    {sniffResult.columns.map((col) => (
+                      <option key={col.name} value={col.name}>{col.name}</option>
+                    ))}
+                  </select>
+                </label>
+              )}
             </div>
           )}
 
@@ -277,9 +381,14 @@ export default function UploadPage() {
             <button
               className="btn-primary"
               onClick={handleConfirm}
-              disabled={!collectionName.match(/^[a-z][a-z0-9_]*$/) || (nameConflict && !overwrite)}
+              disabled={
+                !collectionName.match(/^[a-z][a-z0-9_]*$/)
+                || (nameConflict && writeMode === 'create')
+                || (mode === 'upsert' && keyColumns.length === 0)
+                || (sniffResult.sheets.length > 1 && selectedSheets.length === 0)
+              }
             >
-              {nameConflict && overwrite ? 'Replace' : 'Upload to'} {dbType === 'postgres' ? 'PostgreSQL' : 'MongoDB'}
+              {WRITE_MODE_LABELS[mode]} {dbType === 'postgres' ? 'PostgreSQL' : 'MongoDB'}
             </button>
           </div>
         </div>
@@ -288,21 +397,45 @@ export default function UploadPage() {
       {step === 'uploading' && (
         <div className="upload-loading">
           <div className="spinner" />
-          <p>Uploading {sniffResult?.row_count} rows to {dbType}...</p>
+          <p>Uploading {sniffResult?.confidence === 'sampled' ? '~' : ''}{sniffResult?.row_count} rows to {dbType}...</p>
+          {jobs.map((job) => (
+            <p key={job.job_id} className="job-progress">
+              {jobs.length > 1 && `${job.collection_name}: `}
+              {job.status === 'queued' && 'Waiting for a free ingestion worker...'}
+              {job.status === 'running' && (
+                <>
+                  {job.rows_written.toLocaleString()} / {job.total_rows.toLocaleString()} rows
+                  {job.rows_per_sec > 0 && ` at ${Math.round(job.rows_per_sec).toLocaleString()} rows/s`}
+                  {job.eta_seconds !== null && `, about ${Math.ceil(job.eta_seconds)}s left`}
+                </>
+              )}
+              {!isActive(job) && job.status}
+            </p>
+          ))}
+          {jobs.some(isActive) && (
+            <button className="btn-secondary" onClick={handleCancelJobs}>Cancel Upload</button>
+          )}
         </div>
       )}
 
-      {step === 'done' && uploadResult && (
+      {step === 'done' && uploadResults.length > 0 && (
         <div className="upload-done">
           <div className="done-icon">&#10003;</div>
           <h3>Upload Complete</h3>
-          <p className="done-message">{uploadResult.message}</p>
-          <div className="done-details">
-            <span>Collection: <strong>{uploadResult.collection_name}</strong></span>
-            <span>Database: <strong>{uploadResult.db_type}</strong></span>
-            <span>Rows: <strong>{uploadResult.row_count}</strong></span>
-            <span>Columns: <strong>{uploadResult.column_count}</strong></span>
-          </div>
+          {uploadResults.map((uploadResult) => (
+            <div key={uploadResult.collection_name}>
+              <p className="done-message">{uploadResult.message}</p>
+              <div className="done-details">
+                <span>Collection: <strong>{uploadResult.collection_name}</strong></span>
+                <span>Database: <strong>{uploadResult.db_type}</strong></span>
+                <span>Rows: <strong>{uploadResult.row_count}</strong></span>
+                <span>Columns: <strong>{uploadResult.column_count}</strong></span>
+                {uploadResult.storage_saved_mb > 0 && (
+                  <span>Saved by compact types: <strong>~{uploadResult.storage_saved_mb} MB</strong></span>
+                )}
+              </div>
+            </div>
+          ))}
           <button className="btn-primary" onClick={reset}>Upload Another File</button>
         </div>
       )}